@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """
+    Global cache of final answers keyed by query-embedding neighbourhood plus a
+    fingerprint of the retrieved context (chunk IDs and document versions).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 3600,
+                 similarity_threshold: float = 0.95, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_fingerprint: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def fingerprint(search_results: Iterable[Any], active_document: Optional[Tuple[str, str]] = None,
+                    context_mode: str = "", conversation: str = "") -> Optional[str]:
+        """
+        Build the context fingerprint for a request.
+
+        The recent conversation that goes into the prompt is part of the fingerprint, so
+        follow-ups only hit answers given after the same conversation. Returns None when
+        there is no document context, since general-knowledge answers are not cached.
+        """
+        parts = []
+        for res in search_results or []:
+            payload = getattr(res, 'payload', None) or {}
+            version = payload.get('processed_at') or payload.get('timestamp') or ""
+            parts.append(f"{getattr(res, 'id', '')}:{version}")
+        parts.sort()
+
+        if active_document:
+            parts.append(f"active:{active_document[0]}:{active_document[1]}")
+
+        if not parts:
+            return None
+
+        parts.append(f"mode:{context_mode}")
+        parts.append(f"conversation:{hashlib.sha256(conversation.encode('utf-8')).hexdigest()}")
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, query_vector: List[float], fingerprint: Optional[str]) -> Optional[str]:
+        """Return a cached answer for a semantically equivalent query over the same context."""
+        if not self.enabled or not fingerprint:
+            return None
+
+        with self._lock:
+            now = time.time()
+            entry_ids = [
+                entry_id for entry_id in list(self._by_fingerprint.get(fingerprint, []))
+                if not self._expire_if_stale(entry_id, now)
+            ]
+            if not entry_ids:
+                self._misses += 1
+                return None
+
+            vectors = np.stack([self._entries[entry_id]["vector"] for entry_id in entry_ids])
+            scores = vectors @ np.asarray(query_vector, dtype=np.float32)
+            best = int(np.argmax(scores))
+            if float(scores[best]) < self.similarity_threshold:
+                self._misses += 1
+                return None
+
+            entry_id = entry_ids[best]
+            self._entries.move_to_end(entry_id)
+            self._hits += 1
+            logger.info(f"Answer cache hit (similarity {float(scores[best]):.3f})")
+            return self._entries[entry_id]["answer"]
+
+    def put(self, query_vector: List[float], fingerprint: Optional[str], answer: str,
+            filenames: Iterable[str] = ()):
+        """Store a final answer for the given query and context fingerprint."""
+        if not self.enabled or not fingerprint or not answer:
+            return
+
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[entry_id] = {
+                "vector": np.asarray(query_vector, dtype=np.float32),
+                "fingerprint": fingerprint,
+                "answer": answer,
+                "filenames": set(f for f in filenames if f),
+                "created_at": time.time()
+            }
+            self._by_fingerprint.setdefault(fingerprint, []).append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._evictions += 1
+
+    def invalidate_document(self, filename: str) -> int:
+        """Drop every cached answer that was built from the given document."""
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if filename in entry["filenames"]]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self._invalidations += len(stale)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers for {filename}")
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations
+            }
+
+    def _expire_if_stale(self, entry_id: str, now: float) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return True
+        if now - entry["created_at"] > self.ttl_seconds:
+            self._remove(entry_id)
+            self._evictions += 1
+            return True
+        return False
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        siblings = self._by_fingerprint.get(entry["fingerprint"], [])
+        if entry_id in siblings:
+            siblings.remove(entry_id)
+        if not siblings:
+            self._by_fingerprint.pop(entry["fingerprint"], None)
+
+# Global instance
+answer_cache = SemanticAnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    enabled=ANSWER_CACHE_ENABLED
+)
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import CHAT_WRITE_BATCH_SIZE, CHAT_WRITE_FLUSH_SECONDS, CHAT_WRITE_WAL_PATH, CHAT_WRITE_WAL_ORPHAN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class ChatWriteBuffer:
+    """
+    Write-behind buffer for chat_sessions messages.
+    Messages are acknowledged once appended to an in-memory buffer and fsynced to a local
+    write-ahead log, then embedded and upserted to Qdrant in batches.
+    Unflushed messages stay readable through pending_for_session.
+    Every worker process keeps its own log next to wal_path; the logs of exited workers
+    are replayed by whichever worker finds them idle.
+    """
+
+    def __init__(self, collection_name: str = "chat_sessions", wal_path: Optional[str] = None,
+                 batch_size: int = 32, flush_seconds: float = 0.5, orphan_seconds: float = 30.0):
+        self.collection_name = collection_name
+        self.wal_path = wal_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.orphan_seconds = orphan_seconds
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wal = None
+        self._stats = {"appended": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "replayed": 0}
+
+    def start(self):
+        """Replay leftover write-ahead logs and start the flusher on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._replay()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def append(self, payload: Dict[str, Any]) -> str:
+        """Buffer a message payload; returns the point ID it will be stored under."""
+        point_id = str(uuid.uuid4())
+        with self._lock:
+            self._pending[point_id] = payload
+            self._write_wal([{"id": point_id, "payload": payload}])
+            self._stats["appended"] += 1
+        if self._task is None or self._task.done():
+            self.start()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return point_id
+
+    def pending_for_session(self, session_id: str) -> List[Dict[str, Any]]:
+        """Buffered, not yet flushed messages of a session as {"id", "payload"} records."""
+        with self._lock:
+            return [
+                {"id": point_id, "payload": payload}
+                for point_id, payload in self._pending.items()
+                if payload.get("session_id") == session_id
+            ]
+
+    async def discard_session(self, session_id: str) -> int:
+        """
+        Drop buffered messages of a deleted session so a later flush does not resurrect them.
+        Waits for a flush in progress, so its batch is stored before the caller deletes the session's points.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            return self._discard(session_id)
+
+    def _discard(self, session_id: str) -> int:
+        with self._lock:
+            stale = [point_id for point_id, payload in self._pending.items() if payload.get("session_id") == session_id]
+            for point_id in stale:
+                del self._pending[point_id]
+            if stale:
+                self._rewrite_wal()
+        return len(stale)
+
+    async def flush(self):
+        """Embed and upsert everything buffered so far."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(self._pending.items())[:self.batch_size]
+                if not batch:
+                    return
+                try:
+                    await asyncio.to_thread(self._store, batch)
+                except Exception as e:
+                    self._stats["failed_flushes"] += 1
+                    logger.error(f"Chat message flush of {len(batch)} messages failed, will retry: {e}")
+                    return
+                with self._lock:
+                    for point_id, _ in batch:
+                        self._pending.pop(point_id, None)
+                    self._rewrite_wal()
+                self._stats["flushes"] += 1
+                self._stats["flushed"] += len(batch)
+
+    async def drain(self):
+        """Stop the flusher and flush whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.warning(f"{len(self._pending)} chat messages left in the write-ahead log for the next start")
+        elif self.wal_path:
+            with self._lock:
+                self._close_wal()
+                try:
+                    os.remove(self._wal_file())
+                except FileNotFoundError:
+                    pass
+        logger.info("Chat write buffer drained")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._pending), "batch_size": self.batch_size}
+
+    async def _run(self):
+        last_orphan_check = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._touch_wal()
+            if self.wal_path and time.monotonic() - last_orphan_check >= self.orphan_seconds / 2:
+                last_orphan_check = time.monotonic()
+                try:
+                    await asyncio.to_thread(self._adopt_orphans)
+                except Exception as e:
+                    logger.error(f"Failed to replay write-ahead logs of exited workers: {e}")
+            if self._pending:
+                await self.flush()
+
+    def _store(self, batch):
+        from config import VECTOR_SIZE
+        from database import qdrant_manager
+        from ingestion import get_embeddings
+        from qdrant_client.http.models import PointStruct
+
+        try:
+            vectors = get_embeddings([payload.get("content", "") for _, payload in batch])
+        except Exception as e:
+            logger.error(f"Error generating embeddings for chat messages: {e}")
+            vectors = [[0.0] * VECTOR_SIZE for _ in batch]
+
+        points = [
+            PointStruct(id=point_id, vector=vector, payload=payload)
+            for (point_id, payload), vector in zip(batch, vectors)
+        ]
+        qdrant_manager.client.upsert(self.collection_name, points=points, wait=True)
+
+        # Keep the per-session summaries in step; a failure here must not re-flush the messages
+        try:
+            from session_index import session_index
+            session_index.record_messages(payload for _, payload in batch)
+        except Exception as e:
+            logger.error(f"Failed to update session index: {e}")
+
+    def _wal_file(self) -> str:
+        """This process's log: chat_wal.jsonl becomes chat_wal.<pid>.jsonl."""
+        root, ext = os.path.splitext(self.wal_path)
+        return f"{root}.{os.getpid()}{ext or '.jsonl'}"
+
+    def _write_wal(self, records: List[Dict[str, Any]]):
+        if not self.wal_path or not records:
+            return
+        if self._wal is None:
+            path = self._wal_file()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._wal = open(path, "a", encoding="utf-8")
+        for record in records:
+            self._wal.write(json.dumps(record) + "\n")
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+
+    def _close_wal(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def _rewrite_wal(self):
+        """Rewrite the log with only the still-pending messages."""
+        if not self.wal_path:
+            return
+        self._close_wal()
+        path = self._wal_file()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for point_id, payload in self._pending.items():
+                f.write(json.dumps({"id": point_id, "payload": payload}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _touch_wal(self):
+        """Keep this process's log fresh so other workers do not take it for an exited worker's."""
+        if not self.wal_path:
+            return
+        try:
+            os.utime(self._wal_file())
+        except FileNotFoundError:
+            # Taken by another worker while this one stalled; write the pending messages out again
+            with self._lock:
+                if self._wal is not None or self._pending:
+                    self._rewrite_wal()
+
+    def _read_wal(self, path: str) -> List[Dict[str, Any]]:
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write
+                    continue
+                records.append(record)
+        return records
+
+    def _load(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add replayed records to the buffer; returns the ones it did not hold yet."""
+        new = [record for record in records if record.get("id") not in self._pending]
+        for record in new:
+            self._pending[record["id"]] = record["payload"]
+        return new
+
+    def _adopt_orphans(self) -> int:
+        """Move the messages of logs that exited workers left behind into this process's buffer and log."""
+        directory = os.path.dirname(os.path.abspath(self.wal_path))
+        if not os.path.isdir(directory):
+            return 0
+        root, ext = os.path.splitext(os.path.basename(self.wal_path))
+        ext = ext or ".jsonl"
+        # chat_wal.jsonl (single-process logs of earlier versions), chat_wal.<pid>.jsonl and claimed logs
+        pattern = re.compile(rf"^{re.escape(root)}(\.[\w-]+)?{re.escape(ext)}$")
+        own = os.path.abspath(self._wal_file())
+        now = time.time()
+        adopted = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if path == own or not pattern.match(name):
+                continue
+            try:
+                if now - os.path.getmtime(path) < self.orphan_seconds:
+                    continue
+                # The rename is the claim: of several workers finding the same log, one wins
+                claimed = os.path.join(directory, f"{root}.{os.getpid()}-adopt-{uuid.uuid4().hex[:8]}{ext}")
+                os.replace(path, claimed)
+            except OSError:
+                # Gone since the listing, or still held open by a live worker
+                continue
+            with self._lock:
+                new = self._load(self._read_wal(claimed))
+                self._write_wal(new)
+            os.remove(claimed)
+            adopted += len(new)
+            if new:
+                logger.info(f"Replayed {len(new)} unflushed chat messages from {name}")
+        if adopted:
+            self._stats["replayed"] += adopted
+        return adopted
+
+    def _replay(self):
+        if not self.wal_path:
+            return
+        # A log under this pid is left over from an earlier process that had the same pid
+        own = self._wal_file()
+        if os.path.exists(own):
+            with self._lock:
+                replayed = len(self._load(self._read_wal(own)))
+            if replayed:
+                self._stats["replayed"] += replayed
+                logger.info(f"Replayed {replayed} unflushed chat messages from {own}")
+        self._adopt_orphans()
+
+# Global instance
+chat_write_buffer = ChatWriteBuffer(
+    collection_name="chat_sessions",
+    wal_path=CHAT_WRITE_WAL_PATH,
+    batch_size=CHAT_WRITE_BATCH_SIZE,
+    flush_seconds=CHAT_WRITE_FLUSH_SECONDS,
+    orphan_seconds=CHAT_WRITE_WAL_ORPHAN_SECONDS
+)
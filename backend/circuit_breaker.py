@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_ERROR_RATE_THRESHOLD,
+    CIRCUIT_WINDOW_SIZE,
+    CIRCUIT_COOLDOWN_SECONDS,
+    CIRCUIT_SLOW_CALL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+    Opens after consecutive failures or a high error rate over a rolling window,
+    then lets a single probe through once the cooldown has passed.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, error_rate_threshold: float = 0.5,
+                 window_size: int = 20, cooldown_seconds: float = 30.0, slow_call_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)  # (success, latency)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now."""
+        with self._lock:
+            now = time.time()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self._opened_at < self.cooldown_seconds:
+                return False
+            # Cooldown passed: allow one probe at a time (a stuck probe expires after another cooldown)
+            if self.state == HALF_OPEN and now - self._probe_started < self.cooldown_seconds:
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = now
+            logger.info(f"Circuit {self.name} half-open, sending probe")
+            return True
+
+    def record_success(self, latency: float):
+        if latency > self.slow_call_seconds:
+            self.record_failure(latency)
+            return
+        with self._lock:
+            self._outcomes.append((True, latency))
+            self._consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed after successful probe")
+            self.state = CLOSED
+
+    def record_failure(self, latency: float = 0.0):
+        with self._lock:
+            self._outcomes.append((False, latency))
+            self._consecutive_failures += 1
+            failures = sum(1 for success, _ in self._outcomes if not success)
+            error_rate = failures / len(self._outcomes)
+
+            should_open = (
+                self.state == HALF_OPEN
+                or self._consecutive_failures >= self.failure_threshold
+                or (len(self._outcomes) >= self.failure_threshold * 2 and error_rate >= self.error_rate_threshold)
+            )
+            if should_open and self.state != OPEN:
+                logger.warning(f"Circuit {self.name} opened ({self._consecutive_failures} consecutive failures, "
+                               f"error rate {error_rate:.0%})")
+            if should_open:
+                self.state = OPEN
+                self._opened_at = time.time()
+
+    def health_score(self) -> float:
+        """0..1 weight combining success rate and latency; 0 while open."""
+        with self._lock:
+            if self.state == OPEN:
+                return 0.0
+            if not self._outcomes:
+                return 1.0
+            success_rate = sum(1 for success, _ in self._outcomes if success) / len(self._outcomes)
+            avg_latency = sum(latency for _, latency in self._outcomes) / len(self._outcomes)
+            return success_rate / (1 + avg_latency / self.slow_call_seconds)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(1 for success, _ in self._outcomes if not success)
+            latencies = sorted(latency for _, latency in self._outcomes)
+            status = {
+                "state": self.state,
+                "calls_in_window": calls,
+                "error_rate": failures / calls if calls else 0.0,
+                "consecutive_failures": self._consecutive_failures,
+                "p50_latency": latencies[len(latencies) // 2] if latencies else None,
+                "retry_in": max(0.0, self.cooldown_seconds - (time.time() - self._opened_at)) if self.state == OPEN else 0.0
+            }
+        status["health_score"] = self.health_score()
+        return status
+
+class CircuitBreakerRegistry:
+    """Lazily created circuit breakers keyed by provider name."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **self.settings)
+            return self._breakers[name]
+
+    def healthiest(self, names: Iterable[str]) -> Optional[str]:
+        """Provider with the best health score among the given names."""
+        names = list(names)
+        if not names:
+            return None
+        return max(names, key=lambda name: self.get(name).health_score())
+
+    def get_states(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.get_status() for breaker in breakers}
+
+# Global instance
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    error_rate_threshold=CIRCUIT_ERROR_RATE_THRESHOLD,
+    window_size=CIRCUIT_WINDOW_SIZE,
+    cooldown_seconds=CIRCUIT_COOLDOWN_SECONDS,
+    slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS
+)
@@ -2,6 +2,8 @@ import os
 import logging
 import cohere
 from langsmith import traceable
+from context_assembler import estimate_tokens
+from rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +28,14 @@ class CohereClient:
 
         try:
             # Cohere's Chat API
-            response = self.client.chat(
-                model="command-r-plus-08-2024", # Updated to latest stable model
-                message=query,
-                preamble="You are a helpful AI assistant. Answer the user's question based on the provided context. If the context is not relevant, answer based on your general knowledge.",
-                documents=[{"text": context[:4000]}], # Cohere RAG style
-                temperature=0.7
-            )
+            async with rate_limiter.slot("cohere", estimate_tokens(query + context) + 1024):
+                response = self.client.chat(
+                    model="command-r-plus-08-2024", # Updated to latest stable model
+                    message=query,
+                    preamble="You are a helpful AI assistant. Answer the user's question based on the provided context. If the context is not relevant, answer based on your general knowledge.",
+                    documents=[{"text": context}], # Cohere RAG style, sized by the context assembler
+                    temperature=0.7
+                )
             return response.text
         except Exception as e:
             logger.error(f"Cohere API Error: {e}")
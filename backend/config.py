@@ -46,6 +46,138 @@ CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "1000"))
 WORKFLOW_WEBHOOK_URL = os.getenv("WORKFLOW_WEBHOOK_URL")
 WORKFLOW_API_KEY = os.getenv("WORKFLOW_API_KEY")
 
+# Aggregation Configuration
+AGGREGATION_SHORTCUT_ENABLED = os.getenv("AGGREGATION_SHORTCUT_ENABLED", "true").lower() == "true"
+AGGREGATION_AGREEMENT_THRESHOLD = float(os.getenv("AGGREGATION_AGREEMENT_THRESHOLD", "0.9"))
+
+# Answer Cache Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+# Context Assembly Configuration (token budgets per provider, "provider=tokens" pairs)
+CONTEXT_TOKEN_BUDGETS = {
+    provider.strip(): int(budget)
+    for provider, budget in (
+        item.split("=") for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "gemini=8000,mistral=8000,cohere=1000,groq=500").split(",") if "=" in item
+    )
+}
+CONTEXT_DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_DEFAULT_TOKEN_BUDGET", "4000"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+
+# Context Compression Configuration
+CONTEXT_COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION_ENABLED", "true").lower() == "true"
+CONTEXT_COMPRESSION_TARGET_TOKENS = int(os.getenv("CONTEXT_COMPRESSION_TARGET_TOKENS", "6000"))
+CONTEXT_COMPRESSION_CACHE_SIZE = int(os.getenv("CONTEXT_COMPRESSION_CACHE_SIZE", "32"))
+
+# Active Document Cache Configuration
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "64"))
+DOCUMENT_CACHE_MAX_MEMORY_MB = int(os.getenv("DOCUMENT_CACHE_MAX_MEMORY_MB", "64"))
+DOCUMENT_CACHE_MMAP_THRESHOLD_KB = int(os.getenv("DOCUMENT_CACHE_MMAP_THRESHOLD_KB", "512"))
+DOCUMENT_CACHE_TTL_SECONDS = int(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "1800"))
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR")
+
+# HTTP Client Pool Configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# Intent Classification Configuration
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+INTENT_REMOTE_FALLBACK = os.getenv("INTENT_REMOTE_FALLBACK", "true").lower() == "true"
+
+# Provider Rate Limits ("provider=requests_per_minute:tokens_per_minute" pairs)
+PROVIDER_RATE_LIMITS = {
+    provider.strip(): tuple(int(v) for v in limits.split(":"))
+    for provider, limits in (
+        item.split("=") for item in os.getenv(
+            "PROVIDER_RATE_LIMITS",
+            "groq=30:12000,gemini=60:1000000,gemini_intent=60:1000000,mistral=60:500000,cohere=20:1000000"
+        ).split(",") if "=" in item
+    )
+}
+RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.2"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
+
+# Memory Collection Configuration
+MEMORY_COLLECTION_NAME = os.getenv("MEMORY_COLLECTION_NAME", "memories")
+MEMORY_SEARCH_LIMIT = int(os.getenv("MEMORY_SEARCH_LIMIT", "3"))
+MEMORY_SCORE_THRESHOLD = float(os.getenv("MEMORY_SCORE_THRESHOLD", "0.6"))
+
+# Memory Pipeline Configuration
+MEMORY_BATCH_SIZE = int(os.getenv("MEMORY_BATCH_SIZE", "8"))
+MEMORY_BATCH_MAX_DELAY_SECONDS = float(os.getenv("MEMORY_BATCH_MAX_DELAY_SECONDS", "10"))
+MEMORY_BATCH_MAX_TOKENS = int(os.getenv("MEMORY_BATCH_MAX_TOKENS", "6000"))
+
+# Memory Consolidation Configuration
+MEMORY_CONSOLIDATION_ENABLED = os.getenv("MEMORY_CONSOLIDATION_ENABLED", "true").lower() == "true"
+MEMORY_CONSOLIDATION_INTERVAL_SECONDS = int(os.getenv("MEMORY_CONSOLIDATION_INTERVAL_SECONDS", "3600"))
+MEMORY_CONSOLIDATION_SIMILARITY = float(os.getenv("MEMORY_CONSOLIDATION_SIMILARITY", "0.9"))
+MEMORY_MAX_POINTS = int(os.getenv("MEMORY_MAX_POINTS", "5000"))
+
+# Job Queue Configuration
+JOB_QUEUE_DB_PATH = os.getenv("JOB_QUEUE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3"))
+JOB_QUEUE_CONCURRENCY = {
+    queue.strip(): int(limit)
+    for queue, limit in (
+        item.split("=") for item in os.getenv("JOB_QUEUE_CONCURRENCY", "memory=8,conversation=2,titles=1,archive=2,notes=2,summaries=1").split(",") if "=" in item
+    )
+}
+JOB_QUEUE_MAX_ATTEMPTS = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "5"))
+JOB_QUEUE_RETRY_BASE_SECONDS = float(os.getenv("JOB_QUEUE_RETRY_BASE_SECONDS", "2"))
+JOB_QUEUE_RETENTION_SECONDS = int(os.getenv("JOB_QUEUE_RETENTION_SECONDS", "86400"))
+JOB_QUEUE_LEASE_SECONDS = float(os.getenv("JOB_QUEUE_LEASE_SECONDS", "300"))  # renewed while a job runs; expired leases are taken over
+
+# Conversation Memory Configuration
+CONVERSATION_MEMORY_BACKEND = os.getenv("CONVERSATION_MEMORY_BACKEND", "lru").lower()  # lru, sqlite or chat_sessions
+CONVERSATION_MEMORY_MAX_SESSIONS = int(os.getenv("CONVERSATION_MEMORY_MAX_SESSIONS", "1000"))
+CONVERSATION_MEMORY_MAX_MESSAGES = int(os.getenv("CONVERSATION_MEMORY_MAX_MESSAGES", "20"))
+CONVERSATION_MEMORY_TTL_SECONDS = int(os.getenv("CONVERSATION_MEMORY_TTL_SECONDS", "86400"))
+CONVERSATION_MEMORY_DB_PATH = os.getenv("CONVERSATION_MEMORY_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "conversation_memory.sqlite3"))
+
+# Conversation Summary Configuration (older turns are folded into a running summary)
+CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "true").lower() == "true"
+CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", "300"))
+CONVERSATION_VERBATIM_MESSAGES = int(os.getenv("CONVERSATION_VERBATIM_MESSAGES", "2"))  # latest turn
+CONVERSATION_VERBATIM_MAX_TOKENS = int(os.getenv("CONVERSATION_VERBATIM_MAX_TOKENS", "600"))
+
+# Session Index Configuration
+SESSION_INDEX_COLLECTION_NAME = os.getenv("SESSION_INDEX_COLLECTION_NAME", "chat_session_index")
+
+# Chat Write Buffer Configuration
+CHAT_WRITE_WAL_PATH = os.getenv("CHAT_WRITE_WAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chat_wal.jsonl"))
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "32"))
+CHAT_WRITE_FLUSH_SECONDS = float(os.getenv("CHAT_WRITE_FLUSH_SECONDS", "0.5"))
+CHAT_WRITE_WAL_ORPHAN_SECONDS = float(os.getenv("CHAT_WRITE_WAL_ORPHAN_SECONDS", "30"))  # idle log of an exited worker
+
+# Smart Notes Configuration (map-reduce over large documents)
+NOTES_MODEL = os.getenv("NOTES_MODEL", "llama-3.1-8b-instant")
+NOTES_CHUNK_CHARS = int(os.getenv("NOTES_CHUNK_CHARS", "6000"))
+NOTES_MAX_CONCURRENCY = int(os.getenv("NOTES_MAX_CONCURRENCY", "6"))
+NOTES_REDUCE_INPUT_CHARS = int(os.getenv("NOTES_REDUCE_INPUT_CHARS", "24000"))
+NOTES_PROMPT_VERSION = os.getenv("NOTES_PROMPT_VERSION", "1")  # bump to invalidate cached notes after prompt changes
+NOTES_TREE_COLLECTION_NAME = os.getenv("NOTES_TREE_COLLECTION_NAME", "document_summaries")
+NOTES_TREE_LEAF_CHUNKS = int(os.getenv("NOTES_TREE_LEAF_CHUNKS", "12"))  # chunks per leaf summary
+
+# Conversation Archive Configuration (compressed JSONL segments in R2)
+CONVERSATION_ARCHIVE_DIR = os.getenv("CONVERSATION_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "conversation_archive"))
+CONVERSATION_ARCHIVE_SEGMENT_BYTES = int(os.getenv("CONVERSATION_ARCHIVE_SEGMENT_BYTES", "1048576"))
+CONVERSATION_ARCHIVE_SEGMENT_AGE_SECONDS = int(os.getenv("CONVERSATION_ARCHIVE_SEGMENT_AGE_SECONDS", "3600"))
+CONVERSATION_ARCHIVE_FLUSH_INTERVAL_SECONDS = int(os.getenv("CONVERSATION_ARCHIVE_FLUSH_INTERVAL_SECONDS", "60"))
+
+# Request Coalescing Configuration
+REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+
+# Circuit Breaker Configuration
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_ERROR_RATE_THRESHOLD = float(os.getenv("CIRCUIT_ERROR_RATE_THRESHOLD", "0.5"))
+CIRCUIT_WINDOW_SIZE = int(os.getenv("CIRCUIT_WINDOW_SIZE", "20"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "30"))
+
 # LangSmith Configuration
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
 LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "true")
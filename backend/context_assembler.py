@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import CONTEXT_TOKEN_BUDGETS, CONTEXT_DEFAULT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+from ingestion import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio shared by the Llama, Gemini, Mistral and Cohere tokenizers
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "...(truncated)"
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text without a provider tokenizer."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """Cut text down to roughly max_tokens, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    if keep_tail:
+        return TRUNCATION_MARKER + text[-max_chars:] if max_chars else ""
+    return text[:max_chars] + TRUNCATION_MARKER if max_chars else ""
+
+class ContextChunk:
+    """A retrieved piece of context with its relevance score."""
+
+    def __init__(self, text: str, score: float = 0.0, source: str = "unknown",
+                 kind: str = "document", chunk_id: Optional[str] = None):
+        self.text = text
+        self.score = score
+        self.source = source
+        self.kind = kind
+        self.chunk_id = chunk_id
+        self.tokens = estimate_tokens(text)
+
+class AssembledContext:
+    """Prompt context built once per request, fitted lazily to each provider's budget."""
+
+    def __init__(self, chunks: List[ContextChunk], budgets: Dict[str, int], default_budget: int,
+                 active_document_text: Optional[str] = None, active_document_filename: Optional[str] = None,
+                 conversation: str = "", notice: str = ""):
+        self.chunks = chunks
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.active_document_text = active_document_text
+        self.active_document_filename = active_document_filename
+        self.conversation = conversation
+        self.notice = notice
+        self._views: Dict[str, str] = {}
+
+    @property
+    def total_tokens(self) -> int:
+        """Token count of the unfitted context."""
+        return (estimate_tokens(self.conversation) + estimate_tokens(self.active_document_text)
+                + sum(chunk.tokens for chunk in self.chunks) + estimate_tokens(self.notice))
+
+    def for_provider(self, provider: str) -> str:
+        """Context text fitted to the provider's token budget."""
+        if provider not in self._views:
+            budget = self.budgets.get(provider, self.default_budget)
+            self._views[provider] = self._fit(budget)
+            logger.info(f"Context for {provider}: {estimate_tokens(self._views[provider])}/{budget} tokens "
+                        f"(unfitted {self.total_tokens})")
+        return self._views[provider]
+
+    def _fit(self, budget: int) -> str:
+        sections = []
+        remaining = budget
+
+        # Recent conversation is capped so it cannot crowd out the documents
+        if self.conversation:
+            conversation = truncate_to_tokens(self.conversation, budget // 4, keep_tail=True)
+            sections.append(f"RECENT CONVERSATION:\n{conversation}")
+            remaining -= estimate_tokens(conversation)
+
+        related_tokens = sum(chunk.tokens for chunk in self.chunks)
+        active_text = ""
+        if self.active_document_text:
+            # Active document has priority but leaves room for related chunks
+            active_budget = remaining - min(related_tokens, remaining // 4)
+            active_text = truncate_to_tokens(self.active_document_text, active_budget)
+            remaining -= estimate_tokens(active_text)
+
+        related = []
+        for chunk in self.chunks:
+            if remaining <= 0:
+                break
+            # Chunks already visible in the active document add nothing
+            if active_text and chunk.text in active_text:
+                continue
+            text = chunk.text if chunk.tokens <= remaining else truncate_to_tokens(chunk.text, remaining)
+            if text:
+                related.append(text)
+                remaining -= estimate_tokens(text)
+
+        related_text = "\n\n".join(related) or self.notice
+        if active_text:
+            sections.append(f"ACTIVE DOCUMENT ({self.active_document_filename or 'Current File'}):\n{active_text}\n\nRELATED CONTEXT:\n{related_text}")
+        elif self.conversation:
+            sections.append(f"CONTEXT:\n{related_text}")
+        else:
+            sections.append(related_text)
+
+        return "\n\n".join(sections)
+
+class ContextAssembler:
+    """Deduplicates, orders and budgets prompt context for the parallel workflow."""
+
+    def __init__(self, budgets: Dict[str, int], default_budget: int = 4000, dedup_threshold: float = 0.95):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.dedup_threshold = dedup_threshold
+
+    def assemble(self, search_results: List[Any], active_document_text: Optional[str] = None,
+                 active_document_filename: Optional[str] = None, conversation: str = "",
+                 notice: str = "") -> AssembledContext:
+        """Build the request context from Qdrant search results and the active document."""
+        chunks, vectors = [], []
+        for res in search_results or []:
+            payload = getattr(res, 'payload', None) or {}
+            text = payload.get('text', '')
+            if not text or not text.strip():
+                continue
+            chunks.append(ContextChunk(
+                text=text,
+                score=getattr(res, 'score', 0.0) or 0.0,
+                source=payload.get('filename', 'unknown'),
+                kind="memory" if payload.get('file_type') == "memory" else "document",
+                chunk_id=str(getattr(res, 'id', ''))
+            ))
+            vectors.append(getattr(res, 'vector', None))
+
+        chunks = self._deduplicate(chunks, vectors)
+        return AssembledContext(
+            chunks=chunks,
+            budgets=self.budgets,
+            default_budget=self.default_budget,
+            active_document_text=active_document_text,
+            active_document_filename=active_document_filename,
+            conversation=conversation,
+            notice=notice
+        )
+
+    def _deduplicate(self, chunks: List[ContextChunk], vectors: List[Any]) -> List[ContextChunk]:
+        """Drop exact and near-duplicate chunks, keeping the highest scoring copy, ordered by relevance."""
+        order = sorted(range(len(chunks)), key=lambda i: chunks[i].score, reverse=True)
+
+        # Exact duplicates by normalized text hash
+        seen_hashes = set()
+        unique = []
+        for i in order:
+            digest = hashlib.md5(re.sub(r'\s+', ' ', chunks[i].text.strip().lower()).encode('utf-8')).hexdigest()
+            if digest not in seen_hashes:
+                seen_hashes.add(digest)
+                unique.append(i)
+
+        if len(unique) < 2:
+            return [chunks[i] for i in unique]
+
+        # Near duplicates by embedding; reuse stored vectors when the search returned them
+        try:
+            missing = [i for i in unique if vectors[i] is None]
+            if missing:
+                for i, vector in zip(missing, get_embeddings([chunks[i].text for i in missing])):
+                    vectors[i] = vector
+            matrix = np.asarray([vectors[i] for i in unique], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+            similarity = matrix @ matrix.T
+        except Exception as e:
+            logger.error(f"Near-duplicate detection failed: {e}")
+            return [chunks[i] for i in unique]
+
+        kept = []
+        for row in range(len(unique)):
+            if all(similarity[row, k] < self.dedup_threshold for k in kept):
+                kept.append(row)
+
+        if len(kept) < len(unique):
+            logger.info(f"Dropped {len(unique) - len(kept)} near-duplicate context chunks")
+        return [chunks[unique[row]] for row in kept]
+
+# Global instance
+context_assembler = ContextAssembler(
+    budgets=CONTEXT_TOKEN_BUDGETS,
+    default_budget=CONTEXT_DEFAULT_TOKEN_BUDGET,
+    dedup_threshold=CONTEXT_DEDUP_THRESHOLD
+)
@@ -0,0 +1,123 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import CONTEXT_COMPRESSION_ENABLED, CONTEXT_COMPRESSION_TARGET_TOKENS, CONTEXT_COMPRESSION_CACHE_SIZE
+from context_assembler import estimate_tokens
+from ingestion import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+MAX_SENTENCE_CHARS = 600
+GAP_MARKER = " [...] "
+
+class ExtractiveCompressor:
+    """
+    Query-focused extractive compression of large documents.
+    Sentence embeddings are cached per document version, so follow-up
+    questions about the same document only embed the query.
+    """
+
+    def __init__(self, target_tokens: int = 6000, cache_size: int = 32, enabled: bool = True):
+        self.target_tokens = target_tokens
+        self.cache_size = cache_size
+        self.enabled = enabled
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[List[str], np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compress(self, text: str, document_key: str, version: Optional[str],
+                 query_vector: Optional[List[float]] = None, target_tokens: Optional[int] = None) -> str:
+        """
+        Keep the sentences most similar to the query, in document order, within the token budget.
+        Without a query vector the document centroid is used, which favours representative sentences.
+        Without a version the sentence embeddings are computed but not cached.
+        """
+        target_tokens = target_tokens or self.target_tokens
+        if not self.enabled or not text or estimate_tokens(text) <= target_tokens:
+            return text
+
+        try:
+            sentences, matrix = self._get_sentence_embeddings(text, document_key, version)
+            if not sentences:
+                return text
+
+            if query_vector is None:
+                query = matrix.mean(axis=0)
+            else:
+                query = np.asarray(query_vector, dtype=np.float32)
+            scores = matrix @ query
+
+            selected, used = [], 0
+            for i in np.argsort(-scores):
+                tokens = estimate_tokens(sentences[i]) + 1
+                if used + tokens > target_tokens:
+                    continue
+                selected.append(int(i))
+                used += tokens
+
+            selected.sort()
+            parts = []
+            for position, i in enumerate(selected):
+                if position > 0 and i != selected[position - 1] + 1:
+                    parts.append(GAP_MARKER)
+                elif position > 0:
+                    parts.append(" ")
+                parts.append(sentences[i])
+
+            compressed = "".join(parts)
+            logger.info(f"Compressed {document_key}: {estimate_tokens(text)} -> {estimate_tokens(compressed)} tokens "
+                        f"({len(selected)}/{len(sentences)} sentences)")
+            return compressed
+
+        except Exception as e:
+            logger.error(f"Context compression failed for {document_key}: {e}")
+            return text
+
+    def invalidate(self, document_key: str):
+        """Forget cached sentence embeddings for every version of a document."""
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == document_key]:
+                del self._cache[key]
+
+    def _get_sentence_embeddings(self, text: str, document_key: str, version: Optional[str]) -> Tuple[List[str], np.ndarray]:
+        cache_key = (document_key, version)
+        with self._lock:
+            if version is not None and cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+        sentences = self._split_sentences(text)
+        matrix = np.asarray(get_embeddings(sentences), dtype=np.float32) if sentences else np.zeros((0, 0), dtype=np.float32)
+
+        if version is None:
+            return sentences, matrix
+        with self._lock:
+            self._cache[cache_key] = (sentences, matrix)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sentences, matrix
+
+    def _split_sentences(self, text: str) -> List[str]:
+        """Split on sentence boundaries, breaking up run-on text such as extracted PDF tables."""
+        sentences = []
+        for sentence in re.split(r'(?<=[.!?])\s+|\n{2,}', text):
+            sentence = sentence.strip()
+            while len(sentence) > MAX_SENTENCE_CHARS:
+                cut = sentence.rfind(' ', 0, MAX_SENTENCE_CHARS)
+                cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+                sentences.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+# Global instance
+context_compressor = ExtractiveCompressor(
+    target_tokens=CONTEXT_COMPRESSION_TARGET_TOKENS,
+    cache_size=CONTEXT_COMPRESSION_CACHE_SIZE,
+    enabled=CONTEXT_COMPRESSION_ENABLED
+)
@@ -0,0 +1,297 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from config import (
+    CONVERSATION_ARCHIVE_DIR,
+    CONVERSATION_ARCHIVE_SEGMENT_BYTES,
+    CONVERSATION_ARCHIVE_SEGMENT_AGE_SECONDS,
+    CONVERSATION_ARCHIVE_FLUSH_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-exchange objects written before segments: conv_{session}_{timestamp}/conversations/{session}/{timestamp}_{id}.json
+LEGACY_KEY = re.compile(r"^conv_.+/conversations/(?P<session>[^/]+)/[^/]+\.json$")
+
+class ConversationArchive:
+    """
+    Compacted conversation archive in R2.
+    Exchanges are appended to a local per-session segment file, which is sealed once it
+    reaches a size or age limit and uploaded as gzip-compressed JSONL. Each session has a
+    manifest listing its segments, so restoring a session takes one GET per segment.
+    Segment files are opened per append rather than held open, so the number of active
+    sessions is not bounded by file descriptors.
+    """
+
+    def __init__(self, segment_dir: str, prefix: str = "conversations", max_segment_bytes: int = 1048576,
+                 max_segment_age_seconds: int = 3600, flush_interval_seconds: int = 60):
+        self.segment_dir = segment_dir
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_seconds = max_segment_age_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        # Open segments of this process; segment files carry the pid so workers never share one
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._upload_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"appended": 0, "segments_uploaded": 0, "bytes_uploaded": 0, "failed_uploads": 0}
+
+    @property
+    def enabled(self) -> bool:
+        from r2_storage import r2_storage
+        return r2_storage.enabled
+
+    def start(self):
+        """Upload segments left over from earlier runs and start the periodic flusher."""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher, then seal and upload everything still open."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            await asyncio.to_thread(self.flush, True)
+
+    def append(self, session_id: str, record: Dict[str, Any]) -> bool:
+        """Append an exchange to the session's open segment. Returns False when R2 is disabled."""
+        if not self.enabled:
+            return False
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            segment = self._open.get(session_id)
+            if segment is None:
+                segment = self._open_segment(session_id)
+            with open(segment["path"], "ab") as f:
+                f.write(line)
+            segment["bytes"] += len(line)
+            self._stats["appended"] += 1
+            full = segment["bytes"] >= self.max_segment_bytes
+            if full:
+                self._seal(session_id)
+        if full:
+            self._upload_sealed()
+        return True
+
+    def flush(self, force: bool = False) -> int:
+        """Seal segments past their age limit (or all of them when forced) and upload sealed segments."""
+        now = time.time()
+        with self._lock:
+            for session_id, segment in list(self._open.items()):
+                if force or now - segment["created_at"] >= self.max_segment_age_seconds:
+                    self._seal(session_id)
+            own = {segment["path"] for segment in self._open.values()}
+        # Open segments of workers that exited are sealed once idle for the age limit
+        for name in self._list_segment_files(".open.jsonl"):
+            path = os.path.join(self.segment_dir, name)
+            if path not in own and now - os.path.getmtime(path) >= self.max_segment_age_seconds:
+                os.replace(path, path[:-len(".open.jsonl")] + ".sealed.jsonl")
+        return self._upload_sealed()
+
+    def restore(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        All archived exchanges of a session, oldest first: uploaded segments plus the segments
+        still on this node's disk. Segments other nodes have not uploaded yet appear within
+        max_segment_age_seconds plus one flush interval.
+        """
+        from r2_storage import r2_storage
+
+        lines = []
+        for segment in self._read_manifest(session_id).get("segments", []):
+            data = r2_storage.download_file(segment["key"])
+            if data is None:
+                raise RuntimeError(f"Archive segment {segment['key']} could not be read")
+            lines.extend(gzip.decompress(data).splitlines())
+        lines.extend(self._read_local_segments(session_id))
+
+        # A segment uploaded while this ran can be read from R2 and from disk
+        records = {}
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The torn last line of a segment being appended to
+                continue
+            if record.get("session_id") == session_id:
+                records.setdefault(json.dumps(record, sort_keys=True), record)
+        # Segments of concurrent workers can interleave in time
+        return sorted(records.values(), key=lambda r: r.get("stored_at") or "")
+
+    def migrate_legacy_objects(self) -> Dict[str, int]:
+        """Compact per-exchange JSON objects into one segment per session, then delete them."""
+        from r2_storage import r2_storage
+
+        keys_by_session: Dict[str, List[str]] = defaultdict(list)
+        for key in r2_storage.list_keys("conv_"):
+            match = LEGACY_KEY.match(key)
+            if match:
+                keys_by_session[match.group("session")].append(key)
+
+        migrated = deleted = 0
+        for session_id, keys in keys_by_session.items():
+            records, read_keys = [], []
+            for key in keys:
+                data = r2_storage.download_file(key)
+                if data is None:
+                    continue
+                try:
+                    records.append(json.loads(data))
+                    read_keys.append(key)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping unreadable archive object {key}")
+            if not records:
+                continue
+            records.sort(key=lambda r: r.get("stored_at") or "")
+            body = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+            # Deterministic segment ID over the compacted objects, so a re-run after a failed delete overwrites
+            # instead of duplicating, while objects that could not be read this time get a segment of their own
+            # (sorted ahead of the timestamped segments written since)
+            segment_id = "0-" + uuid.uuid5(uuid.NAMESPACE_URL, f"legacy-archive:{session_id}:{'|'.join(sorted(read_keys))}").hex
+            self._upload_segment(session_id, segment_id, body, len(records))
+            migrated += len(records)
+            # Objects that failed to download or parse stay in place for the next run
+            deleted += r2_storage.delete_files(read_keys)
+        logger.info(f"Compacted {migrated} archived exchanges of {len(keys_by_session)} sessions into segments")
+        return {"sessions": len(keys_by_session), "exchanges": migrated, "objects_deleted": deleted}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "open_segments": len(self._open),
+            "sealed_pending": len(self._list_segment_files(".sealed.jsonl"))
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Conversation archive flush failed: {e}")
+            await asyncio.sleep(self.flush_interval_seconds)
+
+    def _open_segment(self, session_id: str) -> Dict[str, Any]:
+        os.makedirs(self.segment_dir, exist_ok=True)
+        segment_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.segment_dir, f"{self._safe_session(session_id)}.{segment_id}.{os.getpid()}.open.jsonl")
+        segment = {"path": path, "bytes": 0, "created_at": time.time()}
+        self._open[session_id] = segment
+        return segment
+
+    @staticmethod
+    def _safe_session(session_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]", "_", session_id)
+
+    def _read_local_segments(self, session_id: str) -> List[bytes]:
+        """Lines of the session's open and sealed segments on this node (any worker's)."""
+        prefix = self._safe_session(session_id) + "."
+        lines = []
+        for name in self._list_segment_files(".jsonl"):
+            if not name.startswith(prefix):
+                continue
+            path = os.path.join(self.segment_dir, name)
+            # An open segment may be sealed (renamed) between the listing and the read
+            for candidate in (path, path[:-len(".open.jsonl")] + ".sealed.jsonl" if name.endswith(".open.jsonl") else None):
+                try:
+                    with open(candidate, "rb") as f:
+                        lines.extend(f.read().splitlines())
+                    break
+                except (FileNotFoundError, TypeError):
+                    # Uploaded and removed since the listing, so it is in R2
+                    continue
+        return lines
+
+    def _seal(self, session_id: str):
+        segment = self._open.pop(session_id)
+        os.replace(segment["path"], segment["path"][:-len(".open.jsonl")] + ".sealed.jsonl")
+
+    def _list_segment_files(self, suffix: str) -> List[str]:
+        if not os.path.isdir(self.segment_dir):
+            return []
+        return sorted(name for name in os.listdir(self.segment_dir) if name.endswith(suffix))
+
+    def _upload_sealed(self) -> int:
+        """Upload sealed segments; a failed one stays on disk and is retried on the next flush."""
+        uploaded = 0
+        with self._upload_lock:
+            for name in self._list_segment_files(".sealed.jsonl"):
+                path = os.path.join(self.segment_dir, name)
+                try:
+                    with open(path, "rb") as f:
+                        body = f.read()
+                    lines = [line for line in body.splitlines() if line.strip()]
+                    if not lines:
+                        os.remove(path)
+                        continue
+                    session_id = json.loads(lines[0])["session_id"]
+                    # {session}.{segment id}.{pid}.sealed.jsonl
+                    segment_id = name.split(".")[-4]
+                    self._upload_segment(session_id, segment_id, body, len(lines))
+                    os.remove(path)
+                    uploaded += 1
+                except Exception as e:
+                    self._stats["failed_uploads"] += 1
+                    logger.error(f"Failed to upload archive segment {name}: {e}")
+        return uploaded
+
+    def _upload_segment(self, session_id: str, segment_id: str, body: bytes, records: int):
+        from r2_storage import r2_storage
+
+        compressed = gzip.compress(body)
+        key = f"{self.prefix}/{session_id}/segments/{segment_id}.jsonl.gz"
+        if not r2_storage.put_object(key, compressed, content_type="application/x-ndjson", content_encoding="gzip"):
+            raise RuntimeError(f"R2 upload of {key} failed")
+
+        manifest = self._read_manifest(session_id)
+        segments = {s["key"]: s for s in manifest.get("segments", [])}
+        # Segments another worker uploaded while this manifest was being rewritten are picked up here
+        for listed_key in r2_storage.list_keys(f"{self.prefix}/{session_id}/segments/"):
+            segments.setdefault(listed_key, {"key": listed_key, "records": None, "bytes": None, "uploaded_at": None})
+        segments[key] = {"key": key, "records": records, "bytes": len(compressed), "uploaded_at": time.time()}
+        segments = list(segments.values())
+        manifest = {"session_id": session_id, "segments": sorted(segments, key=lambda s: s["key"]), "updated_at": time.time()}
+        if not r2_storage.put_object(self._manifest_key(session_id), json.dumps(manifest).encode("utf-8"),
+                                     content_type="application/json"):
+            raise RuntimeError(f"R2 manifest update for session {session_id} failed")
+        self._stats["segments_uploaded"] += 1
+        self._stats["bytes_uploaded"] += len(compressed)
+
+    def _read_manifest(self, session_id: str) -> Dict[str, Any]:
+        from r2_storage import r2_storage
+
+        key = self._manifest_key(session_id)
+        if key not in r2_storage.list_keys(key):
+            return {"session_id": session_id, "segments": []}
+        data = r2_storage.download_file(key)
+        if data is None:
+            raise RuntimeError(f"Archive manifest {key} could not be read")
+        return json.loads(data)
+
+    def _manifest_key(self, session_id: str) -> str:
+        return f"{self.prefix}/{session_id}/manifest.json"
+
+# Global instance
+conversation_archive = ConversationArchive(
+    segment_dir=CONVERSATION_ARCHIVE_DIR,
+    max_segment_bytes=CONVERSATION_ARCHIVE_SEGMENT_BYTES,
+    max_segment_age_seconds=CONVERSATION_ARCHIVE_SEGMENT_AGE_SECONDS,
+    flush_interval_seconds=CONVERSATION_ARCHIVE_FLUSH_INTERVAL_SECONDS
+)
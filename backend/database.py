@@ -112,6 +112,21 @@ class QdrantManager:
             logger.error(f"Failed to ensure collection {collection_name}: {e}")
             return False
     
+    def ensure_payload_collection(self, collection_name: str) -> bool:
+        """Ensure a payload-only collection (no vectors) exists, for metadata records."""
+        try:
+            collections = self.client.get_collections()
+            if collection_name in [col.name for col in collections.collections]:
+                return True
+            
+            self.client.create_collection(collection_name=collection_name, vectors_config={})
+            logger.info(f"Created payload-only collection {collection_name}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to ensure collection {collection_name}: {e}")
+            return False
+    
     def batch_upsert(self, collection_name: str, points: List[models.PointStruct], 
                     batch_size: int = None) -> Dict[str, Any]:
         from config import BATCH_SIZE
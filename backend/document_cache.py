@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    DOCUMENT_CACHE_MAX_ENTRIES,
+    DOCUMENT_CACHE_MAX_MEMORY_MB,
+    DOCUMENT_CACHE_MMAP_THRESHOLD_KB,
+    DOCUMENT_CACHE_TTL_SECONDS,
+    DOCUMENT_CACHE_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+class ActiveDocumentCache:
+    """
+    Bounded LRU of reconstructed active documents keyed by (session, filename, version).
+    Callers look up the document's current version first, so a re-ingested or excluded
+    document misses even when no invalidation reached this process.
+    Small documents stay in memory; large ones are spilled to a memory-mapped file.
+    """
+
+    def __init__(self, max_entries: int = 64, max_memory_bytes: int = 64 * 1024 * 1024,
+                 mmap_threshold_bytes: int = 512 * 1024, ttl_seconds: int = 1800, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.mmap_threshold_bytes = mmap_threshold_bytes
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "livingos_document_cache")
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, session_id: Optional[str], filename: str, version: str) -> Optional[str]:
+        """Return the text of a cached document at this version, or None."""
+        key = (session_id or "", filename, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry["created_at"] > self.ttl_seconds:
+                if entry is not None:
+                    self._remove(key)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            if entry["mmap"] is not None:
+                return entry["mmap"][:].decode('utf-8')
+            return entry["text"]
+
+    def put(self, session_id: Optional[str], filename: str, version: str, text: str):
+        """Cache a reconstructed document."""
+        key = (session_id or "", filename, version)
+        data = text.encode('utf-8')
+        with self._lock:
+            # Older versions of the document are never asked for again
+            for stale in [k for k in self._entries if k[:2] == key[:2]]:
+                self._remove(stale)
+            entry = {"version": version, "text": None, "mmap": None, "path": None,
+                     "size": len(data), "created_at": time.time()}
+
+            if len(data) >= self.mmap_threshold_bytes:
+                try:
+                    entry["path"], entry["mmap"] = self._spill(key, version, data)
+                except Exception as e:
+                    logger.warning(f"Could not memory-map {filename}, keeping it in memory: {e}")
+
+            if entry["mmap"] is None:
+                entry["text"] = text
+                self._memory_bytes += entry["size"]
+
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries or (self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, filename: str) -> int:
+        """Drop a document from every session's cache."""
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == filename]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "memory_mapped": sum(1 for e in self._entries.values() if e["mmap"] is not None),
+                "memory_bytes": self._memory_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+    def _spill(self, key: Tuple[str, str, str], version: str, data: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{version}".encode('utf-8')).hexdigest()
+        path = os.path.join(self.cache_dir, f"{digest}.txt")
+        with open(path, "wb") as f:
+            f.write(data)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return path, mapped
+
+    def _remove(self, key: Tuple[str, str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry["mmap"] is not None:
+            try:
+                entry["mmap"].close()
+                os.remove(entry["path"])
+            except OSError as e:
+                logger.debug(f"Failed to clean up cached document file {entry['path']}: {e}")
+        else:
+            self._memory_bytes -= entry["size"]
+
+# Global instance
+document_cache = ActiveDocumentCache(
+    max_entries=DOCUMENT_CACHE_MAX_ENTRIES,
+    max_memory_bytes=DOCUMENT_CACHE_MAX_MEMORY_MB * 1024 * 1024,
+    mmap_threshold_bytes=DOCUMENT_CACHE_MMAP_THRESHOLD_KB * 1024,
+    ttl_seconds=DOCUMENT_CACHE_TTL_SECONDS,
+    cache_dir=DOCUMENT_CACHE_DIR
+)
+
+def invalidate_document(filename: str):
+    """Invalidate every in-process cache derived from a document after ingest, delete or exclusion changes."""
+    from answer_cache import answer_cache
+    from context_compression import context_compressor
+
+    document_cache.invalidate(filename)
+    answer_cache.invalidate_document(filename)
+    context_compressor.invalidate(filename)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class EventHub:
+    """
+    In-process publish/subscribe for per-session events (answer deltas, titles, ingest progress).
+    WebSocket connections subscribe a queue to the sessions they follow; publishers can be
+    coroutines or worker threads. Events reach connections held by the same worker process.
+    """
+
+    def __init__(self, queue_size: int = 1024):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def connect(self) -> asyncio.Queue:
+        """A queue for one connection; events that do not fit are dropped rather than blocking publishers."""
+        self._loop = asyncio.get_running_loop()
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    def subscribe(self, session_id: str, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers[session_id].add(queue)
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(session_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[session_id]
+
+    def disconnect(self, queue: asyncio.Queue):
+        with self._lock:
+            for session_id in [s for s, queues in self._subscribers.items() if queue in queues]:
+                self._subscribers[session_id].discard(queue)
+                if not self._subscribers[session_id]:
+                    del self._subscribers[session_id]
+
+    def has_subscribers(self, session_id: Optional[str]) -> bool:
+        return bool(session_id) and session_id in self._subscribers
+
+    def publish(self, session_id: Optional[str], event: Dict[str, Any]):
+        """Deliver an event to every connection following the session. Safe to call from any thread."""
+        if not self.has_subscribers(session_id) or self._loop is None:
+            return
+        event = {**event, "session_id": session_id}
+        self._stats["published"] += 1
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(session_id, event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, session_id, event)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "sessions": len(self._subscribers)}
+
+    def _deliver(self, session_id: str, event: Dict[str, Any]):
+        with self._lock:
+            queues = list(self._subscribers.get(session_id, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+                self._stats["delivered"] += 1
+            except asyncio.QueueFull:
+                self._stats["dropped"] += 1
+                logger.warning(f"Dropped {event.get('type')} event for a slow connection on session {session_id}")
+
+# Global instance
+event_hub = EventHub()
@@ -2,6 +2,8 @@ import os
 import logging
 import google.generativeai as genai
 from langsmith import traceable
+from context_assembler import estimate_tokens
+from rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +39,8 @@ CONTEXT:
 QUESTION:
 {query}
 """
-            response = self.model.generate_content(prompt)
+            async with rate_limiter.slot("gemini", estimate_tokens(prompt) + 2048):
+                response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
             logger.error(f"Gemini API Error: {e}")
@@ -64,8 +67,8 @@ QUESTION:
             # SAFEST APPROACH: Use simple HTTP request for this specific isolated task
             # to guarantee no interference with the global `genai` object used by the main chat.
             
-            import aiohttp
             import json
+            from http_clients import http_clients
             
             url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key_2}"
             
@@ -96,15 +99,16 @@ QUESTION:
                 }
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status != 200:
-                        logger.error(f"Gemini Intent API failed: {await response.text()}")
-                        return {"intent": "chat", "keywords": [], "needs_context": True}
-                    
-                    result = await response.json()
-                    text_response = result['candidates'][0]['content']['parts'][0]['text']
-                    return json.loads(text_response)
+            # Shared pooled client keeps the TLS connection to Google warm between turns
+            async with rate_limiter.slot("gemini_intent", estimate_tokens(prompt) + 64):
+                response = await http_clients.get("gemini").post(url, json=payload)
+            if response.status_code != 200:
+                logger.error(f"Gemini Intent API failed: {response.text}")
+                return {"intent": "chat", "keywords": [], "needs_context": True}
+            
+            result = response.json()
+            text_response = result['candidates'][0]['content']['parts'][0]['text']
+            return json.loads(text_response)
                     
         except Exception as e:
             logger.error(f"Intent Analysis Error: {e}")
@@ -1,8 +1,13 @@
 import os
+import asyncio
 import logging
-from groq import Groq
+from groq import Groq, AsyncGroq
 import json
+import time
 from langsmith import traceable
+from context_assembler import estimate_tokens
+from rate_limiter import rate_limiter, Priority
+from circuit_breaker import circuit_breakers
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +18,8 @@ class GroqClient:
         load_dotenv()
         
         self.api_key = os.getenv("GROQ_API_KEY")
+        self._async_client = None
+        self._async_http_client = None
         
         if not self.api_key:
             logger.warning("GROQ_API_KEY not found in environment")
@@ -52,10 +59,36 @@ class GroqClient:
             logger.error(f"Groq model test failed: {e}")
             return False
 
+    def async_client(self) -> AsyncGroq:
+        """Non-blocking Groq client on the pooled HTTP connections of the "groq" service."""
+        from http_clients import http_clients
+        http_client = http_clients.get("groq")
+        # Rebuilt when the registry replaced a closed client
+        if self._async_client is None or self._async_http_client is not http_client:
+            self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_client)
+            self._async_http_client = http_client
+        return self._async_client
+
+    async def complete(self, prompt: str, model: str = None, max_tokens: int = 1024, temperature: float = 0.3,
+                       priority: Priority = Priority.BACKGROUND) -> str:
+        """Single-prompt completion that awaits the API instead of blocking the event loop."""
+        if not self.client:
+            raise RuntimeError("Groq client not initialized. Please check GROQ_API_KEY.")
+        async with rate_limiter.slot("groq", estimate_tokens(prompt) + max_tokens, priority) as slot:
+            completion = await self.async_client().chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=model or self.extractor_model,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            slot.record_usage(getattr(completion.usage, "total_tokens", None))
+        return completion.choices[0].message.content or ""
+
     @traceable(run_type="llm", name="groq_aggregation")
-    async def aggregate_responses(self, query: str, context: str, responses: dict) -> str:
+    async def aggregate_responses(self, query: str, context: str, responses: dict, on_delta=None) -> str:
         """
         Aggregates responses from multiple models and selects/synthesizes the best answer.
+        With on_delta, the answer is streamed and each text delta is passed to it (from a worker thread).
         """
         if not self.client:
             return "Groq client not initialized."
@@ -72,7 +105,7 @@ Your goal is to provide the SINGLE BEST ANSWER to the user.
 USER QUERY: {query}
 
 CONTEXT FROM KNOWLEDGE BASE:
-{context[:2000]}... (truncated)
+{context}
 
 MODEL RESPONSES:
 {inputs_text}
@@ -85,20 +118,47 @@ INSTRUCTIONS:
 5. If all models failed or gave bad info, rely on the Context and your own knowledge to answer.
 """
 
+        start_time = time.time()
         try:
-            completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": "Please provide the final best answer."}
-                ],
-                model=self.aggregator_model,
-                temperature=0.5,
-            )
-            return completion.choices[0].message.content
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": "Please provide the final best answer."}
+            ]
+            async with rate_limiter.slot("groq", estimate_tokens(system_prompt) + 1024) as slot:
+                if on_delta is None:
+                    completion = self.client.chat.completions.create(
+                        messages=messages,
+                        model=self.aggregator_model,
+                        temperature=0.5,
+                    )
+                    slot.record_usage(getattr(completion.usage, "total_tokens", None))
+                    answer = completion.choices[0].message.content
+                else:
+                    answer = await asyncio.to_thread(self._stream_aggregation, messages, on_delta)
+            from response_agreement import agreement_detector
+            agreement_detector.record_aggregation(time.time() - start_time)
+            circuit_breakers.get("groq").record_success(time.time() - start_time)
+            return answer
         except Exception as e:
             logger.error(f"Groq Aggregation Error: {e}")
+            circuit_breakers.get("groq").record_failure(time.time() - start_time)
             return f"Error during aggregation: {str(e)}"
 
+    def _stream_aggregation(self, messages: list, on_delta) -> str:
+        parts = []
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            model=self.aggregator_model,
+            temperature=0.5,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return "".join(parts)
+
     @traceable(run_type="tool", name="groq_fact_extraction")
     async def extract_facts(self, query: str, answer: str) -> list:
         """
@@ -118,15 +178,18 @@ Example: {"facts": ["Server port changed to 3000", "Database migration failed du
         user_content = f"Query: {query}\n\nAnswer: {answer}"
 
         try:
-            completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                model=self.extractor_model,
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
+            # Background work: yields to interactive calls on the shared Groq key
+            async with rate_limiter.slot("groq", estimate_tokens(system_prompt + user_content) + 512, Priority.BACKGROUND) as slot:
+                completion = self.client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    model=self.extractor_model,
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+                slot.record_usage(getattr(completion.usage, "total_tokens", None))
             content = completion.choices[0].message.content
             result = json.loads(content)
             facts = result.get("facts", [])
@@ -135,4 +198,83 @@ Example: {"facts": ["Server port changed to 3000", "Database migration failed du
             logger.error(f"Groq Fact Extraction Error: {e}")
             return []
 
+    async def extract_facts_batch(self, exchanges: list) -> list:
+        """
+        Extracts facts for several (query, answer) exchanges in one call.
+        Returns one list of facts per exchange, in input order.
+        """
+        if not self.client or not exchanges:
+            return [[] for _ in exchanges]
+
+        system_prompt = """You are a Memory Assistant.
+Extract key FACTS, DECISIONS, or CODE SNIPPETS from each numbered Q&A exchange.
+Output ONLY a valid JSON object with an "exchanges" array containing one object per exchange,
+each with the exchange "index" and a "facts" array of strings.
+Ignore conversational filler.
+Ensure all strings are properly escaped for JSON (e.g. escape quotes, backslashes, and control characters).
+Example: {"exchanges": [{"index": 0, "facts": ["Server port changed to 3000"]}, {"index": 1, "facts": []}]}
+"""
+
+        user_content = "\n\n".join(
+            f"### Exchange {i}\nQuery: {query}\n\nAnswer: {answer}" for i, (query, answer) in enumerate(exchanges)
+        )
+
+        facts_per_exchange = [[] for _ in exchanges]
+        try:
+            async with rate_limiter.slot("groq", estimate_tokens(system_prompt + user_content) + 256 * len(exchanges), Priority.BACKGROUND) as slot:
+                completion = await self.async_client().chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    model=self.extractor_model,
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+                slot.record_usage(getattr(completion.usage, "total_tokens", None))
+            result = json.loads(completion.choices[0].message.content)
+            for item in result.get("exchanges", []):
+                index = item.get("index") if isinstance(item, dict) else None
+                facts = item.get("facts", []) if isinstance(item, dict) else []
+                if isinstance(index, int) and 0 <= index < len(exchanges) and isinstance(facts, list):
+                    facts_per_exchange[index] = [str(f) for f in facts]
+        except Exception as e:
+            logger.error(f"Groq Batch Fact Extraction Error: {e}")
+        return facts_per_exchange
+
+    async def summarize_conversation(self, summary: str, messages: list, max_tokens: int = 300) -> str:
+        """
+        Folds older conversation messages into the running summary of a session.
+        Returns the updated summary, or an empty string on failure.
+        """
+        if not self.client or not messages:
+            return ""
+
+        system_prompt = f"""You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the new messages into the existing summary.
+Keep the user's goals, questions, decisions, stated preferences, and key facts or conclusions from the answers.
+Drop greetings, filler, formatting, and source listings.
+Write compact plain prose of at most {max_tokens * 3 // 4} words. Output ONLY the updated summary.
+"""
+
+        transcript = "\n\n".join(f"{m['role'].title()}: {m['content']}" for m in messages)
+        user_content = f"EXISTING SUMMARY:\n{summary or '(none)'}\n\nNEW MESSAGES:\n{transcript}"
+
+        try:
+            async with rate_limiter.slot("groq", estimate_tokens(system_prompt + user_content) + max_tokens, Priority.BACKGROUND) as slot:
+                completion = await self.async_client().chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    model=self.extractor_model,
+                    temperature=0.1,
+                    max_tokens=max_tokens
+                )
+                slot.record_usage(getattr(completion.usage, "total_tokens", None))
+            return (completion.choices[0].message.content or "").strip()
+        except Exception as e:
+            logger.error(f"Groq Conversation Summary Error: {e}")
+            return ""
+
 groq_client = GroqClient()
\ No newline at end of file
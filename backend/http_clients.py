@@ -0,0 +1,107 @@
+import importlib.util
+import logging
+import threading
+from typing import Any, Dict
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+    HTTP2_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+class HTTPClientRegistry:
+    """
+    Application-lifetime pooled httpx clients, one per named service.
+    Started and closed from the FastAPI lifespan so every outbound call reuses
+    warm TCP/TLS connections instead of paying a handshake per request.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, timeout: float = 60.0, http2: bool = True):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        # HTTP/2 needs the optional h2 package
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    async def start(self):
+        """Create the default client eagerly at application startup."""
+        self.get("default")
+        logger.info(f"HTTP client registry started (http2={'on' if self.http2 else 'off'}, "
+                    f"max_connections={self.limits.max_connections})")
+
+    async def close(self):
+        """Close every pooled client at application shutdown."""
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for name, client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {name}: {e}")
+        logger.info("HTTP client registry closed")
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        """Return the shared client for a service, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None or client.is_closed:
+                stats = self._stats.setdefault(name, {"requests": 0, "new_connections": 0})
+                client = httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._make_request_hook(stats)]}
+                )
+                self._clients[name] = client
+            return client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection reuse per service: requests sent vs. new connections opened."""
+        with self._lock:
+            services = {}
+            for name, stats in self._stats.items():
+                requests = stats["requests"]
+                services[name] = {
+                    **stats,
+                    "reuse_rate": 1 - stats["new_connections"] / requests if requests else 0.0
+                }
+            return {
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "services": services
+            }
+
+    def _make_request_hook(self, stats: Dict[str, int]):
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                stats["new_connections"] += 1
+
+        async def on_request(request: httpx.Request):
+            stats["requests"] += 1
+            request.extensions["trace"] = trace
+
+        return on_request
+
+# Global instance
+http_clients = HTTPClientRegistry(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    timeout=HTTP_TIMEOUT,
+    http2=HTTP2_ENABLED
+)
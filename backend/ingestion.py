@@ -42,6 +42,19 @@ class DocumentProcessor:
         cleaned_text = self._clean_text(text)
         return self._get_model().encode(cleaned_text, normalize_embeddings=True).tolist()
     
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a batch of texts in a single model call."""
+        from config import VECTOR_SIZE
+        vectors = [[0.0] * VECTOR_SIZE for _ in texts]
+        indexed = [(i, self._clean_text(t)) for i, t in enumerate(texts) if t and t.strip()]
+        if not indexed:
+            return vectors
+        
+        encoded = self._get_model().encode([t for _, t in indexed], normalize_embeddings=True)
+        for (i, _), vector in zip(indexed, encoded):
+            vectors[i] = vector.tolist()
+        return vectors
+    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text for better embeddings."""
         # Remove excessive whitespace
@@ -244,6 +257,9 @@ processor = DocumentProcessor()
 def get_embedding(text: str) -> List[float]:
     return processor.get_embedding(text)
 
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    return processor.get_embeddings(texts)
+
 def chunk_text(text: str, chunk_size: int = 512, overlap: int = 64) -> List[str]:
     chunks = processor.chunk_text(text, chunk_size, overlap)
     return [chunk['text'] for chunk in chunks]
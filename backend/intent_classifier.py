@@ -0,0 +1,165 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import INTENT_CONFIDENCE_THRESHOLD, INTENT_REMOTE_FALLBACK
+from ingestion import get_embedding, get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Labeled examples for nearest-centroid classification
+INTENT_EXAMPLES = {
+    "summarize": [
+        "summarize this",
+        "summarize this document",
+        "give me a summary",
+        "tl;dr",
+        "what is this document about",
+        "give me the key points of this file",
+        "can you sum up the main ideas",
+        "brief overview of the uploaded pdf",
+        "outline the main sections of this report",
+        "what are the main takeaways from this document",
+    ],
+    "search": [
+        "what is the capital of France",
+        "how does the authentication flow work",
+        "what does the contract say about termination",
+        "find the section about pricing",
+        "which port does the server use",
+        "when was the project deadline",
+        "who is responsible for the database migration",
+        "what are the requirements for the api",
+        "explain how the caching layer works",
+        "where is the configuration for qdrant defined",
+    ],
+    "chat": [
+        "hello",
+        "hi there",
+        "how are you",
+        "tell me a joke",
+        "thanks",
+        "thank you so much",
+        "good morning",
+        "what can you do",
+        "who are you",
+        "let's chat",
+    ],
+}
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "for", "with", "at", "by", "from",
+    "about", "as", "into", "is", "are", "was", "were", "be", "been", "being", "do", "does", "did", "have",
+    "has", "had", "it", "its", "this", "that", "these", "those", "i", "me", "my", "we", "our", "you", "your",
+    "he", "she", "they", "them", "what", "which", "who", "whom", "when", "where", "why", "how", "can",
+    "could", "would", "should", "will", "shall", "may", "might", "must", "please", "tell", "give", "show",
+    "explain", "describe", "summarize", "summarise", "summary", "document", "file", "there", "here", "any",
+    "some", "all", "not", "no", "so", "than", "then", "just", "also", "very", "say", "says", "said",
+}
+
+class IntentClassifier:
+    """
+    Local nearest-centroid intent classifier over MiniLM embeddings.
+    Falls back to the remote Gemini classifier only when confidence is low.
+    """
+
+    def __init__(self, confidence_threshold: float = 0.6, remote_fallback: bool = True, temperature: float = 0.05):
+        self.confidence_threshold = confidence_threshold
+        self.remote_fallback = remote_fallback
+        self.temperature = temperature
+        self.labels = list(INTENT_EXAMPLES.keys())
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._local = 0
+        self._remote = 0
+
+    def warm_up(self):
+        """Embed the labeled examples once."""
+        self._get_centroids()
+
+    def classify(self, query: str, query_vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Classify a query locally. Pass the query embedding to avoid re-encoding it."""
+        start_time = time.perf_counter()
+        if query_vector is None:
+            query_vector = get_embedding(query)
+
+        scores = self._get_centroids() @ np.asarray(query_vector, dtype=np.float32)
+        probabilities = np.exp((scores - scores.max()) / self.temperature)
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        intent = self.labels[best]
+
+        return {
+            "intent": intent,
+            "keywords": self.extract_keywords(query) if intent != "chat" else [],
+            "needs_context": intent != "chat",
+            "confidence": float(probabilities[best]),
+            "source": "local",
+            "latency_ms": (time.perf_counter() - start_time) * 1000
+        }
+
+    async def analyze(self, query: str, query_vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Classify locally, using the remote Gemini call only below the confidence threshold."""
+        try:
+            result = self.classify(query, query_vector)
+        except Exception as e:
+            logger.error(f"Local intent classification failed: {e}")
+            result = {"intent": "chat", "keywords": [], "needs_context": True, "confidence": 0.0, "source": "local"}
+
+        # The remote classifier needs its own key; without it the local answer is the best we have
+        if result["confidence"] >= self.confidence_threshold or not self.remote_fallback or not os.getenv("GEMINI_API_2"):
+            with self._lock:
+                self._local += 1
+            return result
+
+        from gemini_client import gemini_client
+        logger.info(f"Low intent confidence ({result['confidence']:.2f}), falling back to Gemini")
+        remote = await gemini_client.analyze_intent(query)
+        with self._lock:
+            self._remote += 1
+        if remote.get("intent") in self.labels:
+            remote.setdefault("keywords", result["keywords"])
+            remote["source"] = "remote"
+            return remote
+        return result
+
+    def extract_keywords(self, query: str, max_keywords: int = 8) -> List[str]:
+        """Content words of the query, in order, without stopwords."""
+        keywords = []
+        for token in re.findall(r"[a-zA-Z0-9][\w\-\.]*[a-zA-Z0-9]|[a-zA-Z0-9]", query.lower()):
+            if token not in STOPWORDS and len(token) > 1 and token not in keywords:
+                keywords.append(token)
+        return keywords[:max_keywords]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._local + self._remote
+            return {
+                "local": self._local,
+                "remote_fallbacks": self._remote,
+                "local_rate": self._local / total if total else 0.0,
+                "confidence_threshold": self.confidence_threshold
+            }
+
+    def _get_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = []
+                    for label in self.labels:
+                        vectors = np.asarray(get_embeddings(INTENT_EXAMPLES[label]), dtype=np.float32)
+                        centroid = vectors.mean(axis=0)
+                        centroids.append(centroid / np.linalg.norm(centroid))
+                    self._centroids = np.stack(centroids)
+        return self._centroids
+
+# Global instance
+intent_classifier = IntentClassifier(
+    confidence_threshold=INTENT_CONFIDENCE_THRESHOLD,
+    remote_fallback=INTENT_REMOTE_FALLBACK
+)
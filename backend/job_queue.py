@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import (
+    JOB_QUEUE_DB_PATH,
+    JOB_QUEUE_CONCURRENCY,
+    JOB_QUEUE_MAX_ATTEMPTS,
+    JOB_QUEUE_RETRY_BASE_SECONDS,
+    JOB_QUEUE_RETENTION_SECONDS,
+    JOB_QUEUE_LEASE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class JobQueue:
+    """
+    Durable SQLite-backed job queue for background work.
+    Jobs survive restarts, are retried with exponential backoff, and each named
+    queue runs with its own concurrency limit so background load stays bounded.
+    Several worker processes can share the database: a job is claimed atomically under
+    a lease that its owner renews while it runs, and only expired leases are taken over.
+    """
+
+    def __init__(self, db_path: str, concurrency: Dict[str, int], max_attempts: int = 5,
+                 retry_base_seconds: float = 2.0, retention_seconds: int = 86400, poll_seconds: float = 1.0,
+                 lease_seconds: float = 300.0):
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retention_seconds = retention_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def register(self, name: str, handler: Callable[..., Awaitable[Any]], queue: str = "default",
+                 max_attempts: Optional[int] = None):
+        """
+        Register an async handler; jobs are enqueued by handler name with JSON-serializable kwargs.
+        A JSON-serializable return value is kept as the job's result.
+        """
+        self._handlers[name] = {"handler": handler, "queue": queue, "max_attempts": max_attempts or self.max_attempts}
+
+    def enqueue(self, name: str, job_id: Optional[str] = None, **kwargs) -> str:
+        """Persist a job and wake its queue. Returns the job ID (generated unless given)."""
+        if name not in self._handlers:
+            raise ValueError(f"No job handler registered for {name}")
+        handler = self._handlers[name]
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO jobs (id, queue, name, payload, status, attempts, max_attempts, run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                (job_id, handler["queue"], name, json.dumps(kwargs), QUEUED, handler["max_attempts"], now, now, now)
+            )
+        wakeup = self._wakeups.get(handler["queue"])
+        if wakeup:
+            wakeup.set()
+        return job_id
+
+    async def start(self):
+        """Requeue jobs whose owner stopped renewing their lease and start the worker pools."""
+        self._stopping = False
+        now = time.time()
+        with self._lock:
+            # Jobs of live workers keep their lease; jobs claimed before leases existed have none
+            recovered = self._db().execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, now, RUNNING, now)
+            ).rowcount
+        if recovered:
+            logger.info(f"Requeued {recovered} interrupted jobs")
+
+        loop = asyncio.get_running_loop()
+        queues = set(self.concurrency) | {handler["queue"] for handler in self._handlers.values()}
+        for queue in queues:
+            self._wakeups[queue] = asyncio.Event()
+            for _ in range(max(1, self.concurrency.get(queue, 1))):
+                self._workers.append(loop.create_task(self._worker(queue)))
+        self._workers.append(loop.create_task(self._cleanup_loop()))
+        self._workers.append(loop.create_task(self._lease_loop()))
+        logger.info(f"Job queue started: {', '.join(f'{q}={self.concurrency.get(q, 1)}' for q in sorted(queues))}")
+
+    async def stop(self, timeout: float = 15.0):
+        """Stop claiming jobs, give running jobs time to finish, then cancel the rest (they are requeued on start)."""
+        self._stopping = True
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        running = list(self._running.values())
+        if running:
+            await asyncio.wait(running, timeout=timeout)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        # Hand cancelled jobs back right away instead of waiting for their leases to expire
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, updated_at = ? WHERE status = ? AND owner = ?",
+                (QUEUED, time.time(), RUNNING, self.owner)
+            )
+        logger.info("Job queue stopped")
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db().execute("SELECT queue, status, COUNT(*) FROM jobs GROUP BY queue, status").fetchall()
+            failures = self._db().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT 10", (FAILED,)
+            ).fetchall()
+        queues: Dict[str, Dict[str, Any]] = {}
+        for queue, status, count in rows:
+            queues.setdefault(queue, {"concurrency": self.concurrency.get(queue, 1)})[status] = count
+        for queue, limit in self.concurrency.items():
+            queues.setdefault(queue, {"concurrency": limit})
+        return {
+            "queues": queues,
+            "running": len(self._running),
+            "recent_failures": [self._row_to_dict(row) for row in failures]
+        }
+
+    async def _worker(self, queue: str):
+        wakeup = self._wakeups[queue]
+        while not self._stopping:
+            job = self._claim(queue)
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                continue
+
+            task = asyncio.current_task()
+            self._running[job["id"]] = task
+            try:
+                await self._execute(job)
+            finally:
+                self._running.pop(job["id"], None)
+
+    async def _execute(self, job: Dict[str, Any]):
+        handler = self._handlers.get(job["name"])
+        try:
+            if handler is None:
+                raise ValueError(f"No job handler registered for {job['name']}")
+            result = await handler["handler"](**json.loads(job["payload"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            if attempts >= job["max_attempts"]:
+                logger.error(f"Job {job['name']} {job['id']} failed permanently after {attempts} attempts: {e}")
+                self._update(job["id"], FAILED, attempts, error=str(e))
+            else:
+                delay = self.retry_base_seconds * (2 ** (attempts - 1))
+                logger.warning(f"Job {job['name']} {job['id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                self._update(job["id"], QUEUED, attempts, error=str(e), run_at=time.time() + delay)
+            return
+        self._update(job["id"], SUCCEEDED, job["attempts"] + 1, result=json.dumps(result) if result is not None else None)
+
+    def _claim(self, queue: str) -> Optional[Dict[str, Any]]:
+        """Take the next due job (or one whose owner's lease expired); the guarded UPDATE makes the claim atomic."""
+        with self._lock:
+            db = self._db()
+            for _ in range(5):
+                now = time.time()
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE queue = ? AND ((status = ? AND run_at <= ?) OR (status = ? AND lease_until < ?)) "
+                    "ORDER BY run_at LIMIT 1",
+                    (queue, QUEUED, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = db.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? "
+                    "WHERE id = ? AND ((status = ? AND run_at <= ?) OR (status = ? AND lease_until < ?))",
+                    (RUNNING, self.owner, now + self.lease_seconds, now, row["id"], QUEUED, now, RUNNING, now)
+                ).rowcount
+                if claimed:
+                    if row["status"] == RUNNING:
+                        logger.warning(f"Took over job {row['name']} {row['id']} after its lease expired")
+                    return dict(row)
+                # Another worker process claimed it first
+        return None
+
+    def _update(self, job_id: str, status: str, attempts: int, error: Optional[str] = None,
+                run_at: Optional[float] = None, result: Optional[str] = None):
+        with self._lock:
+            updated = self._db().execute(
+                "UPDATE jobs SET status = ?, attempts = ?, last_error = COALESCE(?, last_error), "
+                "run_at = COALESCE(?, run_at), result = COALESCE(?, result), owner = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ? AND owner = ?",
+                (status, attempts, error, run_at, result, time.time(), job_id, self.owner)
+            ).rowcount
+        if not updated:
+            logger.warning(f"Job {job_id} was taken over by another worker; its outcome here is discarded")
+
+    async def _lease_loop(self):
+        """Renew the leases of jobs running in this process."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if self._running:
+                    with self._lock:
+                        self._db().execute(
+                            "UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ?",
+                            (time.time() + self.lease_seconds, RUNNING, self.owner)
+                        )
+            except Exception as e:
+                logger.error(f"Job lease renewal failed: {e}")
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                with self._lock:
+                    self._db().execute(
+                        "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                        (SUCCEEDED, FAILED, time.time() - self.retention_seconds)
+                    )
+            except Exception as e:
+                logger.error(f"Job cleanup failed: {e}")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, queue TEXT NOT NULL, name TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, "
+                "run_at REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL, last_error TEXT, result TEXT, "
+                "owner TEXT, lease_until REAL)"
+            )
+            # Databases created before job results and leases were kept
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]
+            for column, column_type in (("result", "TEXT"), ("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (queue, status, run_at)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job.pop("payload", None)
+        if job.get("result") is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+# Global instance
+job_queue = JobQueue(
+    db_path=JOB_QUEUE_DB_PATH,
+    concurrency=JOB_QUEUE_CONCURRENCY,
+    max_attempts=JOB_QUEUE_MAX_ATTEMPTS,
+    retry_base_seconds=JOB_QUEUE_RETRY_BASE_SECONDS,
+    retention_seconds=JOB_QUEUE_RETENTION_SECONDS,
+    lease_seconds=JOB_QUEUE_LEASE_SECONDS
+)
@@ -1,8 +1,27 @@
 import os
+import asyncio
 import logging
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
 from langsmith import Client
 
+from config import (
+    CONVERSATION_MEMORY_BACKEND,
+    CONVERSATION_MEMORY_MAX_SESSIONS,
+    CONVERSATION_MEMORY_MAX_MESSAGES,
+    CONVERSATION_MEMORY_TTL_SECONDS,
+    CONVERSATION_MEMORY_DB_PATH,
+    CONVERSATION_SUMMARY_ENABLED,
+    CONVERSATION_SUMMARY_MAX_TOKENS,
+    CONVERSATION_VERBATIM_MESSAGES,
+    CONVERSATION_VERBATIM_MAX_TOKENS,
+)
+
 logger = logging.getLogger(__name__)
 
 # Initialize LangSmith tracing
@@ -10,11 +29,285 @@ os.environ["LANGCHAIN_TRACING_V2"] = "true"
 os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGCHAIN_API_KEY", "")
 os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGCHAIN_PROJECT", "livingos-ai")
 
+# Sources footer appended to workflow answers; it carries nothing worth repeating in a prompt
+SOURCES_FOOTER = re.compile(r"\n+---\n\*\*Sources:\*\*.*\Z", re.DOTALL)
+
+class ConversationMemoryBackend(ABC):
+    """
+    Storage for per-session conversation state: a running summary of folded turns and
+    the messages not yet folded into it ({"role", "content", "seq"} dicts, oldest first).
+    seq increases with every stored message, so a fold names exactly the messages it covers.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        ...
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def fold(self, session_id: str, summary: str, through_seq: int):
+        """Replace the summary and drop the messages it now covers (seq up to through_seq)."""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+class LRUMemoryBackend(ConversationMemoryBackend):
+    """Bounded in-process store: least recently used sessions are evicted, idle sessions expire."""
+
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 20, ttl_seconds: int = 86400):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        entry = self.lookup(session_id)
+        return entry if entry is not None else []
+
+    def lookup(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Messages of a cached session, or None when it is not cached."""
+        with self._lock:
+            entry = self._entry(session_id)
+            return [dict(m) for m in entry["messages"]] if entry is not None else None
+
+    def put(self, session_id: str, messages: List[Dict[str, str]]):
+        with self._lock:
+            entry = self._entry(session_id) or {"summary": "", "next_seq": 0}
+            entry = dict(entry, messages=[])
+            self._store(session_id, self._with_messages(entry, messages))
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        with self._lock:
+            entry = self._entry(session_id) or {"summary": "", "messages": [], "next_seq": 0}
+            self._store(session_id, self._with_messages(entry, messages))
+
+    def get_summary(self, session_id: str) -> str:
+        with self._lock:
+            entry = self._entry(session_id)
+            return entry["summary"] if entry is not None else ""
+
+    def fold(self, session_id: str, summary: str, through_seq: int):
+        with self._lock:
+            entry = self._entry(session_id) or {"messages": [], "next_seq": 0}
+            self._store(session_id, dict(entry, summary=summary,
+                                         messages=[m for m in entry["messages"] if m["seq"] > through_seq]))
+
+    def _with_messages(self, entry: Dict[str, Any], messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """The entry with messages appended under new sequence numbers, trimmed to max_messages."""
+        next_seq = entry.get("next_seq", 0)
+        numbered = [{"role": m["role"], "content": m["content"], "seq": next_seq + i} for i, m in enumerate(messages)]
+        return dict(entry, messages=(entry["messages"] + numbered)[-self.max_messages:], next_seq=next_seq + len(messages))
+
+    def _entry(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if time.time() - entry["touched_at"] > self.ttl_seconds:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return entry
+
+    def _store(self, session_id: str, entry: Dict[str, Any]):
+        entry["touched_at"] = time.time()
+        self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def contains(self, session_id: str) -> bool:
+        return self.lookup(session_id) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+class SQLiteMemoryBackend(ConversationMemoryBackend):
+    """Node-local store in SQLite (WAL mode), shared by every worker process on the machine."""
+
+    def __init__(self, db_path: str, max_messages: int = 20, ttl_seconds: int = 86400):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._appends = 0
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT role, content, seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, self.max_messages)
+            ).fetchall()
+        return [{"role": role, "content": content, "seq": seq} for role, content, seq in reversed(rows)]
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, m["role"], m["content"], now) for m in messages]
+                )
+                db.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq NOT IN "
+                    "(SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+                    (session_id, session_id, self.max_messages)
+                )
+                self._appends += 1
+                # Expire idle sessions now and then rather than on every write
+                if self._appends % 100 == 0:
+                    db.execute("DELETE FROM messages WHERE created_at < ?", (now - self.ttl_seconds,))
+                    db.execute("DELETE FROM summaries WHERE updated_at < ?", (now - self.ttl_seconds,))
+
+    def get_summary(self, session_id: str) -> str:
+        with self._lock:
+            row = self._db().execute("SELECT summary FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else ""
+
+    def fold(self, session_id: str, summary: str, through_seq: int):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute(
+                    "INSERT INTO summaries (session_id, summary, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                    (session_id, summary, time.time())
+                )
+                db.execute("DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, through_seq))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = self._db().execute("SELECT COUNT(DISTINCT session_id) FROM messages").fetchone()[0]
+        return {"sessions": sessions, "db_path": self.db_path}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, role TEXT NOT NULL, "
+                "content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, seq)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+class ChatSessionsMemoryBackend(ConversationMemoryBackend):
+    """
+    LRU cache that rebuilds a session's history from the chat_sessions collection on a miss,
+    so every worker converges on the persisted conversation.
+    """
+
+    def __init__(self, cache: LRUMemoryBackend, collection_name: str = "chat_sessions"):
+        self.cache = cache
+        self.collection_name = collection_name
+        self._rebuilds = 0
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        messages = self.cache.lookup(session_id)
+        if messages is None:
+            messages = self._load(session_id)
+            self.cache.put(session_id, messages)
+            self._rebuilds += 1
+        return messages
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        # Uncached sessions are rebuilt from chat_sessions, which already holds these messages
+        cached = self.cache.lookup(session_id)
+        if cached is None:
+            return
+        # A rebuild after the turn was persisted has already picked it up
+        if [(m["role"], m["content"]) for m in cached[-len(messages):]] == [(m["role"], m["content"]) for m in messages]:
+            return
+        self.cache.append(session_id, messages)
+
+    def get_summary(self, session_id: str) -> str:
+        # A rebuilt session starts without a summary; its messages are folded again
+        return self.cache.get_summary(session_id)
+
+    def fold(self, session_id: str, summary: str, through_seq: int):
+        self.cache.fold(session_id, summary, through_seq)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.cache.get_stats(), "rebuilds": self._rebuilds}
+
+    def _load(self, session_id: str) -> List[Dict[str, str]]:
+        from database import qdrant_manager
+        from chat_write_buffer import chat_write_buffer
+        from qdrant_client.http import models
+
+        points, _ = qdrant_manager.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=models.Filter(must=[
+                models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id))
+            ]),
+            limit=self.cache.max_messages,
+            order_by=models.OrderBy(key="ts", direction=models.Direction.DESC),
+            with_payload=["role", "content", "ts"],
+            with_vectors=False
+        )
+        payloads = {str(p.id): p.payload for p in points}
+        for record in chat_write_buffer.pending_for_session(session_id):
+            payloads.setdefault(record["id"], record["payload"])
+        ordered = sorted(payloads.values(), key=lambda p: p.get("ts", 0.0))
+        messages = [
+            {"role": p.get("role"), "content": p.get("content", "")}
+            for p in ordered if p.get("role") in ("user", "assistant")
+        ]
+        # A trailing unanswered question is the turn still in flight: it is not history yet,
+        # and the langchain_memory job appends it together with its answer
+        while messages and messages[-1]["role"] == "user":
+            messages.pop()
+        return messages[-self.cache.max_messages:]
+
+def create_memory_backend(kind: str) -> ConversationMemoryBackend:
+    """Build the configured conversation memory backend: lru, sqlite or chat_sessions."""
+    if kind == "sqlite":
+        return SQLiteMemoryBackend(
+            CONVERSATION_MEMORY_DB_PATH,
+            max_messages=CONVERSATION_MEMORY_MAX_MESSAGES,
+            ttl_seconds=CONVERSATION_MEMORY_TTL_SECONDS
+        )
+    cache = LRUMemoryBackend(
+        max_sessions=CONVERSATION_MEMORY_MAX_SESSIONS,
+        max_messages=CONVERSATION_MEMORY_MAX_MESSAGES,
+        ttl_seconds=CONVERSATION_MEMORY_TTL_SECONDS
+    )
+    if kind == "chat_sessions":
+        return ChatSessionsMemoryBackend(cache)
+    if kind != "lru":
+        logger.warning(f"Unknown conversation memory backend {kind}, using lru")
+    return cache
+
+def strip_sources(content: str) -> str:
+    return SOURCES_FOOTER.sub("", content or "")
+
 class LangChainMemoryManager:
     """Simple memory manager with LangSmith tracing"""
     
-    def __init__(self):
-        self.memories: Dict[str, List[Dict[str, str]]] = {}
+    def __init__(self, backend: Optional[ConversationMemoryBackend] = None):
+        self.backend = backend or create_memory_backend(CONVERSATION_MEMORY_BACKEND)
+        self.summary_enabled = CONVERSATION_SUMMARY_ENABLED
+        self.verbatim_messages = CONVERSATION_VERBATIM_MESSAGES
+        self._summary_locks: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"summaries": 0, "messages_folded": 0}
         try:
             self.client = Client()
         except Exception as e:
@@ -22,37 +315,84 @@ class LangChainMemoryManager:
             self.client = None
     
     def add_conversation(self, session_id: str, user_message: str, ai_response: str):
-        """Add conversation to memory with LangSmith tracing"""
+        """Add conversation to memory; backend errors propagate so the langchain_memory job is retried"""
+        self.backend.append(session_id, [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": ai_response}
+        ])
+        
+        logger.info(f"Added conversation to memory for session {session_id}")
+    
+    async def summarize(self, session_id: str) -> bool:
+        """
+        Fold every message older than the verbatim tail into the session's running summary.
+        Returns whether anything was folded; raises when the summarizer fails so the job is retried.
+        """
+        if not self.summary_enabled:
+            return False
+        from context_assembler import truncate_to_tokens
+        from groq_client import groq_client
+        if not groq_client.client:
+            return False
+
+        # Per-session lock with a user count, so the lock map only holds sessions being summarized
+        entry = self._summary_locks.setdefault(session_id, {"lock": asyncio.Lock(), "users": 0})
+        entry["users"] += 1
+        try:
+            async with entry["lock"]:
+                messages = await asyncio.to_thread(self.backend.get, session_id)
+                older = messages[:-self.verbatim_messages] if self.verbatim_messages else messages
+                if not older:
+                    return False
+                summary = await asyncio.to_thread(self.backend.get_summary, session_id)
+                new_summary = await groq_client.summarize_conversation(
+                    summary,
+                    [{"role": m["role"], "content": strip_sources(m["content"])} for m in older],
+                    CONVERSATION_SUMMARY_MAX_TOKENS
+                )
+                if not new_summary:
+                    raise RuntimeError("summarizer returned no summary")
+                new_summary = truncate_to_tokens(new_summary, CONVERSATION_SUMMARY_MAX_TOKENS)
+                # By sequence number: messages trimmed or appended meanwhile do not shift what is dropped
+                await asyncio.to_thread(self.backend.fold, session_id, new_summary, older[-1]["seq"])
+                self._stats["summaries"] += 1
+                self._stats["messages_folded"] += len(older)
+                return True
+        finally:
+            entry["users"] -= 1
+            if not entry["users"]:
+                self._summary_locks.pop(session_id, None)
+
+    def get_recent_conversation(self, session_id: str) -> str:
+        """Running summary plus the latest turn verbatim, bounded for prompt context"""
         try:
-            if session_id not in self.memories:
-                self.memories[session_id] = []
-            
-            self.memories[session_id].append({"role": "user", "content": user_message})
-            self.memories[session_id].append({"role": "assistant", "content": ai_response})
-            
-            # Keep only last 20 messages
-            if len(self.memories[session_id]) > 20:
-                self.memories[session_id] = self.memories[session_id][-20:]
-            
-            logger.info(f"Added conversation to memory for session {session_id}")
+            from context_assembler import truncate_to_tokens
+            summary = self.backend.get_summary(session_id)
+            messages = self.backend.get(session_id)
+            recent_messages = messages[-self.verbatim_messages:] if self.verbatim_messages else []
+            parts = []
+            if summary:
+                parts.append(f"Summary of earlier conversation: {summary}")
+            if recent_messages:
+                per_message = CONVERSATION_VERBATIM_MAX_TOKENS // len(recent_messages)
+                parts.extend(
+                    f"{msg['role'].title()}: {truncate_to_tokens(strip_sources(msg['content']), per_message)}"
+                    for msg in recent_messages
+                )
+            return "\n".join(parts)
         except Exception as e:
-            logger.error(f"Failed to add conversation to memory: {e}")
+            logger.error(f"Failed to read recent conversation: {e}")
+            return ""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.backend.get_stats(), **self._stats, "summary_enabled": self.summary_enabled}
     
     def get_context_with_preferences(self, session_id: str, base_context: str) -> str:
         """Get enhanced context with conversation history"""
-        try:
-            if session_id in self.memories and self.memories[session_id]:
-                recent_messages = self.memories[session_id][-4:]  # Last 2 exchanges
-                recent_context = "\n".join([
-                    f"{msg['role'].title()}: {msg['content']}"
-                    for msg in recent_messages
-                ])
-                return f"RECENT CONVERSATION:\n{recent_context}\n\nCONTEXT:\n{base_context}"
-            
-            return base_context
-        except Exception as e:
-            logger.error(f"Failed to enhance context: {e}")
-            return base_context
+        recent_context = self.get_recent_conversation(session_id)
+        if recent_context:
+            return f"RECENT CONVERSATION:\n{recent_context}\n\nCONTEXT:\n{base_context}"
+        return base_context
 
 # Global instance
 _memory_manager = None
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 import os
 import sys
 
@@ -14,7 +15,116 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 if base_dir not in sys.path:
     sys.path.append(base_dir)
 
-app = FastAPI(title="LivingOS AI API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop application-lifetime resources."""
+    try:
+        from http_clients import http_clients
+        await http_clients.start()
+    except Exception as e:
+        print(f"Warning: HTTP client registry failed to start: {e}")
+    
+    # Embed the intent examples off the event loop so the first chat turn is fast
+    try:
+        import asyncio
+        from intent_classifier import intent_classifier
+        asyncio.get_running_loop().run_in_executor(None, intent_classifier.warm_up)
+    except Exception as e:
+        print(f"Warning: Intent classifier warm-up failed: {e}")
+    
+    # Move memories stored alongside documents into their own collection
+    try:
+        import asyncio
+        from memory_store import memory_store
+        asyncio.get_running_loop().run_in_executor(None, memory_store.migrate_legacy_memories)
+    except Exception as e:
+        print(f"Warning: Memory migration failed: {e}")
+    
+    try:
+        from memory_pipeline import memory_pipeline
+        memory_pipeline.start()
+    except Exception as e:
+        print(f"Warning: Memory pipeline failed to start: {e}")
+    
+    # Older chat messages only carry an ISO timestamp and have no session summary yet
+    try:
+        import asyncio
+        from routes.chat_sessions import build_session_index
+        await asyncio.get_running_loop().run_in_executor(None, build_session_index)
+    except Exception as e:
+        print(f"Warning: Session index build failed: {e}")
+    
+    # Replays chat messages that were acknowledged but not yet flushed before the last shutdown
+    try:
+        from chat_write_buffer import chat_write_buffer
+        chat_write_buffer.start()
+    except Exception as e:
+        print(f"Warning: Chat write buffer failed to start: {e}")
+    
+    # Titles stored as chat points move into the session index, then its cache is warmed
+    try:
+        import asyncio
+        from routes.chat_sessions import migrate_chat_metadata
+        asyncio.get_running_loop().run_in_executor(None, migrate_chat_metadata)
+    except Exception as e:
+        print(f"Warning: Chat metadata migration failed: {e}")
+    
+    try:
+        from job_queue import job_queue
+        await job_queue.start()
+    except Exception as e:
+        print(f"Warning: Job queue failed to start: {e}")
+    
+    try:
+        from memory_consolidation import memory_consolidator
+        memory_consolidator.start()
+    except Exception as e:
+        print(f"Warning: Memory consolidation failed to start: {e}")
+    
+    # Uploads archive segments left by earlier runs, then seals and uploads segments as they age
+    try:
+        from conversation_archive import conversation_archive
+        conversation_archive.start()
+    except Exception as e:
+        print(f"Warning: Conversation archive failed to start: {e}")
+    
+    yield
+    
+    try:
+        from memory_consolidation import memory_consolidator
+        await memory_consolidator.stop()
+    except Exception as e:
+        print(f"Warning: Memory consolidation failed to stop: {e}")
+    
+    # Let running jobs finish while buffered memories are stored, before the HTTP clients go away
+    try:
+        import asyncio
+        from job_queue import job_queue
+        from memory_pipeline import memory_pipeline
+        await asyncio.gather(job_queue.stop(), memory_pipeline.drain())
+    except Exception as e:
+        print(f"Warning: Background jobs failed to drain: {e}")
+    
+    try:
+        from chat_write_buffer import chat_write_buffer
+        await chat_write_buffer.drain()
+    except Exception as e:
+        print(f"Warning: Chat write buffer failed to drain: {e}")
+    
+    # After the job queue stopped, so no archive job appends to a sealed segment
+    try:
+        from conversation_archive import conversation_archive
+        await conversation_archive.stop()
+    except Exception as e:
+        print(f"Warning: Conversation archive failed to flush: {e}")
+    
+    try:
+        from http_clients import http_clients
+        await http_clients.close()
+    except Exception as e:
+        print(f"Warning: HTTP client registry failed to close: {e}")
+
+app = FastAPI(title="LivingOS AI API", version="1.0.0", lifespan=lifespan)
 
 # CORS Setup - Production ready
 app.add_middleware(
@@ -51,6 +161,109 @@ async def health():
     except Exception as e:
         status["services"]["groq"] = "unavailable"
     
+    # Aggregation shortcut statistics
+    try:
+        from response_agreement import agreement_detector
+        status["aggregation"] = agreement_detector.get_stats()
+    except Exception as e:
+        status["aggregation"] = {"error": str(e)}
+    
+    try:
+        from answer_cache import answer_cache
+        status["answer_cache"] = answer_cache.get_stats()
+    except Exception as e:
+        status["answer_cache"] = {"error": str(e)}
+    
+    try:
+        from document_cache import document_cache
+        status["document_cache"] = document_cache.get_stats()
+    except Exception as e:
+        status["document_cache"] = {"error": str(e)}
+    
+    try:
+        from http_clients import http_clients
+        status["http_clients"] = http_clients.get_stats()
+    except Exception as e:
+        status["http_clients"] = {"error": str(e)}
+    
+    try:
+        from intent_classifier import intent_classifier
+        status["intent_classifier"] = intent_classifier.get_stats()
+    except Exception as e:
+        status["intent_classifier"] = {"error": str(e)}
+    
+    try:
+        from rate_limiter import rate_limiter
+        status["rate_limits"] = rate_limiter.get_stats()
+    except Exception as e:
+        status["rate_limits"] = {"error": str(e)}
+    
+    try:
+        from circuit_breaker import circuit_breakers
+        status["circuit_breakers"] = circuit_breakers.get_states()
+    except Exception as e:
+        status["circuit_breakers"] = {"error": str(e)}
+    
+    try:
+        from request_coalescing import workflow_coalescer
+        status["request_coalescing"] = workflow_coalescer.get_stats()
+    except Exception as e:
+        status["request_coalescing"] = {"error": str(e)}
+    
+    try:
+        from memory_pipeline import memory_pipeline
+        status["memory_pipeline"] = memory_pipeline.get_stats()
+    except Exception as e:
+        status["memory_pipeline"] = {"error": str(e)}
+    
+    try:
+        from memory_consolidation import memory_consolidator
+        status["memory_consolidation"] = memory_consolidator.get_stats()
+    except Exception as e:
+        status["memory_consolidation"] = {"error": str(e)}
+    
+    try:
+        from job_queue import job_queue
+        status["job_queue"] = job_queue.get_stats()["queues"]
+    except Exception as e:
+        status["job_queue"] = {"error": str(e)}
+    
+    try:
+        from chat_write_buffer import chat_write_buffer
+        status["chat_write_buffer"] = chat_write_buffer.get_stats()
+    except Exception as e:
+        status["chat_write_buffer"] = {"error": str(e)}
+    
+    try:
+        from session_index import session_index
+        status["session_index"] = session_index.get_stats()
+    except Exception as e:
+        status["session_index"] = {"error": str(e)}
+    
+    try:
+        from langchain_memory import get_memory_manager
+        status["conversation_memory"] = get_memory_manager().get_stats()
+    except Exception as e:
+        status["conversation_memory"] = {"error": str(e)}
+    
+    try:
+        from event_hub import event_hub
+        status["event_hub"] = event_hub.get_stats()
+    except Exception as e:
+        status["event_hub"] = {"error": str(e)}
+    
+    try:
+        from conversation_archive import conversation_archive
+        status["conversation_archive"] = conversation_archive.get_stats()
+    except Exception as e:
+        status["conversation_archive"] = {"error": str(e)}
+    
+    try:
+        from summary_tree import summary_tree
+        status["summary_tree"] = summary_tree.get_stats()
+    except Exception as e:
+        status["summary_tree"] = {"error": str(e)}
+    
     return status
 
 print("Importing routes...")
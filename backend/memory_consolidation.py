@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    MEMORY_CONSOLIDATION_ENABLED,
+    MEMORY_CONSOLIDATION_INTERVAL_SECONDS,
+    MEMORY_CONSOLIDATION_SIMILARITY,
+    MEMORY_MAX_POINTS,
+)
+
+logger = logging.getLogger(__name__)
+
+class MemoryConsolidator:
+    """
+    Periodic job that keeps the shared memory set bounded: near-duplicate memories
+    are clustered by cosine similarity over their stored vectors and merged into a
+    single canonical record, and the oldest memories beyond the cap are dropped.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.9, interval_seconds: int = 3600,
+                 max_points: int = 5000, enabled: bool = True, block_size: int = 512):
+        self.similarity_threshold = similarity_threshold
+        self.interval_seconds = interval_seconds
+        self.max_points = max_points
+        self.enabled = enabled
+        self.block_size = block_size
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._last_run: Dict[str, Any] = {}
+
+    def start(self):
+        """Schedule consolidation on the running event loop."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def consolidate(self) -> Dict[str, Any]:
+        """Run one consolidation pass."""
+        async with self._lock:
+            result = await asyncio.to_thread(self._consolidate)
+            self._last_run = result
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self.interval_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "max_points": self.max_points,
+            "last_run": self._last_run
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.consolidate()
+            except Exception as e:
+                logger.error(f"Memory consolidation failed: {e}")
+
+    def _consolidate(self) -> Dict[str, Any]:
+        from database import qdrant_manager
+        from ingestion import get_embeddings
+        from memory_store import memory_store
+        from qdrant_client.http import models
+
+        start_time = time.time()
+        collection_name = memory_store.collection_name
+        points = self._load_memories(qdrant_manager.client, collection_name, models)
+        if len(points) < 2:
+            return {"memories": len(points), "clusters_merged": 0, "deleted": 0, "duration": time.time() - start_time}
+
+        # Newest first, so the newest memory of each cluster becomes its canonical record
+        points.sort(key=lambda p: p.payload.get("timestamp", 0) or 0, reverse=True)
+        vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        clusters = self._cluster(vectors)
+        merged = [cluster for cluster in clusters if len(cluster) > 1]
+
+        canonical_points, redundant_ids = [], []
+        if merged:
+            texts = [self._merge_text([points[i] for i in cluster]) for cluster in merged]
+            canonical_vectors = get_embeddings(texts)
+            for cluster, text, vector in zip(merged, texts, canonical_vectors):
+                canonical = points[cluster[0]]
+                payload = dict(canonical.payload)
+                payload["text"] = text
+                payload["consolidated_from"] = sum(points[i].payload.get("consolidated_from", 1) for i in cluster)
+                payload["consolidated_at"] = time.time()
+                canonical_points.append(models.PointStruct(id=canonical.id, vector=vector, payload=payload))
+                redundant_ids.extend(points[i].id for i in cluster[1:])
+
+        # Cap the memory set: clusters are ordered newest first, so the tail is the oldest
+        overflow = [points[cluster[0]].id for cluster in clusters[self.max_points:]]
+        redundant_ids.extend(overflow)
+
+        if canonical_points:
+            qdrant_manager.client.upsert(collection_name=collection_name, points=canonical_points, wait=True)
+        if redundant_ids:
+            qdrant_manager.client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=redundant_ids)
+            )
+
+        result = {
+            "memories": len(points),
+            "clusters_merged": len(merged),
+            "deleted": len(redundant_ids),
+            "pruned_oldest": len(overflow),
+            "remaining": min(len(clusters), self.max_points),
+            "duration": time.time() - start_time,
+            "ran_at": time.time()
+        }
+        logger.info(f"Memory consolidation: {result}")
+        return result
+
+    def _load_memories(self, client, collection_name: str, models) -> List[Any]:
+        memory_filter = models.Filter(must=[
+            models.FieldCondition(key="file_type", match=models.MatchValue(value="memory"))
+        ])
+        points, offset = [], None
+        while True:
+            batch, offset = client.scroll(
+                collection_name=collection_name,
+                scroll_filter=memory_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            points.extend(p for p in batch if p.vector is not None)
+            if offset is None:
+                return points
+
+    def _cluster(self, vectors: np.ndarray) -> List[List[int]]:
+        """Greedy leader clustering; similarities are computed block-wise to bound memory."""
+        assigned = np.zeros(len(vectors), dtype=bool)
+        clusters = []
+        for block_start in range(0, len(vectors), self.block_size):
+            similarities = vectors[block_start:block_start + self.block_size] @ vectors.T
+            for offset, row in enumerate(similarities):
+                i = block_start + offset
+                if assigned[i]:
+                    continue
+                members = np.nonzero((row >= self.similarity_threshold) & ~assigned)[0]
+                # i is always a member of its own cluster and leads it
+                members = [i] + [int(j) for j in members if j != i]
+                assigned[members] = True
+                clusters.append(members)
+        return clusters
+
+    def _merge_text(self, cluster_points: List[Any]) -> str:
+        """Newest memory's text with the facts of the whole cluster, deduplicated in order."""
+        facts = []
+        for point in cluster_points:
+            for fact in self._facts(point.payload.get("text", "")):
+                if fact.lower() not in (f.lower() for f in facts):
+                    facts.append(fact)
+
+        text = cluster_points[0].payload.get("text", "")
+        head = text.split("FACTS:", 1)[0].rstrip()
+        return f"{head}\nFACTS:\n{chr(10).join('- ' + f for f in facts)}\n"
+
+    @staticmethod
+    def _facts(text: str) -> List[str]:
+        if "FACTS:" not in text:
+            return []
+        section = text.split("FACTS:", 1)[1]
+        return [m.strip() for m in re.findall(r"^\s*-\s+(.+)$", section, flags=re.MULTILINE) if m.strip()]
+
+# Global instance
+memory_consolidator = MemoryConsolidator(
+    similarity_threshold=MEMORY_CONSOLIDATION_SIMILARITY,
+    interval_seconds=MEMORY_CONSOLIDATION_INTERVAL_SECONDS,
+    max_points=MEMORY_MAX_POINTS,
+    enabled=MEMORY_CONSOLIDATION_ENABLED
+)
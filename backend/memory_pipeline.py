@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from config import MEMORY_BATCH_SIZE, MEMORY_BATCH_MAX_DELAY_SECONDS, MEMORY_BATCH_MAX_TOKENS
+from context_assembler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class MemoryPipeline:
+    """
+    Buffers conversation exchanges and stores them as memories in micro-batches:
+    one fact-extraction call per group of exchanges, one batched embedding pass
+    and one non-blocking upsert per flush. Flushes on size or age; drained on shutdown.
+    """
+
+    def __init__(self, batch_size: int = 8, max_delay_seconds: float = 10.0, max_tokens: int = 6000):
+        self.batch_size = batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.max_tokens = max_tokens
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stats = {"exchanges": 0, "flushes": 0, "extraction_calls": 0, "stored": 0, "failed": 0}
+
+    def start(self):
+        """Start the periodic flusher on the running event loop."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def add(self, query: str, answer: str, session_id: Optional[str] = None) -> asyncio.Future:
+        """Queue an exchange for memory extraction. The returned future resolves once its batch is stored."""
+        done = asyncio.get_running_loop().create_future()
+        self._buffer.append({"query": query, "answer": answer, "session_id": session_id,
+                             "timestamp": time.time(), "done": done})
+        self._stats["exchanges"] += 1
+        self.start()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return done
+
+    async def submit(self, query: str, answer: str, session_id: Optional[str] = None):
+        """Queue an exchange and wait until it is stored; raises if its batch failed."""
+        await self.add(query, answer, session_id)
+
+    async def flush(self):
+        """Store every buffered exchange now."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                try:
+                    await self._store(batch)
+                except Exception as e:
+                    self._stats["failed"] += len(batch)
+                    logger.error(f"Memory batch of {len(batch)} exchanges failed: {e}")
+                    for item in batch:
+                        if not item["done"].done():
+                            item["done"].set_exception(e)
+                    continue
+                for item in batch:
+                    if not item["done"].done():
+                        item["done"].set_result(None)
+
+    async def drain(self):
+        """Stop the flusher and store whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("Memory pipeline drained")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "pending": len(self._buffer),
+            "batch_size": self.batch_size,
+            "max_delay_seconds": self.max_delay_seconds
+        }
+
+    async def _run(self):
+        while True:
+            timeout = self.max_delay_seconds
+            if self._buffer:
+                timeout = max(0.0, self._buffer[0]["timestamp"] + self.max_delay_seconds - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buffer and (len(self._buffer) >= self.batch_size
+                                 or time.time() - self._buffer[0]["timestamp"] >= self.max_delay_seconds):
+                await self.flush()
+
+    async def _store(self, batch: List[Dict[str, Any]]):
+        from groq_client import groq_client
+        from ingestion import get_embeddings
+        from memory_store import memory_store
+        from qdrant_client.http.models import PointStruct
+
+        # 1. Extract facts, several exchanges per call within the token budget
+        facts: List[List[str]] = []
+        for group in self._token_groups(batch):
+            facts.extend(await groq_client.extract_facts_batch([(item["query"], item["answer"]) for item in group]))
+            self._stats["extraction_calls"] += 1
+
+        # 2. Prepare text for ingestion
+        memory_texts = [f"""
+MEMORY TYPE: Conversation & Facts
+DATE: {time.strftime("%Y-%m-%d", time.localtime(item["timestamp"]))}
+QUERY: {item["query"]}
+ANSWER: {item["answer"]}
+FACTS:
+{chr(10).join(['- ' + f for f in item_facts])}
+""" for item, item_facts in zip(batch, facts)]
+
+        # 3. One embedding pass and one upsert for the whole batch
+        vectors = await asyncio.to_thread(get_embeddings, memory_texts)
+        points = [
+            PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vector,
+                payload={
+                    "text": memory_text,
+                    "filename": "conversation_memory.txt",
+                    "file_type": "memory",
+                    "chunk_index": 0,
+                    "is_fact": True,
+                    "timestamp": item["timestamp"],
+                    # No session_id for memories - they are shared across all chats
+                    "type": "memory"
+                }
+            )
+            for item, memory_text, vector in zip(batch, memory_texts, vectors)
+        ]
+        await asyncio.to_thread(memory_store.upsert, points, wait=False)
+
+        self._stats["flushes"] += 1
+        self._stats["stored"] += len(points)
+        logger.info(f"Stored {len(points)} memories from {len(batch)} exchanges")
+
+    def _token_groups(self, batch: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        groups, current, current_tokens = [], [], 0
+        for item in batch:
+            tokens = estimate_tokens(item["query"]) + estimate_tokens(item["answer"])
+            if current and current_tokens + tokens > self.max_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+# Global instance
+memory_pipeline = MemoryPipeline(
+    batch_size=MEMORY_BATCH_SIZE,
+    max_delay_seconds=MEMORY_BATCH_MAX_DELAY_SECONDS,
+    max_tokens=MEMORY_BATCH_MAX_TOKENS
+)
@@ -0,0 +1,87 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models
+
+from config import (
+    QDRANT_COLLECTION_NAME,
+    VECTOR_SIZE,
+    MEMORY_COLLECTION_NAME,
+    MEMORY_SEARCH_LIMIT,
+    MEMORY_SCORE_THRESHOLD,
+)
+from database import qdrant_manager
+
+logger = logging.getLogger(__name__)
+
+class MemoryStore:
+    """
+    Dedicated Qdrant collection for global conversation memories, kept apart from
+    session documents so each index has its own limit, threshold and cheap filters.
+    """
+
+    def __init__(self, collection_name: str = "memories", search_limit: int = 3, score_threshold: float = 0.6):
+        self.collection_name = collection_name
+        self.search_limit = search_limit
+        self.score_threshold = score_threshold
+
+    def ensure_collection(self):
+        qdrant_manager.ensure_collection(self.collection_name, vector_size=VECTOR_SIZE)
+        qdrant_manager.create_payload_index(self.collection_name, "file_type", models.PayloadSchemaType.KEYWORD)
+        qdrant_manager.create_payload_index(self.collection_name, "timestamp", models.PayloadSchemaType.FLOAT)
+
+    def search(self, query_vector: List[float], limit: Optional[int] = None,
+               score_threshold: Optional[float] = None, with_vectors: bool = False) -> List[models.ScoredPoint]:
+        """Nearest memories to a query vector."""
+        return qdrant_manager.advanced_search(
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            limit=limit or self.search_limit,
+            score_threshold=self.score_threshold if score_threshold is None else score_threshold,
+            with_vectors=with_vectors
+        )
+
+    def upsert(self, points: List[models.PointStruct], wait: bool = False):
+        qdrant_manager.client.upsert(collection_name=self.collection_name, points=points, wait=wait)
+
+    def migrate_legacy_memories(self, source_collection: str = QDRANT_COLLECTION_NAME) -> Dict[str, Any]:
+        """Move memories that were stored in the document collection into this one."""
+        memory_filter = models.Filter(must=[
+            models.FieldCondition(key="file_type", match=models.MatchValue(value="memory"))
+        ])
+        moved, offset = 0, None
+        while True:
+            batch, offset = qdrant_manager.client.scroll(
+                collection_name=source_collection,
+                scroll_filter=memory_filter,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            points = [models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in batch if p.vector is not None]
+            if points:
+                self.upsert(points, wait=True)
+                moved += len(points)
+            if offset is None:
+                break
+
+        if moved:
+            qdrant_manager.client.delete(
+                collection_name=source_collection,
+                points_selector=models.FilterSelector(filter=memory_filter)
+            )
+            logger.info(f"Moved {moved} memories from {source_collection} to {self.collection_name}")
+        return {"moved": moved}
+
+# Global instance
+memory_store = MemoryStore(
+    collection_name=MEMORY_COLLECTION_NAME,
+    search_limit=MEMORY_SEARCH_LIMIT,
+    score_threshold=MEMORY_SCORE_THRESHOLD
+)
+
+try:
+    memory_store.ensure_collection()
+except Exception as e:
+    print(f"Warning: Could not ensure collection {MEMORY_COLLECTION_NAME}: {e}")
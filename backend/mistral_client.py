@@ -2,6 +2,8 @@ from mistralai import Mistral
 import logging
 import os
 from langsmith import traceable
+from context_assembler import estimate_tokens
+from rate_limiter import rate_limiter, Priority
 
 logger = logging.getLogger(__name__)
 
@@ -58,12 +60,14 @@ Answer the user's question. If using context, cite which document chunks you're
             ]
             
             # Call Mistral API
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
+            async with rate_limiter.slot("mistral", estimate_tokens(system_prompt + user_message) + 1000) as slot:
+                response = self.client.chat.complete(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+                slot.record_usage(response.usage.total_tokens if hasattr(response, 'usage') else None)
             
             return {
                 "output": response.choices[0].message.content,
@@ -93,11 +97,13 @@ Answer the user's question. If using context, cite which document chunks you're
                 }
             ]
             
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=messages,
-                temperature=0.5
-            )
+            async with rate_limiter.slot("mistral", estimate_tokens(combined_text) + 1000, Priority.BACKGROUND) as slot:
+                response = self.client.chat.complete(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.5
+                )
+                slot.record_usage(response.usage.total_tokens if hasattr(response, 'usage') else None)
             
             return {
                 "output": response.choices[0].message.content
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from config import NOTES_CHUNK_CHARS, NOTES_MAX_CONCURRENCY, NOTES_REDUCE_INPUT_CHARS, NOTES_MODEL
+
+logger = logging.getLogger(__name__)
+
+NOTE_PROMPT = """Create structured notes in Markdown:
+
+# Executive Summary
+- [Key points]
+
+## Main Topics
+- [Important topics]
+
+## Key Insights
+- [Notable insights]
+
+DOCUMENT:
+{text}"""
+
+CHUNK_PROMPT = """Extract key points from Part {part}/{total}:
+
+## Key Points from Part {part}
+- [Extract 3-5 most important points]
+
+SECTION:
+{text}"""
+
+REDUCE_PROMPT = """Merge these section summaries into one summary that keeps every important point:
+
+## Key Points
+- [Combined key points, most important first]
+
+SECTION SUMMARIES:
+{text}"""
+
+FINAL_PROMPT = """Create comprehensive structured note:
+
+# Executive Summary
+- [Overall key points]
+
+## Main Topics
+- [Primary themes]
+
+## Key Insights
+- [Important findings]
+
+SECTION SUMMARIES:
+{text}"""
+
+class NoteEngine:
+    """
+    Map-reduce note generation.
+    Chunks are summarized concurrently (bounded by a shared semaphore), then the summaries are
+    reduced in a tree: groups that fit one prompt are merged in parallel, round after
+    round, until a single final call can write the note.
+    """
+
+    def __init__(self, chunk_chars: int = 6000, max_concurrency: int = 6, reduce_input_chars: int = 24000,
+                 model: str = "llama-3.1-8b-instant"):
+        self.chunk_chars = chunk_chars
+        self.max_concurrency = max_concurrency
+        self.reduce_input_chars = reduce_input_chars
+        self.model = model
+        # Shared by every generation, so concurrent jobs stay within one limit
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, text: str, on_progress: Optional[Callable[[str, int, int], None]] = None) -> str:
+        """Notes for a document of any length; on_progress(stage, done, total) reports each finished call."""
+        progress = on_progress or (lambda stage, done, total: None)
+
+        if len(text) <= self.chunk_chars:
+            return await self._write(NOTE_PROMPT.format(text=text), 1200, progress)
+
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        logger.info(f"Processing large document in {len(chunks)} chunks")
+        summaries = await self.summarize(chunks, progress)
+        summaries = await self._reduce_rounds(summaries, progress)
+        return await self._write(FINAL_PROMPT.format(text="\n\n".join(summaries)), 1500, progress)
+
+    async def summarize(self, texts: List[str], on_progress: Optional[Callable[[str, int, int], None]] = None,
+                        parts: Optional[List[int]] = None, total: Optional[int] = None) -> List[str]:
+        """Key points of each text, computed concurrently (the map step); parts numbers them within a larger whole."""
+        parts = parts or list(range(1, len(texts) + 1))
+        return await self._map(
+            "summarizing",
+            [CHUNK_PROMPT.format(part=part, total=total or len(texts), text=text) for part, text in zip(parts, texts)],
+            800, 0.2, on_progress or (lambda stage, done, total: None)
+        )
+
+    async def reduce(self, summaries: List[str], on_progress: Optional[Callable[[str, int, int], None]] = None) -> str:
+        """Merge summaries into one (the reduce step), in a tree when they do not fit one prompt."""
+        if len(summaries) == 1:
+            return summaries[0]
+        progress = on_progress or (lambda stage, done, total: None)
+        summaries = await self._reduce_rounds(summaries, progress)
+        if len(summaries) == 1:
+            return summaries[0]
+        return (await self._map("reducing", [REDUCE_PROMPT.format(text="\n\n".join(summaries))], 800, 0.2, progress))[0]
+
+    async def _reduce_rounds(self, summaries: List[str], progress: Callable[[str, int, int], None]) -> List[str]:
+        """Merge groups in parallel, round after round, until the summaries fit one prompt."""
+        rounds = 0
+        while len("\n\n".join(summaries)) > self.reduce_input_chars and len(summaries) > 1:
+            rounds += 1
+            summaries = await self._map(
+                f"reducing (round {rounds})",
+                [REDUCE_PROMPT.format(text="\n\n".join(group)) for group in self._group(summaries)],
+                800, 0.2, progress
+            )
+        if rounds:
+            logger.info(f"Reduced summaries in {rounds} tree rounds")
+        return summaries
+
+    async def _write(self, prompt: str, max_tokens: int, progress: Callable[[str, int, int], None]) -> str:
+        progress("writing", 0, 1)
+        note = await self._complete(prompt, max_tokens, 0.3)
+        progress("writing", 1, 1)
+        return note
+
+    async def _map(self, stage: str, prompts: List[str], max_tokens: int,
+                   temperature: float, progress: Callable[[str, int, int], None]) -> List[str]:
+        done = 0
+        progress(stage, 0, len(prompts))
+
+        async def run(prompt: str) -> str:
+            nonlocal done
+            result = await self._complete(prompt, max_tokens, temperature)
+            done += 1
+            progress(stage, done, len(prompts))
+            return result
+
+        return list(await asyncio.gather(*[run(prompt) for prompt in prompts]))
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        """Consecutive summaries packed into groups that fit one reduce prompt (at least two per group)."""
+        groups, current, size = [], [], 0
+        for summary in summaries:
+            if current and size + len(summary) > self.reduce_input_chars and len(current) >= 2:
+                groups.append(current)
+                current, size = [], 0
+            current.append(summary)
+            size += len(summary) + 2
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        from groq_client import groq_client
+        async with self._semaphore:
+            return await groq_client.complete(prompt, model=self.model, max_tokens=max_tokens, temperature=temperature)
+
+# Global instance
+note_engine = NoteEngine(
+    chunk_chars=NOTES_CHUNK_CHARS,
+    max_concurrency=NOTES_MAX_CONCURRENCY,
+    reduce_input_chars=NOTES_REDUCE_INPUT_CHARS,
+    model=NOTES_MODEL
+)
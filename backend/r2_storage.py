@@ -1,6 +1,6 @@
 import boto3
 import logging
-from typing import Optional, BinaryIO
+from typing import Iterator, List, Optional, BinaryIO
 from datetime import timedelta
 from botocore.exceptions import ClientError
 from config import R2_ENDPOINT, R2_BUCKET_NAME, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_PUBLIC_URL
@@ -97,6 +97,58 @@ class R2StorageManager:
             logger.error(f"Failed to delete {object_key} from R2: {e}")
             return False
     
+    def put_object(self, object_key: str, body: bytes, content_type: str = "application/octet-stream",
+                   content_encoding: Optional[str] = None) -> bool:
+        """Upload bytes under an exact object key."""
+        if not self.enabled or not self.client:
+            logger.debug("R2 storage not available, skipping upload")
+            return False
+            
+        try:
+            extra = {"ContentEncoding": content_encoding} if content_encoding else {}
+            self.client.put_object(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                Body=body,
+                ContentType=content_type,
+                **extra
+            )
+            return True
+            
+        except ClientError as e:
+            logger.error(f"Failed to upload {object_key} to R2: {e}")
+            return False
+    
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        """Yield every object key under a prefix."""
+        if not self.enabled or not self.client:
+            logger.debug("R2 storage not available, cannot list")
+            return
+            
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+    
+    def delete_files(self, object_keys: List[str]) -> int:
+        """Delete many objects, 1000 per request. Returns the number deleted."""
+        if not self.enabled or not self.client:
+            logger.debug("R2 storage not available, cannot delete")
+            return 0
+            
+        deleted = 0
+        for start in range(0, len(object_keys), 1000):
+            batch = object_keys[start:start + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+                deleted += len(batch) - len(response.get("Errors", []))
+            except ClientError as e:
+                logger.error(f"Failed to delete {len(batch)} objects from R2: {e}")
+        return deleted
+    
     def generate_presigned_url(self, object_key: str, expiration: int = 3600) -> Optional[str]:
         """Generate presigned URL for temporary access."""
         if not self.enabled or not self.client:
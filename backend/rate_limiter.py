@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from config import PROVIDER_RATE_LIMITS, RATE_LIMIT_BACKGROUND_RESERVE, RATE_LIMIT_MAX_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class Priority(str, Enum):
+    """Scheduling lanes for provider calls."""
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+class TokenBucket:
+    """Continuously refilling token bucket."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.available = capacity
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        missing = amount - self.available
+        return 0.0 if missing <= 0 else missing / self.refill_per_second
+
+class ProviderLimiter:
+    """Requests-per-minute and tokens-per-minute admission control for one provider key."""
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, background_reserve: float = 0.2):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.background_reserve = background_reserve
+        self.paused_until = 0.0
+        self.waiting = {Priority.INTERACTIVE: 0, Priority.BACKGROUND: 0}
+        self.stats = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "rate_limited": 0, "timeouts": 0}
+
+    def try_acquire(self, tokens: int, priority: Priority) -> float:
+        """Take capacity if available; otherwise return the seconds to wait before retrying."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        # Background work yields to queued interactive calls
+        if priority == Priority.BACKGROUND and self.waiting[Priority.INTERACTIVE] > 0:
+            return 0.05
+
+        self.requests.refill()
+        self.tokens.refill()
+        tokens = min(tokens, self.tokens.capacity)
+
+        # Background work also leaves a slice of each bucket untouched for interactive traffic
+        reserve = self.background_reserve if priority == Priority.BACKGROUND else 0.0
+        request_need = min(1 + reserve * self.requests.capacity, self.requests.capacity)
+        token_need = min(tokens + reserve * self.tokens.capacity, self.tokens.capacity)
+        wait = max(self.requests.seconds_until(request_need), self.tokens.seconds_until(token_need))
+        if wait > 0:
+            return wait
+
+        self.requests.available -= 1
+        self.tokens.available -= tokens
+        return 0.0
+
+    def force_acquire(self, tokens: int):
+        """Debit a call sent without capacity; the buckets go negative and later calls wait it off."""
+        self.requests.refill()
+        self.tokens.refill()
+        self.requests.available -= 1
+        self.tokens.available -= min(tokens, self.tokens.capacity)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the provider reports real usage."""
+        self.tokens.available = min(self.tokens.capacity, self.tokens.available - (actual_tokens - estimated_tokens))
+
+    def pause(self, seconds: float):
+        """Stop admitting calls after the provider answered 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.stats["rate_limited"] += 1
+
+class RateLimitSlot:
+    """Handle for an admitted call, used to report actual token usage."""
+
+    def __init__(self, limiter: Optional[ProviderLimiter], estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+
+    def record_usage(self, total_tokens: Optional[int]):
+        if self.limiter and total_tokens:
+            self.limiter.record_usage(self.estimated_tokens, total_tokens)
+
+class ProviderRateLimiter:
+    """
+    Per-provider token-bucket scheduler with an interactive and a background lane.
+    Calls queue locally instead of running into provider 429s.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], background_reserve: float = 0.2, max_wait: float = 60.0):
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self._limiters: Dict[str, ProviderLimiter] = {
+            name: ProviderLimiter(name, rpm, tpm, background_reserve) for name, (rpm, tpm) in limits.items()
+        }
+
+    @asynccontextmanager
+    async def slot(self, provider: str, tokens: int = 0, priority: Priority = Priority.INTERACTIVE):
+        """Wait for capacity on a provider key, then run the wrapped call."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            yield RateLimitSlot(None, tokens)
+            return
+
+        await self._acquire(limiter, tokens, priority)
+        try:
+            yield RateLimitSlot(limiter, tokens)
+        except Exception as e:
+            if self._is_rate_limit_error(e):
+                logger.warning(f"{provider} rate limited despite scheduling, pausing admissions")
+                limiter.pause(self._retry_after(e))
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, limiter in self._limiters.items():
+            limiter.requests.refill()
+            limiter.tokens.refill()
+            stats[name] = {
+                **limiter.stats,
+                "requests_available": round(limiter.requests.available, 2),
+                "tokens_available": int(limiter.tokens.available),
+                "waiting_interactive": limiter.waiting[Priority.INTERACTIVE],
+                "waiting_background": limiter.waiting[Priority.BACKGROUND]
+            }
+        return stats
+
+    async def _acquire(self, limiter: ProviderLimiter, tokens: int, priority: Priority):
+        start = time.monotonic()
+        wait = limiter.try_acquire(tokens, priority)
+        if wait <= 0:
+            limiter.stats["admitted"] += 1
+            return
+
+        limiter.stats["queued"] += 1
+        limiter.waiting[priority] += 1
+        try:
+            while wait > 0:
+                # Background work keeps queueing; a user waiting on an answer gets it sent after max_wait
+                if priority == Priority.INTERACTIVE and time.monotonic() - start > self.max_wait:
+                    # Better to risk a 429 than to hang the caller indefinitely, but the call still
+                    # counts against both buckets so the calls behind it wait for the overdraft
+                    logger.warning(f"{limiter.name} {priority.value} call waited {self.max_wait}s, sending anyway")
+                    limiter.force_acquire(tokens)
+                    limiter.stats["timeouts"] += 1
+                    break
+                if priority == Priority.INTERACTIVE:
+                    wait = min(wait, max(self.max_wait - (time.monotonic() - start), 0.0) + 0.01)
+                await asyncio.sleep(min(wait, 1.0))
+                wait = limiter.try_acquire(tokens, priority)
+        finally:
+            limiter.waiting[priority] -= 1
+            limiter.stats["admitted"] += 1
+            limiter.stats["wait_seconds"] += time.monotonic() - start
+
+    @staticmethod
+    def _is_rate_limit_error(error: Exception) -> bool:
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        return status == 429 or "RateLimit" in type(error).__name__ or "429" in str(error)[:200]
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers.get("retry-after", 10))
+        except (TypeError, ValueError):
+            return 10.0
+
+# Global instance
+rate_limiter = ProviderRateLimiter(
+    limits=PROVIDER_RATE_LIMITS,
+    background_reserve=RATE_LIMIT_BACKGROUND_RESERVE,
+    max_wait=RATE_LIMIT_MAX_WAIT_SECONDS
+)
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import REQUEST_COALESCING_ENABLED
+
+logger = logging.getLogger(__name__)
+
+class RequestCoalescer:
+    """
+    Singleflight for async calls: concurrent callers with the same key share
+    one in-flight computation instead of each running it.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case-, whitespace- and trailing-punctuation-insensitive form of a query."""
+        return re.sub(r"\s+", " ", query or "").strip().rstrip("?!. ").lower()
+
+    @staticmethod
+    def make_key(query: str, *context: Optional[str]) -> str:
+        """Key from the normalized query plus a fingerprint of the caller's context."""
+        raw = "\x1f".join([RequestCoalescer.normalize_query(query)] + [str(part or "") for part in context])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared). shared is True when the result came from another caller's flight."""
+        if not self.enabled:
+            return await fn(), False
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._followers += 1
+            logger.info(f"Coalescing request onto in-flight computation {key[:12]}")
+            # Shielded so a disconnecting follower cannot cancel the shared work
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self._leaders += 1
+        task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(task), False
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self._leaders + self._followers
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "computations": self._leaders,
+            "coalesced": self._followers,
+            "coalesced_rate": self._followers / total if total else 0.0
+        }
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+# Global instance
+workflow_coalescer = RequestCoalescer(enabled=REQUEST_COALESCING_ENABLED)
@@ -0,0 +1,137 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import AGGREGATION_SHORTCUT_ENABLED, AGGREGATION_AGREEMENT_THRESHOLD
+from ingestion import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Words per embedded chunk, below the MiniLM sequence limit of 256 word pieces
+CHUNK_WORDS = 150
+
+# Placeholders the clients and the workflow return instead of an answer (always at the very start)
+FAILED_RESPONSE_PREFIXES = (
+    "Error:",
+    "Gemini Error",
+    "Cohere Error",
+    "Groq client not initialized",
+    "Gemini client not initialized",
+    "Cohere client not initialized",
+    "No response from model",
+    "Empty response",
+    "Error during aggregation",
+)
+
+def is_failed_response(response: str) -> bool:
+    """Check whether a worker response is an error placeholder; answers that merely mention an error are kept."""
+    if not response or not response.strip():
+        return True
+    return response.lstrip().startswith(FAILED_RESPONSE_PREFIXES)
+
+class ResponseAgreementDetector:
+    """Detects when parallel worker answers agree so the Groq aggregation call can be skipped."""
+
+    def __init__(self, threshold: float = 0.9, enabled: bool = True, min_responses: int = 2):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.min_responses = min_responses
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._shortcuts = 0
+        self._aggregations = 0
+        self._aggregation_seconds = 0.0
+
+    def find_consensus(self, responses: Dict[str, str]) -> Optional[Tuple[str, str, float]]:
+        """
+        Compare worker responses with the embedding model.
+
+        Returns:
+            (provider, answer, agreement) for the most central answer when every
+            usable pair is above the threshold, otherwise None.
+        """
+        if not self.enabled:
+            return None
+
+        usable = {p: r for p, r in responses.items() if isinstance(r, str) and not is_failed_response(r)}
+        with self._lock:
+            self._checks += 1
+
+        if len(usable) < self.min_responses:
+            return None
+
+        try:
+            providers = list(usable.keys())
+            pooled, conclusions = self._embed_answers([usable[p] for p in providers])
+            # Answers agree when they agree overall and in their closing chunks
+            similarity = np.minimum(pooled @ pooled.T, conclusions @ conclusions.T)
+
+            n = len(providers)
+            off_diagonal = similarity[~np.eye(n, dtype=bool)]
+            agreement = float(off_diagonal.min())
+            if agreement < self.threshold:
+                logger.info(f"Worker agreement {agreement:.3f} below threshold {self.threshold}, aggregating")
+                return None
+
+            # Most central answer wins; length breaks ties in favour of the fuller answer
+            centrality = (similarity.sum(axis=1) - 1.0) / (n - 1)
+            best = max(range(n), key=lambda i: (round(float(centrality[i]), 3), len(usable[providers[i]])))
+            provider = providers[best]
+
+            with self._lock:
+                self._shortcuts += 1
+            logger.info(f"Workers agree ({agreement:.3f}), using {provider} answer without aggregation")
+            return provider, usable[provider], agreement
+
+        except Exception as e:
+            logger.error(f"Agreement detection failed: {e}")
+            return None
+
+    @staticmethod
+    def _embed_answers(answers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Unit vectors per answer, mean-pooled over chunks of CHUNK_WORDS words, and of each answer's last chunk.
+        A single embedding would only see an answer's opening, so answers differing in their conclusions would agree.
+        """
+        chunks, owners = [], []
+        for i, answer in enumerate(answers):
+            words = answer.split()
+            for start in range(0, max(len(words), 1), CHUNK_WORDS):
+                chunks.append(" ".join(words[start:start + CHUNK_WORDS]))
+                owners.append(i)
+        chunk_vectors = np.asarray(get_embeddings(chunks), dtype=np.float32)
+        owners = np.asarray(owners)
+        pooled = np.stack([chunk_vectors[owners == i].mean(axis=0) for i in range(len(answers))])
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        conclusions = np.stack([chunk_vectors[owners == i][-1] for i in range(len(answers))])
+        return pooled / np.where(norms > 0, norms, 1.0), conclusions
+
+    def record_aggregation(self, duration: float):
+        """Record the latency of a real aggregation call for savings estimates."""
+        with self._lock:
+            self._aggregations += 1
+            self._aggregation_seconds += duration
+
+    def get_stats(self) -> Dict[str, float]:
+        """Shortcut rate and estimated latency/calls saved."""
+        with self._lock:
+            avg_aggregation = self._aggregation_seconds / self._aggregations if self._aggregations else 0.0
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "checks": self._checks,
+                "shortcuts": self._shortcuts,
+                "shortcut_rate": self._shortcuts / self._checks if self._checks else 0.0,
+                "aggregation_calls": self._aggregations,
+                "avg_aggregation_seconds": avg_aggregation,
+                "aggregation_calls_saved": self._shortcuts,
+                "estimated_seconds_saved": self._shortcuts * avg_aggregation
+            }
+
+# Global instance
+agreement_detector = ResponseAgreementDetector(
+    threshold=AGGREGATION_AGREEMENT_THRESHOLD,
+    enabled=AGGREGATION_SHORTCUT_ENABLED
+)
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, Field
 from typing import Optional
 import uuid
 import time
-from datetime import datetime
-from ingestion import get_embedding
+from datetime import datetime, timezone
 from database import qdrant_manager
 from config import QDRANT_URL, QDRANT_API_KEY, VECTOR_SIZE
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, PointStruct, FilterSelector
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, FilterSelector
 from groq_client import groq_client
-from r2_storage import r2_storage
-import json
+from context_assembler import estimate_tokens
+from rate_limiter import rate_limiter, Priority
+from job_queue import job_queue
+from chat_write_buffer import chat_write_buffer
+from session_index import session_index
+from conversation_archive import conversation_archive
+from event_hub import event_hub
+import asyncio
 
 router = APIRouter()
 
@@ -22,11 +27,56 @@ try:
     from qdrant_client.http.models import PayloadSchemaType
     qdrant_manager.create_payload_index(COLLECTION_NAME, "session_id", PayloadSchemaType.KEYWORD)
     qdrant_manager.create_payload_index(COLLECTION_NAME, "role", PayloadSchemaType.KEYWORD)
+    # Numeric message time for ordered, cursor-paginated history
+    qdrant_manager.create_payload_index(COLLECTION_NAME, "ts", PayloadSchemaType.FLOAT)
 except Exception as e:
     print(f"Warning: Could not ensure collection {COLLECTION_NAME}: {e}")
     # Continue without failing - collection will be created on first use
 
-# Simple payload schema: session_id (str), role ("user"|"assistant"), content (str), timestamp (str)
+# Simple payload schema: session_id (str), role ("user"|"assistant"), content (str), timestamp (str), ts (float epoch seconds)
+
+def backfill_message_timestamps() -> int:
+    """Add the numeric ts field to messages stored before it existed."""
+    from qdrant_client.http import models
+    updated, offset = 0, None
+    while True:
+        points, offset = qdrant_manager.client.scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="ts"))]),
+            limit=256,
+            offset=offset,
+            with_payload=["timestamp"],
+            with_vectors=False,
+        )
+        operations = []
+        for point in points:
+            try:
+                ts = datetime.fromisoformat(point.payload.get("timestamp", "")).replace(tzinfo=timezone.utc).timestamp()
+            except (TypeError, ValueError):
+                ts = 0.0
+            operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(payload={"ts": ts}, points=[point.id])))
+        if operations:
+            qdrant_manager.client.batch_update_points(COLLECTION_NAME, update_operations=operations)
+            updated += len(operations)
+        if offset is None:
+            break
+    if updated:
+        print(f"Backfilled numeric timestamps for {updated} chat messages")
+    return updated
+
+def build_session_index():
+    """
+    Startup migration: numeric timestamps first, then the session index built from them.
+    Must finish before the chat write buffer starts, or a replayed message creates the first
+    index record and the rebuild of every older session is skipped.
+    """
+    backfill_message_timestamps()
+    session_index.rebuild_if_empty()
+
+def migrate_chat_metadata():
+    """Startup migration that can run alongside traffic: titles into the index, then the cache warmed."""
+    session_index.migrate_title_points()
+    session_index.warm()
 
 @router.post("/chat/start")
 async def start_chat():
@@ -44,31 +94,24 @@ class ChatMessageRequest(BaseModel):
     active_document_filename: Optional[str] = Field(None, description="Filename of the currently viewed document")
 
 @router.post("/chat/message")
-async def chat_message(req: ChatMessageRequest, background_tasks: BackgroundTasks = None): # Add background_tasks dependency
-    from fastapi import BackgroundTasks # Ensure import if not present at top
-    
-    # Store user message
+async def chat_message(req: ChatMessageRequest):
+    return await process_chat_message(req)
+
+async def process_chat_message(req: ChatMessageRequest, request_id: Optional[str] = None) -> dict:
+    """
+    Run one chat turn: persist both messages, answer through the workflow, schedule follow-up jobs.
+    The request_id of a WebSocket turn tags its streamed events.
+    """
+    # Store user message (write-behind: embedded and upserted in batches)
     timestamp = datetime.utcnow().isoformat()
     payload_user = {
         "session_id": req.session_id,
         "role": "user",
         "content": req.message,
         "timestamp": timestamp,
+        "ts": time.time(),
     }
-    
-    # Generate embedding for user message
-    try:
-        vector_user = get_embedding(req.message)
-    except Exception as e:
-        print(f"Error generating embedding for user message: {e}")
-        vector_user = [0.0] * VECTOR_SIZE
-        
-    point_user = PointStruct(
-        id=str(uuid.uuid4()),
-        vector=vector_user,
-        payload=payload_user,
-    )
-    qdrant_manager.client.upsert(COLLECTION_NAME, points=[point_user], wait=True)
+    chat_write_buffer.append(payload_user)
 
     response_content = ""
     ai_provider_used = "parallel"
@@ -79,10 +122,10 @@ async def chat_message(req: ChatMessageRequest, background_tasks: BackgroundTask
     
     workflow_res = await run_parallel_workflow(
         query=req.message, 
-        background_tasks=background_tasks, 
         context_limit=req.context_limit, 
         session_id=req.session_id,
-        active_document_filename=req.active_document_filename
+        active_document_filename=req.active_document_filename,
+        request_id=request_id
     )
     response_content = workflow_res.answer
 
@@ -92,33 +135,20 @@ async def chat_message(req: ChatMessageRequest, background_tasks: BackgroundTask
         "role": "assistant",
         "content": response_content,
         "timestamp": datetime.utcnow().isoformat(),
+        "ts": time.time(),
     }
+    chat_write_buffer.append(payload_assistant)
     
-    # Generate embedding for assistant response
+    # Store conversation in R2 (optional)
     try:
-        vector_assistant = get_embedding(response_content)
+        job_queue.enqueue("r2_archive", session_id=req.session_id, user_payload=payload_user, assistant_payload=payload_assistant)
     except Exception as e:
-        print(f"Error generating embedding for assistant response: {e}")
-        vector_assistant = [0.0] * VECTOR_SIZE
-        
-    point_assistant = PointStruct(
-        id=str(uuid.uuid4()),
-        vector=vector_assistant,
-        payload=payload_assistant,
-    )
-    qdrant_manager.client.upsert(COLLECTION_NAME, points=[point_assistant], wait=True)
-    
-    # Store conversation in R2 (optional)
-    if background_tasks:
-        try:
-            background_tasks.add_task(store_conversation_to_r2, req.session_id, payload_user, payload_assistant)
-        except Exception as e:
-            print(f"Warning: Failed to schedule R2 storage task: {e}")
+        print(f"Warning: Failed to schedule R2 storage job: {e}")
     
     # Generate chat title based on first message
     chat_title = None
-    if background_tasks:
-        background_tasks.add_task(generate_chat_title, req.session_id, req.message)
+    if not session_index.has_title(req.session_id):
+        job_queue.enqueue("chat_title", session_id=req.session_id, first_message=req.message)
 
     return {
         "response": response_content,
@@ -128,49 +158,111 @@ async def chat_message(req: ChatMessageRequest, background_tasks: BackgroundTask
         "chat_title": chat_title
     }
 
-@router.get("/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
-    try:
-        # Retrieve all points with matching session_id, ordered by timestamp
-        filter_cond = Filter(
-            must=[
-                FieldCondition(
-                    key="session_id",
-                    match=MatchValue(value=session_id),
-                )
-            ]
+def history_messages(session_id: str, ts_range, order: Optional[str] = None, limit: Optional[int] = None) -> dict:
+    """Message payloads of a session in a ts range, keyed by point ID; all of them unless a limit is given."""
+    from qdrant_client.http.models import OrderBy, Direction
+    
+    scroll_filter = Filter(
+        must=[
+            FieldCondition(key="session_id", match=MatchValue(value=session_id)),
+            FieldCondition(key="ts", range=ts_range)
+        ],
+        must_not=[FieldCondition(key="is_title", match=MatchValue(value=True))]
+    )
+    if limit is not None:
+        points, _ = qdrant_manager.client.scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=scroll_filter,
+            limit=limit,
+            order_by=OrderBy(key="ts", direction=Direction.ASC if order == "asc" else Direction.DESC),
+            with_payload=True,
+            with_vectors=False,
         )
-        # Use Qdrant query_points to get all payloads
-        import os
-        history_limit = int(os.getenv('CHAT_HISTORY_LIMIT', '50'))
-        
-        # First ensure the index exists
-        try:
-            from qdrant_client.http.models import PayloadSchemaType
-            qdrant_manager.create_payload_index(COLLECTION_NAME, "session_id", PayloadSchemaType.KEYWORD)
-        except:
-            pass
-            
-        results = qdrant_manager.client.scroll(
+        return {str(p.id): p.payload for p in points}
+    
+    payloads, offset = {}, None
+    while True:
+        points, offset = qdrant_manager.client.scroll(
             collection_name=COLLECTION_NAME,
-            scroll_filter=filter_cond,
-            limit=history_limit,
+            scroll_filter=scroll_filter,
+            limit=500,
+            offset=offset,
             with_payload=True,
             with_vectors=False,
         )
-        points = results[0] if isinstance(results, tuple) else results
-        # Sort by timestamp
-        sorted_points = sorted(points, key=lambda p: p.payload.get("timestamp", ""))
+        payloads.update((str(p.id), p.payload) for p in points)
+        if offset is None:
+            return payloads
+
+@router.get("/chat/history/{session_id}")
+async def get_chat_history(session_id: str, limit: Optional[int] = None, before: Optional[float] = None,
+                           after: Optional[float] = None, before_id: Optional[str] = None, after_id: Optional[str] = None):
+    """
+    One page of a session's messages in chronological order, ordered by (ts, id).
+    Without a cursor this is the latest page; pass `before`/`before_id` (the page's oldest message) to
+    load older messages, or `after`/`after_id` (the newest) to load newer ones. Messages sharing a ts
+    are paged by ID, so none are skipped at a page boundary; a cursor without an ID skips its whole ts.
+    """
+    try:
+        from qdrant_client.http.models import Range
+        import os
+        history_limit = min(limit or int(os.getenv('CHAT_HISTORY_LIMIT', '50')), 500)
+        # Walk forward from an `after` cursor, otherwise backwards from the newest message
+        forward = after is not None and before is None
+        
+        def in_range(ts: float, point_id: str) -> bool:
+            key = (ts, point_id)
+            return ((before is None or key < (before, before_id or "")) and
+                    (after is None or key > (after, after_id or "\uffff")))
+        
+        payloads = {}
+        # Messages at the cursor's own ts that come after it in ID order
+        if forward and after_id:
+            payloads.update(history_messages(session_id, Range(gte=after, lte=after)))
+        elif not forward and before is not None and before_id:
+            payloads.update(history_messages(session_id, Range(gte=before, lte=before)))
+        
+        page = history_messages(
+            session_id,
+            Range(gt=after if after is not None else None, lt=before if before is not None else None),
+            order="asc" if forward else "desc",
+            limit=history_limit
+        )
+        payloads.update(page)
+        if len(page) >= history_limit:
+            # The page may end partway through a run of equal ts: take that whole run, then cut by ID
+            edge = max if forward else min
+            edge_ts = edge(p.get("ts", 0.0) for p in page.values())
+            payloads.update(history_messages(session_id, Range(gte=edge_ts, lte=edge_ts)))
+        
+        # Include messages still waiting in the write-behind buffer
+        for record in chat_write_buffer.pending_for_session(session_id):
+            payloads.setdefault(record["id"], record["payload"])
+        
+        messages = sorted(
+            ((p.get("ts", 0.0) or 0.0, point_id, p) for point_id, p in payloads.items()
+             if in_range(p.get("ts", 0.0) or 0.0, point_id)),
+            key=lambda m: (m[0], m[1])
+        )
+        has_more = len(messages) > history_limit
+        messages = messages[:history_limit] if forward else messages[-history_limit:]
         history = [
-            {"role": p.payload.get("role"), "content": p.payload.get("content"), "timestamp": p.payload.get("timestamp")}
-            for p in sorted_points
+            {"id": point_id, "role": p.get("role"), "content": p.get("content"), "timestamp": p.get("timestamp"), "ts": p.get("ts")}
+            for _, point_id, p in messages
         ]
-        return {"session_id": session_id, "history": history}
+        return {
+            "session_id": session_id,
+            "history": history,
+            "has_more": has_more or len(page) >= history_limit,
+            "before": history[0]["ts"] if history else before,
+            "before_id": history[0]["id"] if history else before_id,
+            "after": history[-1]["ts"] if history else after,
+            "after_id": history[-1]["id"] if history else after_id
+        }
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"Error in get_chat_history: {e}")
-        print(f"Results type: {type(results) if 'results' in locals() else 'Not defined'}")
         raise HTTPException(status_code=500, detail=str(e))
 
 async def generate_chat_title(session_id: str, first_message: str):
@@ -183,44 +275,30 @@ async def generate_chat_title(session_id: str, first_message: str):
         title_temperature = float(os.getenv('CHAT_TITLE_TEMPERATURE', '0.3'))
         max_tokens = int(os.getenv('CHAT_TITLE_MAX_TOKENS', '20'))
         
-        completion = groq_client.client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": title_prompt}
-            ],
-            model=groq_client.extractor_model,
-            max_tokens=max_tokens,
-            temperature=title_temperature
-        )
+        async with rate_limiter.slot("groq", estimate_tokens(title_prompt) + max_tokens, Priority.BACKGROUND):
+            completion = await asyncio.to_thread(
+                groq_client.client.chat.completions.create,
+                messages=[
+                    {"role": "user", "content": title_prompt}
+                ],
+                model=groq_client.extractor_model,
+                max_tokens=max_tokens,
+                temperature=title_temperature
+            )
         
         title = completion.choices[0].message.content.strip().replace('"', '')
         
-        # Store title in a simple collection or return it
-        # For now, we'll store it as metadata in the session
-        # Use zero vector for title as we don't search it semantically usually
-        dummy_vector = [0.0] * VECTOR_SIZE
-        title_payload = {
-            "session_id": session_id,
-            "role": "system",
-            "content": f"CHAT_TITLE: {title}",
-            "timestamp": datetime.utcnow().isoformat(),
-            "is_title": True
-        }
-        
-        point_title = PointStruct(
-            id=str(uuid.uuid4()),
-            vector=dummy_vector,
-            payload=title_payload,
-        )
-        
-        qdrant_manager.client.upsert(COLLECTION_NAME, points=[point_title], wait=True)
+        # Store title in the session metadata store
+        await asyncio.to_thread(session_index.set_title, session_id, title)
+        event_hub.publish(session_id, {"type": "title", "title": title})
         
     except Exception as e:
         print(f"Failed to generate chat title: {e}")
+        raise
 
 async def store_conversation_to_r2(session_id: str, user_payload: dict, assistant_payload: dict):
-    """Store conversation exchange in R2 storage as JSON."""
+    """Append a conversation exchange to the session's archive segment (uploaded to R2 in batches)."""
     try:
-        # Create conversation object
         conversation = {
             "session_id": session_id,
             "exchange": {
@@ -229,70 +307,122 @@ async def store_conversation_to_r2(session_id: str, user_payload: dict, assistan
             },
             "stored_at": datetime.utcnow().isoformat()
         }
-        
-        # Generate filename with timestamp
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"conversations/{session_id}/{timestamp}_{uuid.uuid4().hex[:8]}.json"
-        
-        # Convert to JSON bytes
-        json_content = json.dumps(conversation, indent=2).encode('utf-8')
-        
-        # Upload to R2
-        r2_url = r2_storage.upload_file(
-            file_content=json_content,
-            filename=filename,
-            content_hash=f"conv_{session_id}_{timestamp}"
-        )
-        
-        print(f"Conversation stored in R2: {r2_url}")
+        await asyncio.to_thread(conversation_archive.append, session_id, conversation)
         
     except Exception as e:
-        print(f"Failed to store conversation in R2: {e}")
+        print(f"Failed to archive conversation: {e}")
+        raise
+
+async def migrate_conversation_archive():
+    """Background job: compact per-exchange R2 objects into archive segments."""
+    await asyncio.to_thread(conversation_archive.migrate_legacy_objects)
+
+job_queue.register("chat_title", generate_chat_title, queue="titles")
+job_queue.register("r2_archive", store_conversation_to_r2, queue="archive")
+job_queue.register("r2_archive_migration", migrate_conversation_archive, queue="archive", max_attempts=3)
+
+@router.get("/chat/archive/{session_id}")
+async def get_archived_conversation(session_id: str):
+    """
+    Restore a session's archived exchanges: R2 (manifest plus one read per segment) and this node's
+    unuploaded segments. Exchanges held by other nodes can lag by up to archive_lag_seconds.
+    """
+    try:
+        exchanges = await asyncio.to_thread(conversation_archive.restore, session_id)
+        return {
+            "session_id": session_id,
+            "exchanges": exchanges,
+            "archive_lag_seconds": conversation_archive.max_segment_age_seconds + conversation_archive.flush_interval_seconds
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.websocket("/chat/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    One connection for any number of sessions.
+    Client messages: {"type": "subscribe"|"unsubscribe", "session_id"},
+    {"type": "chat", "request_id", "session_id", "message", ...ChatMessageRequest fields}, {"type": "ping"}.
+    Server events: status, answer.delta, answer, title, ingest.progress, error, pong
+    (session events carry their session_id; chat replies and a turn's status and answer.delta
+    events also carry its request_id).
+    """
+    await websocket.accept()
+    events = event_hub.connect()
+    turns = set()
+
+    def reply(event: dict):
+        try:
+            events.put_nowait(event)
+        except asyncio.QueueFull:
+            print(f"Chat socket dropped a {event.get('type')} reply for a slow connection")
+
+    async def send_events():
+        try:
+            while True:
+                await websocket.send_json(await events.get())
+        except Exception:
+            # Connection closed; the receive loop notices and cleans up
+            pass
+
+    async def run_turn(message: dict):
+        request_id = message.get("request_id")
+        try:
+            req = ChatMessageRequest(**{k: v for k, v in message.items() if k not in ("type", "request_id")})
+            result = await process_chat_message(req, request_id)
+            reply({"type": "answer", "request_id": request_id, "session_id": req.session_id, **result})
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            reply({"type": "error", "request_id": request_id, "detail": detail})
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            kind = message.get("type")
+            if kind == "subscribe" and message.get("session_id"):
+                event_hub.subscribe(message["session_id"], events)
+                reply({"type": "subscribed", "session_id": message["session_id"]})
+            elif kind == "unsubscribe" and message.get("session_id"):
+                event_hub.unsubscribe(message["session_id"], events)
+            elif kind == "chat" and message.get("session_id"):
+                # Following the session delivers streamed deltas and the title for this turn
+                event_hub.subscribe(message["session_id"], events)
+                turn = asyncio.create_task(run_turn(message))
+                turns.add(turn)
+                turn.add_done_callback(turns.discard)
+            elif kind == "ping":
+                reply({"type": "pong"})
+            else:
+                reply({"type": "error", "request_id": message.get("request_id"), "detail": f"Unsupported message: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Chat socket closed: {e}")
+    finally:
+        # Turns in flight still complete and persist their messages; only delivery stops
+        event_hub.disconnect(events)
+        sender.cancel()
 
 @router.get("/chat/title/{session_id}")
 async def get_chat_title(session_id: str):
     """Get the generated title for a chat session."""
     try:
-        # Search for title in the session
-        filter_cond = Filter(
-            must=[
-                FieldCondition(
-                    key="session_id",
-                    match=MatchValue(value=session_id),
-                ),
-                FieldCondition(
-                    key="is_title",
-                    match=MatchValue(value=True),
-                )
-            ]
-        )
-        
-        import os
-        title_limit = int(os.getenv('CHAT_TITLE_LIMIT', '1'))
+        summary = session_index.get(session_id)
+        if summary and summary.get("title"):
+            return {"title": summary["title"]}
         
-        results = qdrant_manager.client.scroll(
-            collection_name=COLLECTION_NAME,
-            scroll_filter=filter_cond,
-            limit=title_limit,
-            with_payload=True,
-            with_vectors=False,
-        )[0]
-        
-        if results and len(results) > 0:
-            content = results[0].payload.get("content", "")
-            title_prefix = os.getenv('CHAT_TITLE_PREFIX', 'CHAT_TITLE')
-            title = content.replace(f"{title_prefix}: ", "")
-            return {"title": title}
-        
-        return {"title": f"Chat {session_id[:8]}"}
+        return {"title": session_index.default_title(session_id)}
         
     except Exception as e:
-        return {"title": f"Chat {session_id[:8]}"}
+        return {"title": session_index.default_title(session_id)}
 
 @router.delete("/chat/history/{session_id}")
 async def delete_chat_history(session_id: str):
     """Delete all chat history for a specific session."""
     try:
+        # After any flush in progress, so its batch cannot land once the points below are deleted
+        await chat_write_buffer.discard_session(session_id)
         filter_cond = Filter(
             must=[
                 FieldCondition(
@@ -307,6 +437,7 @@ async def delete_chat_history(session_id: str):
             collection_name=COLLECTION_NAME,
             points_selector=FilterSelector(filter=filter_cond)
         )
+        session_index.delete(session_id)
         
         return {"message": f"Chat history deleted for session {session_id}"}
         
@@ -314,41 +445,32 @@ async def delete_chat_history(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/chat/sessions")
-async def get_all_chat_sessions():
-    """Get all chat sessions (shared across all users)."""
+async def get_all_chat_sessions(limit: Optional[int] = None, before: Optional[float] = None, before_id: Optional[str] = None):
+    """
+    Chat sessions (shared across all users), most recently active first, ordered by (last message ts, id).
+    Pass the returned `before` and `before_id` cursor to load the next page.
+    """
     try:
         import os
-        scroll_limit = int(os.getenv('CHAT_SESSIONS_LIMIT', '20'))
+        page_size = min(limit or int(os.getenv('CHAT_SESSIONS_LIMIT', '20')), 200)
         
-        results = qdrant_manager.client.scroll(
-            collection_name=COLLECTION_NAME,
-            limit=scroll_limit,
-            with_payload=True,
-            with_vectors=False,
-        )
-        
-        sessions = {}
-        for point in results[0]:
-            session_id = point.payload.get("session_id")
-            timestamp = point.payload.get("timestamp")
-            is_title = point.payload.get("is_title", False)
-            
-            if session_id and session_id not in sessions:
-                sessions[session_id] = {
-                    "id": session_id,
-                    "title": f"Chat {session_id[:8]}",
-                    "created": timestamp,
-                    "last_message": timestamp
-                }
-            
-            if session_id and is_title:
-                content = point.payload.get("content", "")
-                title_prefix = os.getenv('CHAT_TITLE_PREFIX', 'CHAT_TITLE')
-                title = content.replace(f"{title_prefix}: ", "")
-                sessions[session_id]["title"] = title
-        
-        sorted_sessions = sorted(sessions.values(), key=lambda x: x["last_message"] or "", reverse=True)
-        return {"sessions": sorted_sessions}
+        summaries = await asyncio.to_thread(session_index.list, page_size, before, before_id)
+        sessions = [
+            {
+                "id": summary["session_id"],
+                "title": summary.get("title") or session_index.default_title(summary["session_id"]),
+                "created": summary.get("created"),
+                "last_message": summary.get("last_message"),
+                "message_count": summary.get("message_count", 0)
+            }
+            for summary in summaries
+        ]
+        return {
+            "sessions": sessions,
+            "has_more": len(summaries) >= page_size,
+            "before": summaries[-1].get("last_message_ts") if summaries else None,
+            "before_id": summaries[-1]["session_id"] if summaries else None
+        }
         
     except Exception as e:
         import logging
@@ -4,7 +4,11 @@ from ingestion import processor
 from models import IngestResponse, DocumentMetadata
 from pydantic import BaseModel
 from r2_storage import r2_storage
+from document_cache import invalidate_document
+from event_hub import event_hub
+from job_queue import job_queue
 from qdrant_client.http import models
+import asyncio
 import uuid
 
 from config import QDRANT_COLLECTION_NAME, VECTOR_SIZE, BATCH_SIZE
@@ -30,9 +34,15 @@ async def ingest_file(file: UploadFile = File(...), session_id: str = Form(None)
     import time
     start_time = time.time()
     
+    def progress(stage: str, done: int = 0, total: int = 0):
+        event_hub.publish(session_id, {
+            "type": "ingest.progress", "filename": file.filename, "stage": stage, "done": done, "total": total
+        })
+    
     try:
         content = await file.read()
-        text, metadata = processor.parse_file(content, file.filename)
+        progress("parsing")
+        text, metadata = await asyncio.to_thread(processor.parse_file, content, file.filename)
         
         if not text:
             raise HTTPException(status_code=400, detail="Could not extract text from file")
@@ -46,28 +56,11 @@ async def ingest_file(file: UploadFile = File(...), session_id: str = Form(None)
             file_url = None
         
         chunks = processor.chunk_text(text)
-        points = []
-        
-        for chunk_data in chunks:
-            vector = processor.get_embedding(chunk_data['text'])
-            points.append(models.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vector,
-                payload={
-                    "filename": file.filename,
-                    "text": chunk_data['text'],
-                    "chunk_index": chunk_data['chunk_index'],
-                    "chunk_hash": chunk_data['hash'],
-                    "file_type": metadata['file_type'],
-                    "file_size": metadata['file_size'],
-                    "file_url": file_url,  # R2 URL
-                    "processed_at": metadata['processed_at'],
-                    "session_id": session_id,  # Session isolation
-                    "type": "file"
-                }
-            ))
+        progress("embedding", 0, len(chunks))
+        points = await asyncio.to_thread(build_points, chunks, file.filename, metadata, file_url, session_id, progress)
             
         if points:
+            progress("indexing", len(points), len(points))
             batch_result = qdrant_manager.batch_upsert(
                 collection_name=COLLECTION_NAME,
                 points=points,
@@ -80,8 +73,16 @@ async def ingest_file(file: UploadFile = File(...), session_id: str = Form(None)
             # Add batch statistics to metadata
             metadata["batch_stats"] = batch_result
             
+            # Caches built from an older version of this file are now stale
+            invalidate_document(file.filename)
+            
+            # Leaf, file and session summaries are brought up to date in the background
+            if session_id:
+                job_queue.enqueue("summary_tree_file", session_id=session_id, filename=file.filename)
+            
         import time
         processing_time = time.time() - start_time if 'start_time' in locals() else 0.0
+        progress("done", len(points), len(points))
         
         return IngestResponse(
             filename=file.filename,
@@ -96,4 +97,31 @@ async def ingest_file(file: UploadFile = File(...), session_id: str = Form(None)
         )
         
     except Exception as e:
+        progress("failed")
         raise HTTPException(status_code=500, detail=str(e))
+
+def build_points(chunks, filename, metadata, file_url, session_id, progress):
+    """Embed chunks into points, reporting progress about every tenth of the file (runs in a worker thread)."""
+    points = []
+    step = max(1, len(chunks) // 10)
+    for chunk_data in chunks:
+        vector = processor.get_embedding(chunk_data['text'])
+        points.append(models.PointStruct(
+            id=str(uuid.uuid4()),
+            vector=vector,
+            payload={
+                "filename": filename,
+                "text": chunk_data['text'],
+                "chunk_index": chunk_data['chunk_index'],
+                "chunk_hash": chunk_data['hash'],
+                "file_type": metadata['file_type'],
+                "file_size": metadata['file_size'],
+                "file_url": file_url,  # R2 URL
+                "processed_at": metadata['processed_at'],
+                "session_id": session_id,  # Session isolation
+                "type": "file"
+            }
+        ))
+        if len(points) % step == 0:
+            progress("embedding", len(points), len(chunks))
+    return points
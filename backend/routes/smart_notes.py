@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
+import json
 import time
 import uuid
 import logging
@@ -12,6 +15,10 @@ from groq_client import groq_client
 from database import qdrant_manager
 from ingestion import get_embedding
 from r2_storage import r2_storage
+from note_engine import note_engine
+from summary_tree import summary_tree
+from job_queue import job_queue, QUEUED, SUCCEEDED, FAILED
+from config import NOTES_PROMPT_VERSION
 
 logger = logging.getLogger(__name__)
 print("DEBUG: LOADING SMART_NOTES ROUTER MODULE")
@@ -27,6 +34,8 @@ try:
     # Ensure other useful indexes exist
     qdrant_manager.create_payload_index(COLLECTION_NAME, "file_type", PayloadSchemaType.KEYWORD)
     qdrant_manager.create_payload_index(COLLECTION_NAME, "session_id", PayloadSchemaType.KEYWORD)
+    # Note cache lookups by source content hash
+    qdrant_manager.create_payload_index(COLLECTION_NAME, "content_key", PayloadSchemaType.KEYWORD)
 except Exception as e:
     logger.warning(f"Could not ensure indexes for smart notes: {e}")
 
@@ -41,217 +50,288 @@ class NoteResponse(BaseModel):
     r2_url: Optional[str]
     message: str
 
-async def generate_note_logic(text: str) -> str:
+async def generate_note_logic(text: str, on_progress=None) -> str:
     """
-    Generate structured notes from text using chunked approach for large documents.
+    Generate structured notes from text; large documents go through the parallel map-reduce engine.
     """
     try:
         if not groq_client.client:
             raise HTTPException(status_code=500, detail="Groq client not initialized. Please check GROQ_API_KEY.")
-            
-        CHUNK_SIZE = 6000
-        model_name = "llama-3.1-8b-instant"
-        
-        if len(text) <= CHUNK_SIZE:
-            return await process_single_chunk(text, model_name)
-        
-        # Process large documents in chunks
-        chunks = [text[i:i+CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
-        logger.info(f"Processing large document in {len(chunks)} chunks")
-        
-        chunk_summaries = []
-        for i, chunk in enumerate(chunks):
-            summary = await process_chunk_summary(chunk, i+1, len(chunks), model_name)
-            chunk_summaries.append(summary)
-        
-        combined_text = "\n\n".join(chunk_summaries)
-        return await create_final_note(combined_text, model_name)
+        return await note_engine.generate(text, on_progress)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Note generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"AI Generation failed: {str(e)}")
 
-async def process_single_chunk(text: str, model_name: str) -> str:
-    prompt = f"""Create structured notes in Markdown:
+class NoteJobResponse(BaseModel):
+    job_id: Optional[str]
+    status: str
+    cached: bool = False
+    note: Optional[NoteResponse] = None
 
-# Executive Summary
-- [Key points]
+# Progress of note jobs running in this process, for the status and stream endpoints
+note_progress: Dict[str, Dict[str, Any]] = {}
 
-## Main Topics  
-- [Important topics]
+def note_cache_key(text: str) -> str:
+    """Notes are reused while the source text, prompts and model are unchanged."""
+    return hashlib.sha256(f"{NOTES_PROMPT_VERSION}:{note_engine.model}:{text}".encode("utf-8")).hexdigest()
 
-## Key Insights
-- [Notable insights]
+def load_note_source(request: GenerateNoteRequest) -> str:
+    """The text to summarize: the request text, one file's chunks, or every file of the session."""
+    full_text = request.text
+    
+    # Determine search mode
+    search_filename = request.source_filename or request.filename
+    
+    # If source_filename is explicitly None/Empty but session_id is present, 
+    # it implies "Session Summary" mode (all files).
+    is_session_summary = not request.source_filename and request.session_id
+    
+    if not full_text and is_session_summary:
+        # The session's summary tree root stands in for its files; one call turns it into the note
+        try:
+            root = summary_tree.get_root(request.session_id)
+            if root and root.get("summary") and summary_tree.is_current(request.session_id, root):
+                logger.info(f"Using summary tree root of session {request.session_id} ({len(root.get('files', []))} files)")
+                return root["summary"]
+            # Missing, or behind a file added, removed or excluded since: read the chunks this time
+            job_queue.enqueue("summary_tree_session", session_id=request.session_id)
+        except Exception as e:
+            logger.warning(f"Summary tree unavailable for session {request.session_id}: {e}")
+    
+    if not full_text and (search_filename or is_session_summary) and request.session_id:
+        try:
+            from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+            
+            must_conditions = [
+                FieldCondition(key="session_id", match=MatchValue(value=request.session_id))
+            ]
+            
+            # Only filter by filename if we are NOT doing a session summary
+            if not is_session_summary:
+                must_conditions.append(
+                    FieldCondition(key="filename", match=MatchValue(value=search_filename))
+                )
+            
+            filter_condition = Filter(must=must_conditions)
+            
+            # Retrieve chunks (limit to reasonable amount, e.g., 150 chunks ~ 30-40k tokens)
+            results = qdrant_manager.client.scroll(
+                collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
+                scroll_filter=filter_condition,
+                limit=150,
+                with_payload=True,
+                with_vectors=False
+            )
+            
+            if results and results[0]:
+                # Sort by chunk_index to reconstruct document in order
+                # Note: For session summary, this might mix files, but that's acceptable for a summary.
+                # Ideally we'd sort by filename then chunk_index, but simple sort is okay for now.
+                chunks = sorted(results[0], key=lambda x: (x.payload.get('filename', ''), x.payload.get('chunk_index', 0)))
+                
+                full_text = ""
+                current_file = ""
+                for chunk in chunks:
+                    fname = chunk.payload.get('filename', 'Unknown')
+                    if fname != current_file:
+                        full_text += f"\n\n--- FILE: {fname} ---\n\n"
+                        current_file = fname
+                    full_text += chunk.payload.get('text', '') + "\n"
+                    
+                logger.info(f"Retrieved text for {'session ' + request.session_id if is_session_summary else search_filename}: {len(full_text)} chars")
+            else:
+                logger.warning(f"No chunks found for session {request.session_id}")
+        except Exception as e:
+            logger.error(f"Failed to retrieve document content: {e}")
+    return full_text or ""
 
-DOCUMENT:
-{text}"""
+def find_cached_note(cache_key: str, session_id: Optional[str]) -> Optional[NoteResponse]:
+    """A stored, not deleted note generated from the same source content."""
+    from qdrant_client.http.models import Filter, FieldCondition, MatchValue
     
-    completion = groq_client.client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model=model_name,
-        temperature=0.3,
-        max_tokens=1200
+    must = [FieldCondition(key="content_key", match=MatchValue(value=cache_key))]
+    if session_id:
+        must.append(FieldCondition(key="session_id", match=MatchValue(value=session_id)))
+    points, _ = qdrant_manager.client.scroll(
+        collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
+        scroll_filter=Filter(
+            must=must,
+            must_not=[FieldCondition(key="is_deleted", match=MatchValue(value=True))]
+        ),
+        limit=1,
+        with_payload=True,
+        with_vectors=False
+    )
+    if not points:
+        return None
+    return NoteResponse(
+        note_content=points[0].payload.get("text", ""),
+        r2_url=points[0].payload.get("r2_url"),
+        message=f"Note served from cache. ID: {points[0].id}"
     )
-    return completion.choices[0].message.content
-
-async def process_chunk_summary(chunk: str, chunk_num: int, total_chunks: int, model_name: str) -> str:
-    prompt = f"""Extract key points from Part {chunk_num}/{total_chunks}:
-
-## Key Points from Part {chunk_num}
-- [Extract 3-5 most important points]
 
-SECTION:
-{chunk}"""
+def store_note(note_content: str, filename: str, session_id: Optional[str], cache_key: str) -> NoteResponse:
+    """Upload the note to R2 (optional) and index it in Qdrant."""
+    # Create a unique filename for the note
+    note_filename = f"note_{filename}_{int(time.time())}.md"
+    content_bytes = note_content.encode('utf-8')
+    content_hash = hashlib.md5(content_bytes).hexdigest()
     
-    completion = groq_client.client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model=model_name,
-        temperature=0.2,
-        max_tokens=800
+    r2_url = None
+    try:
+        r2_url = r2_storage.upload_file(content_bytes, note_filename, content_hash)
+    except Exception as e:
+        logger.warning(f"Failed to upload note to R2: {e}, proceeding with Qdrant only.")
+    
+    vector = get_embedding(note_content)
+    doc_id = str(uuid.uuid4())
+    
+    payload = {
+        "text": note_content,
+        "source_filename": filename,
+        "filename": note_filename,
+        "type": "generated_note",
+        "file_type": "generated_note", # Explicitly set for system.py filtering
+        "r2_url": r2_url,
+        "timestamp": time.time(),
+        "session_id": session_id,  # Keep session_id for UI filtering
+        "content_key": cache_key
+    }
+    
+    from qdrant_client.http.models import PointStruct
+    qdrant_manager.client.upsert(
+        collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
+        points=[PointStruct(id=doc_id, vector=vector, payload=payload)],
+        wait=True
+    )
+    logger.info(f"Successfully stored note with ID: {doc_id}")
+    
+    return NoteResponse(
+        note_content=note_content,
+        r2_url=r2_url,
+        message=f"Note generated and stored successfully. ID: {doc_id}"
     )
-    return completion.choices[0].message.content
 
-async def create_final_note(combined_summaries: str, model_name: str) -> str:
-    prompt = f"""Create comprehensive structured note:
+async def generate_note_job(text: str, filename: str, session_id: Optional[str], cache_key: str, progress_id: str) -> dict:
+    """Background job: map-reduce the source text into a note and store it (or reuse an identical one)."""
+    progress = note_progress.setdefault(progress_id, {"stage": "queued", "done": 0, "total": 0, "updated_at": time.time()})
+    try:
+        # An identical request may have finished while this one was queued
+        cached = await asyncio.to_thread(find_cached_note, cache_key, session_id)
+        if cached:
+            return {**cached.model_dump(), "cached": True}
+        
+        def on_progress(stage: str, done: int, total: int):
+            progress.update(stage=stage, done=done, total=total, updated_at=time.time())
+        
+        note_content = await generate_note_logic(text, on_progress)
+        progress.update(stage="storing", updated_at=time.time())
+        note = await asyncio.to_thread(store_note, note_content, filename, session_id, cache_key)
+        return {**note.model_dump(), "cached": False}
+    finally:
+        progress.update(stage="finished", updated_at=time.time())
+        # Progress of long-finished jobs is not needed once their status has been read
+        cutoff = time.time() - 3600
+        for stale in [job for job, p in note_progress.items() if p["stage"] == "finished" and p["updated_at"] < cutoff]:
+            note_progress.pop(stale, None)
 
-# Executive Summary
-- [Overall key points]
+async def update_summary_tree_file(session_id: str, filename: str):
+    """Background job: re-summarize the changed parts of an ingested file and roll them up."""
+    await summary_tree.update_file(session_id, filename)
 
-## Main Topics
-- [Primary themes]
+async def remove_summary_tree_file(filename: str):
+    await summary_tree.remove_file(filename)
 
-## Key Insights
-- [Important findings]
+async def exclude_summary_tree_file(filename: str, excluded: bool):
+    await summary_tree.set_excluded(filename, excluded)
 
-SECTION SUMMARIES:
-{combined_summaries}"""
-    
-    completion = groq_client.client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model=model_name,
-        temperature=0.3,
-        max_tokens=1500
-    )
-    return completion.choices[0].message.content
+async def rebuild_summary_tree_session(session_id: str):
+    await summary_tree.rebuild_session(session_id)
+
+job_queue.register("smart_note", generate_note_job, queue="notes", max_attempts=2)
+# One at a time, so concurrent updates of a session never race on its root
+job_queue.register("summary_tree_file", update_summary_tree_file, queue="summaries", max_attempts=3)
+job_queue.register("summary_tree_remove", remove_summary_tree_file, queue="summaries")
+job_queue.register("summary_tree_exclude", exclude_summary_tree_file, queue="summaries")
+job_queue.register("summary_tree_session", rebuild_summary_tree_session, queue="summaries", max_attempts=3)
 
-@router.post("/notes/generate", response_model=NoteResponse)
+@router.post("/notes/generate", response_model=NoteJobResponse)
 async def generate_note(request: GenerateNoteRequest):
     """
-    Generate notes, store in R2, and index in Qdrant.
+    Schedule note generation and return its job ID; an unchanged source is answered from the cache.
+    Poll /notes/jobs/{job_id} or follow /notes/jobs/{job_id}/stream for the result.
     """
     try:
-        # 1. Fetch Full Document Content from Qdrant
-        full_text = request.text
-        
-        # Determine search mode
-        search_filename = request.source_filename or request.filename
-        
-        # If source_filename is explicitly None/Empty but session_id is present, 
-        # it implies "Session Summary" mode (all files).
-        is_session_summary = not request.source_filename and request.session_id
-        
-        if not full_text and (search_filename or is_session_summary) and request.session_id:
-            try:
-                from qdrant_client.http.models import Filter, FieldCondition, MatchValue
-                
-                must_conditions = [
-                    FieldCondition(key="session_id", match=MatchValue(value=request.session_id))
-                ]
-                
-                # Only filter by filename if we are NOT doing a session summary
-                if not is_session_summary:
-                    must_conditions.append(
-                        FieldCondition(key="filename", match=MatchValue(value=search_filename))
-                    )
-                
-                filter_condition = Filter(must=must_conditions)
-                
-                # Retrieve chunks (limit to reasonable amount, e.g., 150 chunks ~ 30-40k tokens)
-                results = qdrant_manager.client.scroll(
-                    collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
-                    scroll_filter=filter_condition,
-                    limit=150,
-                    with_payload=True,
-                    with_vectors=False
-                )
-                
-                if results and results[0]:
-                    # Sort by chunk_index to reconstruct document in order
-                    # Note: For session summary, this might mix files, but that's acceptable for a summary.
-                    # Ideally we'd sort by filename then chunk_index, but simple sort is okay for now.
-                    chunks = sorted(results[0], key=lambda x: (x.payload.get('filename', ''), x.payload.get('chunk_index', 0)))
-                    
-                    full_text = ""
-                    current_file = ""
-                    for chunk in chunks:
-                        fname = chunk.payload.get('filename', 'Unknown')
-                        if fname != current_file:
-                            full_text += f"\n\n--- FILE: {fname} ---\n\n"
-                            current_file = fname
-                        full_text += chunk.payload.get('text', '') + "\n"
-                        
-                    logger.info(f"Retrieved text for {'session ' + request.session_id if is_session_summary else search_filename}: {len(full_text)} chars")
-                else:
-                    logger.warning(f"No chunks found for session {request.session_id}")
-            except Exception as e:
-                logger.error(f"Failed to retrieve document content: {e}")
-        
-        # 2. Generate Note Content
-        note_content = await generate_note_logic(full_text)
-        
-        # 2. Upload to Cloudflare R2 (optional)
-        # Create a unique filename for the note
-        note_filename = f"note_{request.filename}_{int(time.time())}.md"
-        content_bytes = note_content.encode('utf-8')
-        content_hash = hashlib.md5(content_bytes).hexdigest()
-        
-        r2_url = None
-        try:
-            r2_url = r2_storage.upload_file(content_bytes, note_filename, content_hash)
-        except Exception as e:
-            logger.warning(f"Failed to upload note to R2: {e}, proceeding with Qdrant only.")
-        
-        # 3. Index in Qdrant
-        vector = get_embedding(note_content)
-        doc_id = str(uuid.uuid4())
-        
-        payload = {
-            "text": note_content,
-            "source_filename": request.filename,
-            "filename": note_filename,
-            "type": "generated_note",
-            "file_type": "generated_note", # Explicitly set for system.py filtering
-            "r2_url": r2_url,
-            "timestamp": time.time(),
-            "session_id": request.session_id  # Keep session_id for UI filtering
-        }
-        
-        from qdrant_client.http.models import PointStruct
-        point = PointStruct(id=doc_id, vector=vector, payload=payload)
-        
-        collection_name = os.getenv('QDRANT_COLLECTION_NAME', 'second_brain')
-        
-        try:
-            qdrant_manager.client.upsert(
-                collection_name=collection_name,
-                points=[point],
-                wait=True
-            )
-            logger.info(f"Successfully stored note with ID: {doc_id}")
-        except Exception as e:
-            logger.error(f"Failed to store note in Qdrant: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to store note: {str(e)}")
-        
-        return NoteResponse(
-            note_content=note_content,
-            r2_url=r2_url,
-            message=f"Note generated and stored successfully. ID: {doc_id}"
+        full_text = await asyncio.to_thread(load_note_source, request)
+        if not full_text.strip():
+            raise HTTPException(status_code=400, detail="No content found to generate notes from")
+        
+        cache_key = note_cache_key(full_text)
+        cached = await asyncio.to_thread(find_cached_note, cache_key, request.session_id)
+        if cached:
+            return NoteJobResponse(job_id=None, status=SUCCEEDED, cached=True, note=cached)
+        
+        # The job reports progress under its own ID
+        job_id = uuid.uuid4().hex
+        job_queue.enqueue(
+            "smart_note",
+            job_id=job_id,
+            text=full_text,
+            filename=request.filename,
+            session_id=request.session_id,
+            cache_key=cache_key,
+            progress_id=job_id
         )
+        return NoteJobResponse(job_id=job_id, status=QUEUED)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Generate note error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def note_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    job = job_queue.get_job(job_id)
+    if not job:
+        return None
+    status = {"job_id": job_id, "status": job["status"], "progress": note_progress.get(job_id)}
+    if job["status"] == SUCCEEDED:
+        status["note"] = job.get("result")
+    elif job["status"] == FAILED:
+        status["error"] = job.get("last_error")
+    return status
+
+@router.get("/notes/jobs/{job_id}")
+async def get_note_job(job_id: str):
+    """Status, progress and (once finished) the result of a note generation job."""
+    status = note_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@router.get("/notes/jobs/{job_id}/stream")
+async def stream_note_job(job_id: str):
+    """Server-sent events with the job's progress until it succeeds or fails."""
+    if not note_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last = None
+        while True:
+            status = note_job_status(job_id)
+            snapshot = json.dumps(status, default=str)
+            if snapshot != last:
+                yield f"data: {snapshot}\n\n"
+                last = snapshot
+            if status["status"] in (SUCCEEDED, FAILED):
+                return
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/notes/by-file/{filename}")
 async def get_notes(filename: str):
     """
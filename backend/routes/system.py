@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from database import qdrant_manager
 from r2_storage import r2_storage
+from document_cache import invalidate_document
 from datetime import datetime, timedelta
 import os
 import io
@@ -23,6 +24,39 @@ async def collection_stats(collection_name: str):
     except Exception as e:
         return {"error": str(e)}
 
+@router.post("/memories/consolidate")
+async def consolidate_memories():
+    """Merge near-duplicate memories now instead of waiting for the periodic job."""
+    try:
+        from memory_consolidation import memory_consolidator
+        return await memory_consolidator.consolidate()
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.post("/conversations/archive/migrate")
+async def migrate_conversation_archive():
+    """Schedule compaction of per-exchange conversation objects in R2 into archive segments."""
+    from job_queue import job_queue
+    return {"job_id": job_queue.enqueue("r2_archive_migration")}
+
+@router.get("/jobs")
+async def job_queue_status():
+    """Background job counts per queue and recent failures."""
+    try:
+        from job_queue import job_queue
+        return job_queue.get_stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of a single background job."""
+    from job_queue import job_queue
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.get("/files")
 async def list_uploaded_files(session_id: str = None):
     """List all uploaded files."""
@@ -209,6 +243,7 @@ async def delete_file(filename: str):
     """Delete file from both Qdrant and R2."""
     try:
         from database import get_qdrant_client
+        from job_queue import job_queue
         from qdrant_client.http import models
         client = get_qdrant_client()
         
@@ -251,6 +286,9 @@ async def delete_file(filename: str):
             object_key = file_url.replace(f"{r2_storage.public_url}/", "")
             r2_storage.delete_file(object_key)
         
+        invalidate_document(filename)
+        job_queue.enqueue("summary_tree_remove", filename=filename)
+        
         return {"message": f"File '{filename}' deleted successfully from both Qdrant and R2"}
     except Exception as e:
         return {"error": str(e)}
@@ -293,6 +331,7 @@ async def toggle_file_exclusion(filename: str, exclude: bool = True):
     """Toggle file exclusion from AI without deleting it."""
     try:
         from database import get_qdrant_client
+        from job_queue import job_queue
         from qdrant_client.http import models
         client = get_qdrant_client()
         
@@ -312,6 +351,9 @@ async def toggle_file_exclusion(filename: str, exclude: bool = True):
             )
         )
         
+        invalidate_document(filename)
+        job_queue.enqueue("summary_tree_exclude", filename=filename, excluded=exclude)
+        
         status = "excluded from" if exclude else "included in"
         return {"message": f"File '{filename}' {status} AI access"}
     except Exception as e:
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
 import time
 import logging
 import os
+import hashlib
 
 # Import Clients
 from groq_client import groq_client
@@ -16,6 +17,17 @@ from gemini_client import gemini_client
 from database import qdrant_manager
 from ingestion import get_embedding
 from models import SearchResult
+from answer_cache import answer_cache
+from context_assembler import context_assembler
+from context_compression import context_compressor
+from document_cache import document_cache
+from intent_classifier import intent_classifier
+from circuit_breaker import circuit_breakers
+from request_coalescing import workflow_coalescer
+from memory_store import memory_store
+from job_queue import job_queue
+from response_agreement import agreement_detector, is_failed_response
+from event_hub import event_hub
 
 logger = logging.getLogger(__name__)
 
@@ -40,153 +52,14 @@ async def update_langchain_memory(session_id: str, user_message: str, ai_respons
         logger.info(f"Updated LangChain memory for session {session_id}")
     except Exception as e:
         logger.error(f"LangChain memory update failed: {e}")
+        raise
+    # Folded in its own job so a summarizer retry never appends the turn twice
+    job_queue.enqueue("conversation_summary", session_id=session_id)
 
-async def check_duplicate_question(query: str, session_id: str) -> Optional[str]:
-    """Check if user asked similar question before and return previous result."""
-    try:
-        from qdrant_client.http.models import Filter, FieldCondition, MatchValue
-        
-        # Search for similar questions in chat history
-        query_vector = get_embedding(query)
-        
-        # Search in chat_sessions collection for similar user messages
-        similar_results = qdrant_manager.advanced_search(
-            collection_name="chat_sessions",
-            query_vector=query_vector,
-            limit=3,
-            score_threshold=0.85,  # High threshold for duplicates
-            filter_conditions=Filter(
-                must=[
-                    FieldCondition(key="session_id", match=MatchValue(value=session_id)),
-                    FieldCondition(key="role", match=MatchValue(value="user"))
-                ]
-            )
-        )
-        
-        if similar_results and len(similar_results) > 0:
-            # Get the most similar question
-            similar_question = similar_results[0]
-            similarity_score = similar_question.score
-            
-            if similarity_score > 0.9:  # Very similar question
-                # Check if context has changed (new files uploaded) since this question
-                try:
-                    previous_timestamp = similar_question.payload.get("timestamp")
-                    if previous_timestamp:
-                        # Find latest file upload in this session
-                        # We filter by chunk_index=0 to get one point per file
-                        latest_files = qdrant_manager.client.scroll(
-                            collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
-                            scroll_filter=Filter(
-                                must=[
-                                    FieldCondition(key="session_id", match=MatchValue(value=session_id)),
-                                    FieldCondition(key="chunk_index", match=MatchValue(value=0))
-                                ]
-                            ),
-                            limit=100,
-                            with_payload=True
-                        )
-                        
-                        if latest_files and latest_files[0]:
-                            files = latest_files[0]
-                            # Find max processed_at
-                            max_processed_at = max([f.payload.get("processed_at", "") for f in files])
-                            
-                            if max_processed_at > previous_timestamp:
-                                logger.info("New files detected since previous question. Skipping duplicate check.")
-                                return None
-                except Exception as e:
-                    logger.error(f"Failed to check for context updates: {e}")
-                    # If check fails, assume context might have changed to be safe
-                    return None
-
-                previous_question = similar_question.payload.get("content", "")
-                
-                # Find the corresponding AI response
-                try:
-                    # Get chat history around that time to find the AI response
-                    chat_history = qdrant_manager.client.scroll(
-                        collection_name="chat_sessions",
-                        scroll_filter=Filter(
-                            must=[
-                                FieldCondition(key="session_id", match=MatchValue(value=session_id)),
-                                FieldCondition(key="role", match=MatchValue(value="assistant"))
-                            ]
-                        ),
-                        limit=10,
-                        with_payload=True
-                    )
-                    
-                    if chat_history and chat_history[0]:
-                        # Find the response that came after the similar question
-                        for response in chat_history[0]:
-                            response_content = response.payload.get("content", "")
-                            if len(response_content) > 50:  # Valid response
-                                # Check what memories/documents were used for that answer
-                                memory_info = await get_memory_context_info(previous_question, session_id)
-                                duplicate_msg = (
-                                    "**I notice you asked a similar question before:**\n\n"
-                                    f"*Previous question:* \"{previous_question}\"\n\n"
-                                    f"*Memory sources used:* {memory_info}\n\n"
-                                    f"*My previous answer:*\n{response_content}\n\n"
-                                    "---\n\n"
-                                    "Is this what you were looking for, or would you like me to provide additional information?"
-                                )
-                                return duplicate_msg
-                                
-                except Exception as e:
-                    logger.error(f"Failed to get previous response: {e}")
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"Duplicate check failed: {e}")
-        return None
-
-async def get_memory_context_info(query: str, session_id: str) -> str:
-    """Get information about which memories/documents were used for a query."""
-    try:
-        query_vector = get_embedding(query)
-        
-        # Search for relevant memories and documents
-        from config import QDRANT_COLLECTION_NAME
-        memory_results = qdrant_manager.advanced_search(
-            collection_name=QDRANT_COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=3,
-            score_threshold=0.6,
-            filter_conditions=Filter(
-                should=[
-                    FieldCondition(key="session_id", match=MatchValue(value=session_id)),
-                    FieldCondition(key="file_type", match=MatchValue(value="memory"))
-                ],
-                must_not=[
-                    FieldCondition(key="excluded", match=MatchValue(value=True))
-                ]
-            )
-        )
-        
-        sources = []
-        if memory_results:
-            for result in memory_results:
-                if hasattr(result, 'payload') and result.payload:
-                    file_type = result.payload.get('file_type', 'unknown')
-                    filename = result.payload.get('filename', 'unknown')
-                    
-                    if file_type == 'memory':
-                        sources.append('📧 Conversation Memory')
-                    else:
-                        sources.append(f'📄 {filename}')
-        
-        if sources:
-            unique_sources = list(set(sources))
-            return ', '.join(unique_sources[:3])  # Limit to 3 sources
-        else:
-            return '🧠 General Knowledge'
-            
-    except Exception as e:
-        logger.error(f"Failed to get memory context info: {e}")
-        return '❓ Unknown sources'
+async def summarize_conversation(session_id: str):
+    """Background job: fold older turns of the session into its running summary."""
+    from langchain_memory import get_memory_manager
+    await get_memory_manager().summarize(session_id)
 
 def get_memory_sources_from_results(search_results, active_document_filename=None) -> str:
     """Extract memory sources from search results for display."""
@@ -222,72 +95,112 @@ def get_memory_sources_from_results(search_results, active_document_filename=Non
         logger.error(f"Failed to extract memory sources: {e}")
         return '🧠 General Knowledge'
 
-async def background_memory_task(query: str, answer: str, context_text: str, session_id: str = None):
+def current_document_version(session_id: Optional[str], filename: str) -> Optional[str]:
     """
-    Background task to extract facts and store memory with session isolation.
+    Cheap version check for the active document cache: the latest ingest time of the file's
+    first chunk (one point per ingest). Excluded or deleted documents have no version.
     """
+    from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+    
+    must_conditions = [
+        FieldCondition(key="filename", match=MatchValue(value=filename)),
+        FieldCondition(key="chunk_index", match=MatchValue(value=0))
+    ]
+    if session_id:
+        must_conditions.append(FieldCondition(key="session_id", match=MatchValue(value=session_id)))
     try:
-        # 1. Extract Facts
-        facts = await groq_client.extract_facts(query, answer)
-        logger.info(f"Extracted {len(facts)} facts for query: {query}")
-
-        # 2. Prepare text for ingestion
-        memory_text = f"""
-MEMORY TYPE: Conversation & Facts
-DATE: {time.strftime("%Y-%m-%d")}
-QUERY: {query}
-ANSWER: {answer}
-FACTS:
-{chr(10).join(['- ' + f for f in facts])}
-"""
-        
-        # 3. Simplified direct insertion for memory with session isolation
-        vector = get_embedding(memory_text)
-        
-        import uuid
-        doc_id = str(uuid.uuid4())
-        
-        payload = {
-            "text": memory_text,
-            "filename": "conversation_memory.txt",
-            "file_type": "memory",
-            "chunk_index": 0,
-            "is_fact": True,
-            "timestamp": time.time(),
-            # No session_id for memories - they are shared across all chats
-            "type": "memory"
-        }
-        
-        from qdrant_client.http.models import PointStruct
-        point = PointStruct(
-            id=doc_id,
-            vector=vector,
-            payload=payload
-        )
-        import os
-        collection_name = os.getenv('QDRANT_COLLECTION_NAME', 'second_brain')
-        
-        qdrant_manager.client.upsert(
-            collection_name=collection_name,
-            points=[point],
-            wait=True
+        points, _ = qdrant_manager.client.scroll(
+            collection_name=os.getenv('QDRANT_COLLECTION_NAME', 'second_brain'),
+            scroll_filter=Filter(must=must_conditions, must_not=[FieldCondition(key="excluded", match=MatchValue(value=True))]),
+            limit=16,
+            with_payload=["processed_at"],
+            with_vectors=False
         )
-        logger.info("Memory successfully stored in Qdrant with session isolation.")
+    except Exception as e:
+        logger.warning(f"Could not check the version of {filename}: {e}")
+        return None
+    versions = [point.payload.get("processed_at") for point in points if point.payload and point.payload.get("processed_at")]
+    return max(versions) if versions else None
 
+async def timed_call(coro):
+    """Await a provider call, returning (result or exception, elapsed seconds)."""
+    start = time.time()
+    try:
+        return await coro, time.time() - start
     except Exception as e:
-        logger.error(f"Background Memory Task Error: {e}")
+        return e, time.time() - start
+
+def to_search_results(search_results) -> List[SearchResult]:
+    """Convert Qdrant points into API search results."""
+    if not search_results:
+        return []
+    return [SearchResult(
+        text=res.payload.get("text", "") if hasattr(res, 'payload') and res.payload else "",
+        score=getattr(res, 'score', 0.0),
+        chunk_id=str(getattr(res, 'id', 'unknown')),
+        filename=res.payload.get("filename", "unknown") if hasattr(res, 'payload') and res.payload else "unknown",
+        file_type=res.payload.get("file_type", "unknown") if hasattr(res, 'payload') and res.payload else "unknown",
+        chunk_index=res.payload.get("chunk_index", 0) if hasattr(res, 'payload') and res.payload else 0
+    ) for res in search_results if res is not None]
+
+async def background_memory_task(query: str, answer: str, session_id: str = None):
+    """
+    Background job: hand the exchange to the batched memory pipeline and wait until it is stored.
+    """
+    from memory_pipeline import memory_pipeline
+    await memory_pipeline.submit(query, answer, session_id)
+
+job_queue.register("memory_extraction", background_memory_task, queue="memory")
+job_queue.register("langchain_memory", update_langchain_memory, queue="conversation")
+job_queue.register("conversation_summary", summarize_conversation, queue="conversation")
+
+async def run_parallel_workflow(query: str, context_limit: int = 5, session_id: str = None, active_document_text: str = None, active_document_filename: str = None, request_id: str = None) -> ParallelWorkflowResponse:
+    """
+    Run the workflow, sharing one in-flight computation between concurrent identical requests.
+    Only the computing caller enqueues background memory jobs; callers persist their own chat messages.
+    Streamed events carry the computing caller's request_id, so clients route them to the right turn.
+    """
+    start_time = time.time()
+    key = workflow_coalescer.make_key(
+        query,
+        session_id,
+        active_document_filename,
+        hashlib.md5(active_document_text.encode('utf-8')).hexdigest() if active_document_text else None,
+        context_limit
+    )
+    result, shared = await workflow_coalescer.run(
+        key,
+        lambda: _run_parallel_workflow(query, context_limit, session_id, active_document_text, active_document_filename, request_id)
+    )
+    if not shared:
+        return result
+    return ParallelWorkflowResponse(
+        answer=result.answer,
+        processing_time=time.time() - start_time,
+        sources=result.sources
+    )
 
-async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, context_limit: int = 5, session_id: str = None, active_document_text: str = None, active_document_filename: str = None) -> ParallelWorkflowResponse:
+async def _run_parallel_workflow(query: str, context_limit: int = 5, session_id: str = None, active_document_text: str = None, active_document_filename: str = None, request_id: str = None) -> ParallelWorkflowResponse:
     start_time = time.time()
     
     try:
-        # 0. Analyze Intent
-        intent_data = await gemini_client.analyze_intent(query)
+        # 0. Analyze Intent locally, reusing the query embedding needed for search anyway
+        raw_query_vector = get_embedding(query)
+        intent_data = await intent_classifier.analyze(query, raw_query_vector)
         intent = intent_data.get("intent", "chat")
         keywords = intent_data.get("keywords", [])
         logger.info(f"Intent Analysis: {intent} | Keywords: {keywords}")
 
         # 0. Fetch Active Document Content if filename provided
+        active_document_version = None
+        if active_document_text:
+            active_document_version = hashlib.md5(active_document_text.encode('utf-8')).hexdigest()
+        if active_document_filename and not active_document_text:
+            active_document_version = current_document_version(session_id, active_document_filename)
+            cached_document = document_cache.get(session_id, active_document_filename, active_document_version) if active_document_version else None
+            if cached_document:
+                active_document_text = cached_document
+                logger.info(f"Active document {active_document_filename} served from cache: {len(active_document_text)} chars")
         if active_document_filename and not active_document_text:
             try:
                 from qdrant_client.http.models import Filter, FieldCondition, MatchValue
@@ -324,6 +237,8 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
                 if doc_results and doc_results[0]:
                     chunks = sorted(doc_results[0], key=lambda x: x.payload.get('chunk_index', 0))
                     active_document_text = "\n".join([chunk.payload.get('text', '') for chunk in chunks])
+                    if active_document_version:
+                        document_cache.put(session_id, active_document_filename, active_document_version, active_document_text)
                     logger.info(f"Fetched active document {active_document_filename}: {len(active_document_text)} chars, {len(chunks)} chunks")
                 else:
                     logger.warning(f"Active document {active_document_filename} NOT FOUND in session {session_id}")
@@ -343,28 +258,26 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
             except Exception as e:
                 logger.error(f"Failed to fetch active document: {e}")
 
-        # 1. Search Context (Session-specific documents + memories)
+        event_hub.publish(session_id, {"type": "status", "stage": "searching", "request_id": request_id})
+        
+        # 1. Search Context (Session-specific documents and global memories, queried concurrently)
         # Use keywords for search if available and intent is search/summarize, otherwise use raw query
         search_query = " ".join(keywords) if keywords and intent in ["search", "summarize"] else query
-        query_vector = get_embedding(search_query)
+        query_vector = raw_query_vector if search_query == query else get_embedding(search_query)
         from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny
         
         from config import QDRANT_SCORE_THRESHOLD
         score_threshold = QDRANT_SCORE_THRESHOLD
         collection_name = os.getenv('QDRANT_COLLECTION_NAME', 'second_brain')
         
-        # Filter by session_id OR global memories, exclude excluded files
+        # Session documents only; memories live in their own collection and are searched alongside
         session_filter = None
         if session_id:
             session_filter = Filter(
-                should=[
+                must=[
                     FieldCondition(
                         key="session_id",
                         match=MatchValue(value=session_id)
-                    ),
-                    FieldCondition(
-                        key="file_type",
-                        match=MatchValue(value="memory")
                     )
                 ],
                 must_not=[
@@ -380,20 +293,27 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
             )
         
         try:
-            search_results = qdrant_manager.advanced_search(
-                collection_name=collection_name,
-                query_vector=query_vector,
-                limit=context_limit,
-                score_threshold=score_threshold,
-                filter_conditions=session_filter
+            document_results, memory_results = await asyncio.gather(
+                asyncio.to_thread(
+                    qdrant_manager.advanced_search,
+                    collection_name=collection_name,
+                    query_vector=query_vector,
+                    limit=context_limit,
+                    score_threshold=score_threshold,
+                    filter_conditions=session_filter,
+                    with_vectors=True  # Reused for near-duplicate removal in context assembly
+                ),
+                asyncio.to_thread(memory_store.search, query_vector, with_vectors=True)
             )
+            # Documents first so memories never crowd out document hits
+            search_results = (document_results or []) + (memory_results or [])
             
             # Debug: Log search details
             logger.info(f"Search query: {query}")
             logger.info(f"Collection: {collection_name}")
             logger.info(f"Score threshold: {score_threshold}")
             logger.info(f"Filter: {session_filter}")
-            logger.info(f"Search results count: {len(search_results) if search_results else 0}")
+            logger.info(f"Search results count: {len(document_results or [])} documents, {len(memory_results or [])} memories")
             
             # Force a test search to see if collection has data
             try:
@@ -414,26 +334,48 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
         if search_results is None:
             search_results = []
         
-        # Safe context text extraction
-        context_text = ""
-        if search_results:
-            try:
-                context_text = "\n\n".join([res.payload.get('text', '') for res in search_results if res and hasattr(res, 'payload') and res.payload])
-            except Exception as e:
-                logger.error(f"Context extraction failed: {e}")
-                context_text = ""
+        # Recent conversation from LangChain memory
+        conversation = ""
+        try:
+            from langchain_memory import get_memory_manager
+            memory_manager = get_memory_manager()
+            # A chat_sessions backend rebuilds uncached sessions with a blocking Qdrant scroll
+            conversation = await asyncio.to_thread(memory_manager.get_recent_conversation, session_id or "default")
+        except Exception as e:
+            logger.error(f"Memory enhancement failed: {e}")
         
-        # Check for duplicate questions first
-        duplicate_response = await check_duplicate_question(query, session_id)
-        if duplicate_response:
+        # Check the global answer cache before running the LLM ensemble
+        cache_vector = raw_query_vector
+        cache_fingerprint = answer_cache.fingerprint(
+            search_results,
+            (active_document_filename or "inline", active_document_version) if active_document_version else None,
+            context_mode=intent,
+            conversation=conversation
+        )
+        cached_answer = answer_cache.get(cache_vector, cache_fingerprint)
+        if cached_answer:
+            memory_sources = get_memory_sources_from_results(search_results, active_document_filename)
+            final_answer = f"{cached_answer}\n\n---\n**Sources:** {memory_sources}" if memory_sources else cached_answer
+            job_queue.enqueue("langchain_memory", session_id=session_id or "default", user_message=query, ai_response=final_answer)
             return ParallelWorkflowResponse(
-                answer=duplicate_response,
+                answer=final_answer,
                 processing_time=time.time() - start_time,
-                sources=[]
+                sources=to_search_results(search_results)
+            )
+        
+        # Compress a large active document to the sentences relevant to this query
+        if active_document_text:
+            active_document_text = await asyncio.to_thread(
+                context_compressor.compress,
+                active_document_text,
+                document_key=active_document_filename or "inline",
+                version=active_document_version,
+                query_vector=None if intent == "summarize" else cache_vector
             )
         
         # Add friendly context message if no relevant information found
-        if not context_text.strip() and not active_document_text:
+        context_notice = ""
+        if not search_results and not active_document_text:
             # Check if there are excluded files in the session
             try:
                 excluded_check = qdrant_manager.client.scroll(
@@ -449,89 +391,99 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
                 )
                 
                 if excluded_check and excluded_check[0]:
-                    context_text = "I notice you have documents uploaded but they are currently excluded from AI access. Please click 'Include' on the files you want me to access, then ask your question again."
+                    context_notice = "I notice you have documents uploaded but they are currently excluded from AI access. Please click 'Include' on the files you want me to access, then ask your question again."
                 else:
-                    context_text = "No specific documents found in the current session. Please answer the user's question based on your general knowledge and training."
+                    context_notice = "No specific documents found in the current session. Please answer the user's question based on your general knowledge and training."
             except Exception as e:
                 logger.error(f"Failed to check excluded files: {e}")
-                context_text = "No specific documents found in the current session. Please answer the user's question based on your general knowledge and training."
-        
-        # Prepend Active Document Text (Highest Priority)
-        if active_document_text:
-            # Truncate if too long to avoid token limits (approx 6000 words / 8k tokens)
-            if len(active_document_text) > 30000:
-                active_document_text = active_document_text[:30000] + "...(truncated)"
-            context_text = f"ACTIVE DOCUMENT ({active_document_filename or 'Current File'}):\n{active_document_text}\n\nRELATED CONTEXT:\n{context_text}"
-        
-        # Enhance context with user preferences and memory
-        try:
-            from langchain_memory import get_memory_manager
-            memory_manager = get_memory_manager()
-            context_text = memory_manager.get_context_with_preferences(session_id or "default", context_text)
-        except Exception as e:
-            logger.error(f"Memory enhancement failed: {e}")
+                context_notice = "No specific documents found in the current session. Please answer the user's question based on your general knowledge and training."
+        
+        # Build the context once; each provider gets a view fitted to its token budget
+        assembled_context = context_assembler.assemble(
+            search_results,
+            active_document_text=active_document_text,
+            active_document_filename=active_document_filename,
+            conversation=conversation,
+            notice=context_notice
+        )
         
-        # 2. Parallel Model Execution
-        tasks = [
-            gemini_client.chat_with_context(query, context_text),
-            mistral_client.chat_with_context(query, [context_text]),
-            cohere_client.chat_with_context(query, context_text)
-        ]
+        # 2. Parallel Model Execution (providers with an open circuit are dropped from the fan-out)
+        worker_calls = {
+            "gemini": lambda: gemini_client.chat_with_context(query, assembled_context.for_provider("gemini")),
+            "mistral": lambda: mistral_client.chat_with_context(query, [assembled_context.for_provider("mistral")]),
+            "cohere": lambda: cohere_client.chat_with_context(query, assembled_context.for_provider("cohere"))
+        }
+        providers = [provider for provider in worker_calls if circuit_breakers.get(provider).allow()]
+        skipped = [provider for provider in worker_calls if provider not in providers]
+        if skipped:
+            logger.warning(f"Skipping providers with open circuits: {skipped}")
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        event_hub.publish(session_id, {"type": "status", "stage": "generating", "providers": providers, "request_id": request_id})
+        results = await asyncio.gather(*[timed_call(worker_calls[provider]()) for provider in providers])
         
-        # Process results
+        # Process results; failed workers are recorded on their breaker and not sent to the aggregator
         responses = {}
-        providers = ["gemini", "mistral", "cohere"]
         
-        for i, res in enumerate(results):
-            provider = providers[i]
+        for provider, (res, elapsed) in zip(providers, results):
             if isinstance(res, Exception):
                 logger.error(f"{provider} failed: {res}")
-                responses[provider] = f"Error: {str(res)}"
+                output = f"Error: {str(res)}"
             elif res is None:
                 logger.warning(f"{provider} returned None")
-                responses[provider] = "No response from model"
+                output = "No response from model"
             elif isinstance(res, dict) and "output" in res:
-                responses[provider] = res["output"]
+                output = res["output"]
             elif isinstance(res, dict) and "error" in res:
-                responses[provider] = f"Error: {res['error']}"
+                output = f"Error: {res['error']}"
             else:
-                responses[provider] = str(res) if res is not None else "Empty response"
+                output = str(res) if res is not None else "Empty response"
+            
+            if is_failed_response(output):
+                circuit_breakers.get(provider).record_failure(elapsed)
+                logger.warning(f"{provider} response dropped: {output[:200]}")
+            else:
+                circuit_breakers.get(provider).record_success(elapsed)
+                responses[provider] = output
  
-        # 3. Aggregation (Groq)
-        if not responses:
-            final_answer = "I apologize, but I'm unable to process your request at the moment due to technical issues."
+        # 3. Aggregation (Groq); skipped when the workers already agree, and with Groq's circuit open
+        # the healthiest worker answer is used. allow() starts a probe, so it is only asked when Groq is called.
+        consensus = await asyncio.to_thread(agreement_detector.find_consensus, responses)
+        if consensus:
+            final_answer = consensus[1]
+        elif circuit_breakers.get("groq").allow():
+            event_hub.publish(session_id, {"type": "status", "stage": "aggregating", "request_id": request_id})
+            # Stream the synthesized answer to connections following the session
+            on_delta = None
+            if event_hub.has_subscribers(session_id):
+                on_delta = lambda delta: event_hub.publish(session_id, {"type": "answer.delta", "delta": delta, "request_id": request_id})
+            final_answer = await groq_client.aggregate_responses(query, assembled_context.for_provider("groq"), responses, on_delta=on_delta)
+            if is_failed_response(final_answer) and responses:
+                final_answer = responses[circuit_breakers.healthiest(responses.keys())]
+        elif responses:
+            final_answer = responses[circuit_breakers.healthiest(responses.keys())]
         else:
-            final_answer = await groq_client.aggregate_responses(query, context_text, responses)
-            if final_answer is None:
-                final_answer = "I apologize, but I couldn't generate a proper response. Please try again."
+            final_answer = None
+        
+        if final_answer is None:
+            final_answer = "I apologize, but I'm unable to process your request at the moment due to technical issues."
+        elif not is_failed_response(final_answer):
+            cached_filenames = [res.payload.get('filename') for res in search_results if res and getattr(res, 'payload', None)]
+            answer_cache.put(cache_vector, cache_fingerprint, final_answer, cached_filenames + [active_document_filename])
         
         # 4. Add memory source information to response
         memory_sources = get_memory_sources_from_results(search_results, active_document_filename)
         if memory_sources:
             final_answer += f"\n\n---\n**Sources:** {memory_sources}"
         
-        # 4. Background Task: Fact Extraction & Storage with session isolation
-        if background_tasks:
-            background_tasks.add_task(background_memory_task, query, final_answer, context_text, session_id)
-            # Add conversation to LangChain memory
-            background_tasks.add_task(update_langchain_memory, session_id or "default", query, final_answer)
-        else:
-            logger.warning("No background_tasks provided, skipping background memory task")
+        # 4. Background Jobs: Fact Extraction & Storage, LangChain memory
+        job_queue.enqueue("memory_extraction", query=query, answer=final_answer, session_id=session_id)
+        job_queue.enqueue("langchain_memory", session_id=session_id or "default", user_message=query, ai_response=final_answer)
         
         # 5. Return Response
         return ParallelWorkflowResponse(
             answer=final_answer,
             processing_time=time.time() - start_time,
-            sources=[SearchResult(
-                text=res.payload.get("text", "") if hasattr(res, 'payload') and res.payload else "",
-                score=getattr(res, 'score', 0.0),
-                chunk_id=str(getattr(res, 'id', 'unknown')),
-                filename=res.payload.get("filename", "unknown") if hasattr(res, 'payload') and res.payload else "unknown",
-                file_type=res.payload.get("file_type", "unknown") if hasattr(res, 'payload') and res.payload else "unknown",
-                chunk_index=res.payload.get("chunk_index", 0) if hasattr(res, 'payload') and res.payload else 0
-            ) for res in search_results if res is not None] if search_results else []
+            sources=to_search_results(search_results)
         )
 
     except Exception as e:
@@ -539,5 +491,5 @@ async def run_parallel_workflow(query: str, background_tasks: BackgroundTasks, c
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/workflow/parallel", response_model=ParallelWorkflowResponse)
-async def execute_parallel_workflow(request: ParallelWorkflowRequest, background_tasks: BackgroundTasks):
-    return await run_parallel_workflow(request.query, background_tasks, request.context_limit, active_document_text=request.active_document_text)
+async def execute_parallel_workflow(request: ParallelWorkflowRequest):
+    return await run_parallel_workflow(request.query, request.context_limit, active_document_text=request.active_document_text)
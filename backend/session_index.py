@@ -0,0 +1,309 @@
+import logging
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from qdrant_client.http import models
+
+from config import SESSION_INDEX_COLLECTION_NAME
+from database import qdrant_manager
+
+logger = logging.getLogger(__name__)
+
+class SessionIndex:
+    """
+    Session metadata store: materialized per-session summary records (title, created,
+    last message, message count) in a payload-only collection, fronted by a read-through
+    in-process cache. Once warmed, title lookups and listing are served from the cache.
+    """
+
+    def __init__(self, collection_name: str = "chat_session_index", messages_collection: str = "chat_sessions"):
+        self.collection_name = collection_name
+        self.messages_collection = messages_collection
+        # Serializes read-modify-write updates of summary records within the process
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._complete = False
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def ensure_collection(self):
+        qdrant_manager.ensure_payload_collection(self.collection_name)
+        qdrant_manager.create_payload_index(self.collection_name, "session_id", models.PayloadSchemaType.KEYWORD)
+        qdrant_manager.create_payload_index(self.collection_name, "last_message_ts", models.PayloadSchemaType.FLOAT)
+
+    @staticmethod
+    def point_id(session_id: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"chat-session:{session_id}"))
+
+    @staticmethod
+    def default_title(session_id: str) -> str:
+        return f"Chat {session_id[:8]}"
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        summary = self._cache.get(session_id)
+        if summary is not None or self._complete:
+            self._cache_hits += 1
+            return summary
+        self._cache_misses += 1
+        records = qdrant_manager.client.retrieve(self.collection_name, ids=[self.point_id(session_id)], with_payload=True)
+        if not records:
+            return None
+        self._cache[session_id] = records[0].payload
+        return records[0].payload
+
+    def has_title(self, session_id: str) -> bool:
+        """Whether a generated title is already stored for the session."""
+        summary = self.get(session_id)
+        return bool(summary and summary.get("title") and summary["title"] != self.default_title(session_id))
+
+    def warm(self) -> int:
+        """Load every summary into the cache; afterwards reads never go to Qdrant."""
+        cache, offset = {}, None
+        while True:
+            records, offset = qdrant_manager.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for record in records:
+                cache[record.payload["session_id"]] = record.payload
+            if offset is None:
+                break
+        with self._lock:
+            # Writes that landed while scrolling are newer than what was read
+            cache.update(self._cache)
+            self._cache = cache
+            self._complete = True
+        logger.info(f"Session index cache warmed with {len(cache)} sessions")
+        return len(cache)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "sessions_cached": len(self._cache),
+            "cache_complete": self._complete,
+            "cache_hit_rate": self._cache_hits / lookups if lookups else 0.0
+        }
+
+    def record_messages(self, payloads: Iterable[Dict[str, Any]]):
+        """Fold newly stored message payloads into their sessions' summary records."""
+        by_session: Dict[str, List[Dict[str, Any]]] = {}
+        for payload in payloads:
+            if payload.get("session_id") and not payload.get("is_title"):
+                by_session.setdefault(payload["session_id"], []).append(payload)
+        if not by_session:
+            return
+
+        with self._lock:
+            existing = {s: self._cache[s] for s in by_session if s in self._cache}
+            missing = [s for s in by_session if s not in existing]
+            if missing and not self._complete:
+                for record in qdrant_manager.client.retrieve(
+                    self.collection_name, ids=[self.point_id(s) for s in missing], with_payload=True
+                ):
+                    existing[record.payload["session_id"]] = record.payload
+            points = []
+            for session_id, messages in by_session.items():
+                messages.sort(key=lambda p: p.get("ts", 0.0))
+                summary = dict(existing.get(session_id) or {
+                    "session_id": session_id,
+                    "title": self.default_title(session_id),
+                    "created": messages[0].get("timestamp"),
+                    "created_ts": messages[0].get("ts", 0.0),
+                    "message_count": 0
+                })
+                if not summary.get("created"):
+                    # Summary created by a title update before its first messages were flushed
+                    summary["created"] = messages[0].get("timestamp")
+                    summary["created_ts"] = messages[0].get("ts", 0.0)
+                summary["message_count"] = summary.get("message_count", 0) + len(messages)
+                if messages[-1].get("ts", 0.0) >= summary.get("last_message_ts", 0.0):
+                    summary["last_message"] = messages[-1].get("timestamp")
+                    summary["last_message_ts"] = messages[-1].get("ts", 0.0)
+                points.append(models.PointStruct(id=self.point_id(session_id), vector={}, payload=summary))
+            qdrant_manager.client.upsert(self.collection_name, points=points, wait=True)
+            for point in points:
+                self._cache[point.payload["session_id"]] = point.payload
+
+    def set_title(self, session_id: str, title: str):
+        with self._lock:
+            summary = self.get(session_id) or {
+                "session_id": session_id,
+                "created": None,
+                "created_ts": 0.0,
+                "last_message": None,
+                "last_message_ts": 0.0,
+                "message_count": 0
+            }
+            summary = dict(summary, title=title)
+            qdrant_manager.client.upsert(
+                self.collection_name,
+                points=[models.PointStruct(id=self.point_id(session_id), vector={}, payload=summary)],
+                wait=True
+            )
+            self._cache[session_id] = summary
+
+    def list(self, limit: int = 20, before: Optional[float] = None, before_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Sessions ordered by (most recent message, session ID), descending, starting below the
+        (before, before_id) cursor. Without before_id every session at the `before` timestamp is skipped.
+        """
+        def order(summary):
+            return summary.get("last_message_ts", 0.0), summary["session_id"]
+
+        def below(summary):
+            if before is None:
+                return True
+            ts = summary.get("last_message_ts", 0.0)
+            return ts < before or (before_id is not None and ts == before and summary["session_id"] < before_id)
+
+        if self._complete:
+            return sorted((s for s in list(self._cache.values()) if below(s)), key=order, reverse=True)[:limit]
+
+        # Qdrant orders ties arbitrarily, so the full run of sessions at the cursor and at the
+        # page edge is read and ordered by session ID here
+        candidates = {}
+        if before is not None and before_id is not None:
+            candidates.update((s["session_id"], s) for s in self._scroll_at(before) if below(s))
+        scroll_filter = None
+        if before is not None:
+            scroll_filter = models.Filter(must=[
+                models.FieldCondition(key="last_message_ts", range=models.Range(lt=before))
+            ])
+        records, _ = qdrant_manager.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=scroll_filter,
+            limit=limit,
+            order_by=models.OrderBy(key="last_message_ts", direction=models.Direction.DESC),
+            with_payload=True,
+            with_vectors=False
+        )
+        candidates.update((record.payload["session_id"], record.payload) for record in records)
+        page = sorted(candidates.values(), key=order, reverse=True)[:limit]
+        if len(page) == limit:
+            candidates.update((s["session_id"], s) for s in self._scroll_at(page[-1].get("last_message_ts", 0.0)) if below(s))
+            page = sorted(candidates.values(), key=order, reverse=True)[:limit]
+        return page
+
+    def _scroll_at(self, ts: float) -> List[Dict[str, Any]]:
+        """Every summary whose last message is at exactly `ts`."""
+        ts_filter = models.Filter(must=[
+            models.FieldCondition(key="last_message_ts", range=models.Range(gte=ts, lte=ts))
+        ])
+        summaries, offset = [], None
+        while True:
+            records, offset = qdrant_manager.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=ts_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            summaries.extend(record.payload for record in records)
+            if offset is None:
+                return summaries
+
+    def delete(self, session_id: str):
+        with self._lock:
+            qdrant_manager.client.delete(
+                self.collection_name,
+                points_selector=models.PointIdsList(points=[self.point_id(session_id)])
+            )
+            self._cache.pop(session_id, None)
+
+    def rebuild_if_empty(self) -> int:
+        """Build summaries from existing chat messages the first time the index is used."""
+        if qdrant_manager.client.count(self.collection_name, exact=True).count > 0:
+            return 0
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        offset = None
+        while True:
+            points, offset = qdrant_manager.client.scroll(
+                collection_name=self.messages_collection,
+                limit=1000,
+                offset=offset,
+                with_payload=["session_id", "timestamp", "ts", "is_title", "content"],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                session_id = payload.get("session_id")
+                if not session_id:
+                    continue
+                summary = summaries.setdefault(session_id, {
+                    "session_id": session_id,
+                    "title": self.default_title(session_id),
+                    "created": None,
+                    "created_ts": float("inf"),
+                    "last_message": None,
+                    "last_message_ts": 0.0,
+                    "message_count": 0
+                })
+                if payload.get("is_title"):
+                    summary["title"] = payload.get("content", "").replace("CHAT_TITLE: ", "")
+                    continue
+                ts = payload.get("ts", 0.0) or 0.0
+                summary["message_count"] += 1
+                if ts < summary["created_ts"]:
+                    summary["created"], summary["created_ts"] = payload.get("timestamp"), ts
+                if ts >= summary["last_message_ts"]:
+                    summary["last_message"], summary["last_message_ts"] = payload.get("timestamp"), ts
+            if offset is None:
+                break
+
+        points = []
+        for session_id, summary in summaries.items():
+            if summary["created_ts"] == float("inf"):
+                summary["created_ts"] = 0.0
+            points.append(models.PointStruct(id=self.point_id(session_id), vector={}, payload=summary))
+        for start in range(0, len(points), 256):
+            qdrant_manager.client.upsert(self.collection_name, points=points[start:start + 256], wait=True)
+        if points:
+            logger.info(f"Built session index for {len(points)} sessions")
+        return len(points)
+
+    def migrate_title_points(self) -> int:
+        """Move titles stored as zero-vector chat_sessions points into the summaries, then delete those points."""
+        title_filter = models.Filter(must=[
+            models.FieldCondition(key="is_title", match=models.MatchValue(value=True))
+        ])
+        titles: Dict[str, Any] = {}
+        offset = None
+        while True:
+            points, offset = qdrant_manager.client.scroll(
+                collection_name=self.messages_collection,
+                scroll_filter=title_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=["session_id", "content", "timestamp"],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                if payload.get("session_id"):
+                    # Titles were regenerated on every message; keep the latest
+                    previous = titles.get(payload["session_id"])
+                    if previous is None or (payload.get("timestamp") or "") >= (previous.get("timestamp") or ""):
+                        titles[payload["session_id"]] = payload
+            if offset is None:
+                break
+
+        for session_id, payload in titles.items():
+            self.set_title(session_id, payload.get("content", "").replace("CHAT_TITLE: ", ""))
+        if titles:
+            qdrant_manager.client.delete(self.messages_collection, points_selector=models.FilterSelector(filter=title_filter))
+            logger.info(f"Moved {len(titles)} chat titles into the session index")
+        return len(titles)
+
+# Global instance
+session_index = SessionIndex(collection_name=SESSION_INDEX_COLLECTION_NAME)
+
+try:
+    session_index.ensure_collection()
+except Exception as e:
+    print(f"Warning: Could not ensure collection {SESSION_INDEX_COLLECTION_NAME}: {e}")
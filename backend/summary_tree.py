@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models
+
+from config import QDRANT_COLLECTION_NAME, NOTES_PROMPT_VERSION, NOTES_TREE_COLLECTION_NAME, NOTES_TREE_LEAF_CHUNKS
+from database import qdrant_manager
+
+logger = logging.getLogger(__name__)
+
+LEAF, FILE, SESSION = "leaf", "file", "session"
+
+class SummaryTree:
+    """
+    Persistent summary tree over ingested documents: leaf summaries of fixed groups of
+    chunks, rolled up into one summary per file and one root per session. Every node
+    stores a hash of its inputs, so an update only re-summarizes leaves whose chunks
+    changed and the nodes above them; unchanged paths cost a read and no LLM call.
+    """
+
+    def __init__(self, collection_name: str = "document_summaries", chunks_collection: str = "second_brain",
+                 leaf_chunks: int = 12):
+        self.collection_name = collection_name
+        self.chunks_collection = chunks_collection
+        self.leaf_chunks = leaf_chunks
+        self._stats = {"leaves_summarized": 0, "files_summarized": 0, "roots_summarized": 0, "unchanged": 0}
+
+    def ensure_collection(self):
+        qdrant_manager.ensure_payload_collection(self.collection_name)
+        for field in ("level", "session_id", "filename"):
+            qdrant_manager.create_payload_index(self.collection_name, field, models.PayloadSchemaType.KEYWORD)
+
+    @staticmethod
+    def point_id(level: str, session_id: str, filename: str = "", index: int = 0) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"summary-tree:{level}:{session_id}:{filename}:{index}"))
+
+    @staticmethod
+    def node_hash(parts: List[str]) -> str:
+        """Inputs of a node, plus the prompt version and model that turned them into its summary."""
+        from note_engine import note_engine
+        return hashlib.sha256(f"{NOTES_PROMPT_VERSION}:{note_engine.model}:{'|'.join(parts)}".encode("utf-8")).hexdigest()
+
+    def get_root(self, session_id: str) -> Optional[Dict[str, Any]]:
+        records = qdrant_manager.client.retrieve(self.collection_name, ids=[self.point_id(SESSION, session_id)], with_payload=True)
+        return records[0].payload if records else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    def is_current(self, session_id: str, root: Dict[str, Any]) -> bool:
+        """Whether the root covers exactly the session's included files at their latest ingest."""
+        return root.get("versions") == self._session_versions(session_id)
+
+    async def update_file(self, session_id: str, filename: str, update_root: bool = True):
+        """Re-summarize the leaves of a file whose chunks changed, then its file node and (unless batched) the session root."""
+        from note_engine import note_engine
+
+        chunks = await asyncio.to_thread(self._load_chunks, session_id, filename)
+        if not chunks:
+            await asyncio.to_thread(self._delete_file_nodes, filename, session_id)
+            if update_root:
+                await self.update_session_root(session_id)
+            return
+
+        groups = [chunks[i:i + self.leaf_chunks] for i in range(0, len(chunks), self.leaf_chunks)]
+        leaf_hashes = [self.node_hash([c.get("chunk_hash") or hashlib.md5(c.get("text", "").encode()).hexdigest() for c in group])
+                       for group in groups]
+        existing = await asyncio.to_thread(self._scroll_nodes, session_id=session_id, filename=filename)
+        leaves = {node["index"]: node for node in existing if node["level"] == LEAF}
+        file_node = next((node for node in existing if node["level"] == FILE), None)
+
+        changed = [i for i, leaf_hash in enumerate(leaf_hashes) if leaves.get(i, {}).get("source_hash") != leaf_hash]
+        if changed:
+            summaries = await note_engine.summarize(
+                ["\n".join(c.get("text", "") for c in groups[i]) for i in changed],
+                parts=[i + 1 for i in changed],
+                total=len(groups)
+            )
+            points = []
+            for i, summary in zip(changed, summaries):
+                leaves[i] = {"level": LEAF, "session_id": session_id, "filename": filename, "index": i,
+                             "source_hash": leaf_hashes[i], "summary": summary, "updated_at": time.time()}
+                points.append(models.PointStruct(id=self.point_id(LEAF, session_id, filename, i), vector={}, payload=leaves[i]))
+            await asyncio.to_thread(qdrant_manager.client.upsert, self.collection_name, points=points, wait=True)
+            self._stats["leaves_summarized"] += len(changed)
+
+        # A shorter new version of the file leaves trailing leaves behind
+        stale = [self.point_id(LEAF, session_id, filename, i) for i in leaves if i >= len(groups)]
+        if stale:
+            await asyncio.to_thread(
+                qdrant_manager.client.delete, self.collection_name, points_selector=models.PointIdsList(points=stale)
+            )
+
+        excluded = any(c.get("excluded") for c in chunks)
+        processed_at = chunks[0].get("processed_at")
+        file_hash = self.node_hash(leaf_hashes)
+        if file_node and file_node.get("source_hash") == file_hash:
+            self._stats["unchanged"] += 1
+            if file_node.get("excluded") != excluded or file_node.get("processed_at") != processed_at:
+                await asyncio.to_thread(
+                    self._set_file_payload, filename, {"excluded": excluded, "processed_at": processed_at}, session_id
+                )
+        else:
+            summary = await note_engine.reduce([leaves[i]["summary"] for i in range(len(groups))])
+            payload = {"level": FILE, "session_id": session_id, "filename": filename, "source_hash": file_hash,
+                       "summary": summary, "excluded": excluded, "processed_at": processed_at, "leaves": len(groups),
+                       "updated_at": time.time()}
+            await asyncio.to_thread(
+                qdrant_manager.client.upsert, self.collection_name,
+                points=[models.PointStruct(id=self.point_id(FILE, session_id, filename), vector={}, payload=payload)],
+                wait=True
+            )
+            self._stats["files_summarized"] += 1
+        if update_root:
+            await self.update_session_root(session_id)
+
+    async def remove_file(self, filename: str):
+        """Drop a deleted file's nodes from every session that had it and roll up their roots."""
+        sessions = await asyncio.to_thread(self._delete_file_nodes, filename)
+        for session_id in sessions:
+            await self.update_session_root(session_id)
+
+    async def set_excluded(self, filename: str, excluded: bool):
+        """Leave an excluded file's summaries in place (re-including it is free) but out of the roots."""
+        sessions = await asyncio.to_thread(self._set_file_payload, filename, {"excluded": excluded})
+        for session_id in sessions:
+            await self.update_session_root(session_id)
+
+    async def update_session_root(self, session_id: str):
+        """Roll the included file summaries up into the root; skipped when none of them changed."""
+        from note_engine import note_engine
+
+        files = sorted(
+            (node for node in await asyncio.to_thread(self._scroll_nodes, session_id=session_id, level=FILE)
+             if not node.get("excluded")),
+            key=lambda node: node["filename"]
+        )
+        root_id = self.point_id(SESSION, session_id)
+        if not files:
+            await asyncio.to_thread(
+                qdrant_manager.client.delete, self.collection_name, points_selector=models.PointIdsList(points=[root_id])
+            )
+            return
+
+        root_hash = self.node_hash([f"{node['filename']}:{node['source_hash']}" for node in files])
+        versions = {node["filename"]: node.get("processed_at") for node in files}
+        root = await asyncio.to_thread(self.get_root, session_id)
+        if root and root.get("source_hash") == root_hash:
+            self._stats["unchanged"] += 1
+            if root.get("versions") != versions:
+                # Same content re-ingested: only the recorded versions move
+                await asyncio.to_thread(
+                    qdrant_manager.client.set_payload, self.collection_name, payload={"versions": versions},
+                    points=[root_id], wait=True
+                )
+            return
+
+        summary = await note_engine.reduce([f"--- FILE: {node['filename']} ---\n{node['summary']}" for node in files])
+        payload = {"level": SESSION, "session_id": session_id, "source_hash": root_hash, "summary": summary,
+                   "files": [node["filename"] for node in files], "versions": versions, "updated_at": time.time()}
+        await asyncio.to_thread(
+            qdrant_manager.client.upsert, self.collection_name,
+            points=[models.PointStruct(id=root_id, vector={}, payload=payload)], wait=True
+        )
+        self._stats["roots_summarized"] += 1
+        logger.info(f"Updated summary tree root of session {session_id} from {len(files)} files")
+
+    async def rebuild_session(self, session_id: str):
+        """Bring every file of a session into the tree, then reduce the root once; files already up to date cost no LLM call."""
+        filenames = await asyncio.to_thread(self._session_filenames, session_id)
+        for node in await asyncio.to_thread(self._scroll_nodes, session_id=session_id, level=FILE):
+            if node["filename"] not in filenames:
+                await asyncio.to_thread(self._delete_file_nodes, node["filename"], session_id)
+        for filename in sorted(filenames):
+            await self.update_file(session_id, filename, update_root=False)
+        await self.update_session_root(session_id)
+
+    def _load_chunks(self, session_id: str, filename: str) -> List[Dict[str, Any]]:
+        """Chunks of the file's latest ingest, in order."""
+        chunk_filter = models.Filter(must=[
+            models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id)),
+            models.FieldCondition(key="filename", match=models.MatchValue(value=filename))
+        ])
+        payloads, offset = [], None
+        while True:
+            points, offset = qdrant_manager.client.scroll(
+                collection_name=self.chunks_collection,
+                scroll_filter=chunk_filter,
+                limit=256,
+                offset=offset,
+                with_payload=["text", "chunk_index", "chunk_hash", "processed_at", "excluded"],
+                with_vectors=False
+            )
+            payloads.extend(point.payload or {} for point in points)
+            if offset is None:
+                break
+        if not payloads:
+            return []
+        # Re-ingesting a file adds a new set of chunks next to the old one
+        latest = max(p.get("processed_at") or "" for p in payloads)
+        by_index = {p.get("chunk_index", 0): p for p in payloads if (p.get("processed_at") or "") == latest}
+        return [by_index[i] for i in sorted(by_index)]
+
+    def _session_filenames(self, session_id: str) -> set:
+        return set(self._scan_session_files(session_id))
+
+    def _session_versions(self, session_id: str) -> Dict[str, Any]:
+        """Latest ingest time of each included file of the session, as recorded in the root."""
+        return {filename: file["processed_at"] for filename, file in self._scan_session_files(session_id).items()
+                if not file["excluded"]}
+
+    def _scan_session_files(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """Files of the session from their first chunks only (one point per ingest), not every chunk."""
+        files: Dict[str, Dict[str, Any]] = {}
+        offset = None
+        while True:
+            points, offset = qdrant_manager.client.scroll(
+                collection_name=self.chunks_collection,
+                scroll_filter=models.Filter(
+                    must=[
+                        models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id)),
+                        models.FieldCondition(key="chunk_index", match=models.MatchValue(value=0))
+                    ],
+                    must_not=[models.FieldCondition(key="file_type", match=models.MatchAny(any=["memory", "generated_note"]))]
+                ),
+                limit=1000,
+                offset=offset,
+                with_payload=["filename", "processed_at", "excluded"],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                if not payload.get("filename"):
+                    continue
+                file = files.setdefault(payload["filename"], {"processed_at": None, "excluded": False})
+                if (payload.get("processed_at") or "") >= (file["processed_at"] or ""):
+                    file["processed_at"] = payload.get("processed_at")
+                file["excluded"] = file["excluded"] or bool(payload.get("excluded"))
+            if offset is None:
+                break
+        return files
+
+    def _scroll_nodes(self, session_id: Optional[str] = None, filename: Optional[str] = None,
+                      level: Optional[str] = None) -> List[Dict[str, Any]]:
+        must = [
+            models.FieldCondition(key=key, match=models.MatchValue(value=value))
+            for key, value in (("session_id", session_id), ("filename", filename), ("level", level)) if value is not None
+        ]
+        nodes, offset = [], None
+        while True:
+            points, offset = qdrant_manager.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=models.Filter(must=must),
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            nodes.extend(point.payload for point in points)
+            if offset is None:
+                break
+        return nodes
+
+    def _delete_file_nodes(self, filename: str, session_id: Optional[str] = None) -> List[str]:
+        """Delete the leaves and file node of a file (in one session or all). Returns the affected sessions."""
+        sessions = sorted({node["session_id"] for node in self._scroll_nodes(session_id=session_id, filename=filename, level=FILE)})
+        must = [models.FieldCondition(key="filename", match=models.MatchValue(value=filename))]
+        if session_id is not None:
+            must.append(models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id)))
+        qdrant_manager.client.delete(
+            self.collection_name, points_selector=models.FilterSelector(filter=models.Filter(must=must)), wait=True
+        )
+        return sessions
+
+    def _set_file_payload(self, filename: str, payload: Dict[str, Any], session_id: Optional[str] = None) -> List[str]:
+        nodes = self._scroll_nodes(session_id=session_id, filename=filename, level=FILE)
+        if nodes:
+            qdrant_manager.client.set_payload(
+                self.collection_name,
+                payload=payload,
+                points=[self.point_id(FILE, node["session_id"], filename) for node in nodes],
+                wait=True
+            )
+        return sorted({node["session_id"] for node in nodes})
+
+# Global instance
+summary_tree = SummaryTree(
+    collection_name=NOTES_TREE_COLLECTION_NAME,
+    chunks_collection=QDRANT_COLLECTION_NAME,
+    leaf_chunks=NOTES_TREE_LEAF_CHUNKS
+)
+
+try:
+    summary_tree.ensure_collection()
+except Exception as e:
+    print(f"Warning: Could not ensure collection {NOTES_TREE_COLLECTION_NAME}: {e}")
@@ -2,6 +2,7 @@ import httpx
 import logging
 from typing import List, Dict, Optional, Any
 from config import WORKFLOW_WEBHOOK_URL, WORKFLOW_API_KEY
+from http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -52,14 +53,14 @@ class WorkflowClient:
             headers["Authorization"] = f"Bearer {self.api_key}"
             
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    self.webhook_url,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await http_clients.get("workflow").post(
+                self.webhook_url,
+                json=payload,
+                headers=headers,
+                timeout=60.0
+            )
+            response.raise_for_status()
+            return response.json()
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"Workflow execution failed with status {e.response.status_code}: {e.response.text}")
@@ -10,10 +10,91 @@ export class UI {
         this.sessions = JSON.parse(localStorage.getItem('chat_sessions')) || [];
         this.currentSessionId = null;
 
+        // One WebSocket carries chat turns, streamed answers, titles and ingest progress for all sessions
+        this.chatSocket = null;
+        this.pendingTurns = new Map();
+        this.streamingMessages = new Map();
+        this.connectChatSocket();
+
         // Render sessions if sidebar exists
         this.renderSessions();
     }
 
+    connectChatSocket() {
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        let socket;
+        try {
+            socket = new WebSocket(`${protocol}://${window.location.host}/api/chat/ws`);
+        } catch (error) {
+            console.error('Chat socket unavailable, using HTTP:', error);
+            return;
+        }
+
+        socket.onopen = () => {
+            this.chatSocket = socket;
+            if (this.currentSessionId) this.sendSocketMessage({ type: 'subscribe', session_id: this.currentSessionId });
+        };
+        socket.onmessage = (event) => this.handleSocketEvent(JSON.parse(event.data));
+        socket.onclose = () => {
+            this.chatSocket = null;
+            this.pendingTurns.forEach(turn => turn.reject(new Error('Chat connection closed')));
+            this.pendingTurns.clear();
+            setTimeout(() => this.connectChatSocket(), 3000);
+        };
+    }
+
+    sendSocketMessage(message) {
+        if (!this.chatSocket || this.chatSocket.readyState !== WebSocket.OPEN) return false;
+        this.chatSocket.send(JSON.stringify(message));
+        return true;
+    }
+
+    sendChatOverSocket(sessionId, message, bubble) {
+        const requestId = crypto.randomUUID();
+        // Deltas are routed by request ID, so concurrent turns in one session never share a bubble
+        if (bubble) this.streamingMessages.set(requestId, bubble);
+        return new Promise((resolve, reject) => {
+            this.pendingTurns.set(requestId, { resolve, reject });
+            if (!this.sendSocketMessage({ type: 'chat', request_id: requestId, session_id: sessionId, message })) {
+                this.pendingTurns.delete(requestId);
+                reject(new Error('Chat connection not open'));
+            }
+        }).finally(() => this.streamingMessages.delete(requestId));
+    }
+
+    handleSocketEvent(event) {
+        const turn = event.request_id ? this.pendingTurns.get(event.request_id) : null;
+        if (event.type === 'answer' && turn) {
+            this.pendingTurns.delete(event.request_id);
+            turn.resolve(event);
+        } else if (event.type === 'error' && turn) {
+            this.pendingTurns.delete(event.request_id);
+            turn.reject(new Error(event.detail));
+        } else if (event.type === 'answer.delta') {
+            const el = event.request_id ? this.streamingMessages.get(event.request_id) : null;
+            if (el && event.session_id === this.currentSessionId) {
+                if (!el.dataset.streaming) {
+                    el.dataset.streaming = 'true';
+                    el.textContent = '';
+                }
+                el.textContent += event.delta;
+                const container = document.getElementById('chat-messages');
+                if (container) container.scrollTop = container.scrollHeight;
+            }
+        } else if (event.type === 'title') {
+            this.applyChatTitle(event.session_id, event.title);
+        } else if (event.type === 'subscribed') {
+            // Title events pushed while this socket was not following the session are lost
+            this.refreshDefaultTitle(event.session_id);
+        } else if (event.type === 'ingest.progress') {
+            const statusDiv = document.getElementById('upload-status');
+            if (statusDiv && !['done', 'failed'].includes(event.stage)) {
+                const counts = event.total ? ` ${event.done}/${event.total} chunks` : '';
+                statusDiv.textContent = `${event.filename}: ${event.stage}${counts}...`;
+            }
+        }
+    }
+
     async renderDashboard() {
         this.pageTitle.textContent = "Dashboard";
         this.mainContent.innerHTML = `
@@ -379,21 +460,31 @@ export class UI {
         try {
             const response = await fetch(`/api/chat/title/${sessionId}`);
             const data = await response.json();
+            this.applyChatTitle(sessionId, data.title);
+        } catch (error) {
+            console.error('Failed to update chat title:', error);
+        }
+    }
 
-            const session = this.sessions.find(s => s.id === sessionId);
-            if (session && data.title) {
-                session.title = data.title;
-                this.saveSessions(); // Save after updating title
-                this.renderSidebarSessions(); // Update sidebar
+    refreshDefaultTitle(sessionId) {
+        const session = this.sessions.find(s => s.id === sessionId);
+        if (session && session.title.startsWith('Chat ')) {
+            this.updateChatTitle(sessionId);
+        }
+    }
 
-                // Update header if this is the current session
-                if (this.currentSessionId === sessionId) {
-                    const titleEl = document.getElementById('current-session-title');
-                    if (titleEl) titleEl.textContent = session.title;
-                }
+    applyChatTitle(sessionId, title) {
+        const session = this.sessions.find(s => s.id === sessionId);
+        if (session && title) {
+            session.title = title;
+            this.saveSessions(); // Save after updating title
+            this.renderSidebarSessions(); // Update sidebar
+
+            // Update header if this is the current session
+            if (this.currentSessionId === sessionId) {
+                const titleEl = document.getElementById('current-session-title');
+                if (titleEl) titleEl.textContent = session.title;
             }
-        } catch (error) {
-            console.error('Failed to update chat title:', error);
         }
     }
 
@@ -415,6 +506,7 @@ export class UI {
 
     async selectSession(sessionId) {
         this.currentSessionId = sessionId;
+        this.sendSocketMessage({ type: 'subscribe', session_id: sessionId });
 
         // Update UI to show selected state
         document.querySelectorAll('.session-item').forEach(item => {
@@ -520,21 +612,32 @@ export class UI {
         container.appendChild(loadingDiv);
         container.scrollTop = container.scrollHeight;
 
+        const sessionId = this.currentSessionId;
         try {
-            const response = await fetch('/api/chat/message', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    session_id: this.currentSessionId,
-                    message: message
-                })
-            });
+            let data;
+            if (this.chatSocket) {
+                // Streamed deltas are written into the loading bubble; the title is usually pushed when generated
+                data = await this.sendChatOverSocket(sessionId, message, loadingDiv);
+            } else {
+                const response = await fetch('/api/chat/message', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        session_id: sessionId,
+                        message: message
+                    })
+                });
+
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                }
 
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                data = await response.json();
             }
 
-            const data = await response.json();
+            // Update title if it's the first message; a pushed title event can be dropped or
+            // published by another worker process
+            this.refreshDefaultTitle(sessionId);
 
             // Remove loading indicator
             const loadingEl = document.getElementById(loadingId);
@@ -542,12 +645,6 @@ export class UI {
 
             this.addMessage(data.response, 'assistant', data.metadata);
 
-            // Update title if it's the first message
-            const session = this.sessions.find(s => s.id === this.currentSessionId);
-            if (session && session.title.startsWith('Chat ')) {
-                this.updateChatTitle(this.currentSessionId);
-            }
-
         } catch (error) {
             console.error('Failed to send message:', error);
             const loadingEl = document.getElementById(loadingId);